@@ -0,0 +1,64 @@
+"""
+The data of the converter benchmark, shared with its tests
+(tests/db/test_converters.py): a model with a column for each of the
+backend's converters, and rows for it.
+"""
+import datetime
+import uuid
+from decimal import Decimal
+
+_models = {}
+
+
+def setup_django():
+    """Configure Django against an in-memory database of the local backend."""
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            DATABASES={'default': {'ENGINE': 'django_cf.db.backends.local', 'NAME': ':memory:'}},
+            INSTALLED_APPS=['django_cf'],
+            USE_TZ=False,
+        )
+        django.setup()
+
+
+def reading_model():
+    """A model with a column for each of the backend's converters, defined once Django is set up."""
+    if 'Reading' not in _models:
+        from django.db import models
+
+        class Reading(models.Model):
+            price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+            taken = models.DateTimeField()
+            day = models.DateField(null=True)
+            at = models.TimeField(null=True)
+            valid = models.BooleanField(null=True)
+            token = models.UUIDField(null=True)
+            extra = models.JSONField(null=True)
+            note = models.CharField(max_length=20, null=True)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models['Reading'] = Reading
+    return _models['Reading']
+
+
+def make_readings(model, count):
+    """``count`` unsaved readings, about a sixth of their values NULL."""
+    start = datetime.datetime(2024, 1, 1, 12, 30)
+    return [
+        model(
+            price=Decimal(i) / 4 if i % 3 else None,
+            taken=start + datetime.timedelta(hours=i, microseconds=i),
+            day=start.date() + datetime.timedelta(days=i) if i % 4 else None,
+            at=datetime.time(i % 24, 15) if i % 5 else None,
+            valid=[True, False, None][i % 3],
+            token=uuid.UUID(int=i) if i % 2 else None,
+            extra={'i': i} if i % 2 else None,
+            note=f'Reading {i}' if i % 6 else None,
+        )
+        for i in range(count)
+    ]
@@ -1,8 +1,9 @@
+import asyncio
 import os
 from io import BytesIO
 
 
-async def handle_wsgi(request, app):
+async def handle_wsgi(request, app, ctx=None):
     os.environ.setdefault('DJANGO_ALLOW_ASYNC_UNSAFE', 'false')
     from js import Object, Response, URL, console
 
@@ -50,6 +51,9 @@ async def handle_wsgi(request, app):
         status = status_str
         headers = response_headers
 
+    # Imported before the app runs so it sees this request's request_started
+    from django_cf import budget, stats
+
     try:
         resp = app(wsgi_request, start_response)
     except Exception as exc:
@@ -59,6 +63,16 @@ async def handle_wsgi(request, app):
 
         raise exc
 
+    from django.conf import settings
+
+    if getattr(settings, 'CLOUDFLARE_SERVER_TIMING', False):
+        timing = stats.current().server_timing()
+        resp['Server-Timing'] = f"{resp['Server-Timing']}, {timing}" if resp.has_header('Server-Timing') else timing
+    exceeded = budget.header_value()
+    if exceeded:
+        resp[budget.HEADER] = exceeded
+    stats.log_request(method, path)
+
     status = resp.status_code
     headers = resp.headers
 
@@ -70,6 +84,18 @@ async def handle_wsgi(request, app):
         value = str(v)
         final_response.headers.set('Set-Cookie', value.replace('Set-Cookie: ', '', 1));
 
+    # Like any WSGI server, close the response so Django sends request_finished
+    resp.close()
+
+    # Background work (statement stats) runs after the response when the
+    # runtime lets us extend the invocation with waitUntil
+    from django_cf.db.statements import pending_flushes
+    for flush in pending_flushes():
+        if ctx is not None:
+            ctx.waitUntil(asyncio.ensure_future(flush))
+        else:
+            await flush
+
     return final_response
 
 
@@ -78,7 +104,7 @@ class DjangoCF:
         raise NotImplementedError("Please implement get_app in your django_cf worker")
 
     async def fetch(self, request):
-        return await handle_wsgi(request, self.get_app())
+        return await handle_wsgi(request, self.get_app(), getattr(self, 'ctx', None))
 
 
 class DjangoCFDurableObject:
@@ -93,4 +119,4 @@ class DjangoCFDurableObject:
         set_storage(self.ctx.storage.sql)
 
     def fetch(self, request):
-        return handle_wsgi(request, self.get_app())
+        return handle_wsgi(request, self.get_app(), self.ctx)
@@ -0,0 +1,131 @@
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.paginator import InvalidPage
+
+from django_cf.db import counts, search
+from django_cf.pagination import CountedPaginator, KeysetPaginator
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paged with KeysetPaginator. The cursor travels in the usual
+    ``p`` parameter, "Show all" is disabled and nothing is counted:
+    ``result_count`` is the size of the current page.
+
+    Sorts that can't be paged by keyset, such as on a nullable column or an
+    annotation, are paged by number with the ModelAdmin's paginator instead.
+    """
+
+    keyset = True
+
+    def get_results(self, request):
+        try:
+            paginator = KeysetPaginator(self.queryset, self.list_per_page)
+        except (ImproperlyConfigured, FieldDoesNotExist):
+            self.keyset = False
+            return super().get_results(request)
+
+        try:
+            page = paginator.page(request.GET.get(PAGE_VAR))
+        except InvalidPage:
+            raise IncorrectLookupParameters
+
+        if self.model_admin.show_full_result_count:
+            full_result_count = self.root_queryset.count()
+        else:
+            full_result_count = None
+
+        self.result_count = len(page)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = paginator
+        self.page = page
+
+    @property
+    def next_page_url(self):
+        return self.get_query_string({PAGE_VAR: self.page.next_cursor})
+
+    @property
+    def previous_page_url(self):
+        return self.get_query_string({PAGE_VAR: self.page.previous_cursor})
+
+
+class KeysetPaginationAdminMixin:
+    """
+    ModelAdmin mixin paging the changelist by keyset instead of OFFSET::
+
+        @admin.register(Post)
+        class PostAdmin(KeysetPaginationAdminMixin, admin.ModelAdmin):
+            ordering = ['-pub_date']
+
+    Requires ``django_cf`` in INSTALLED_APPS for its changelist template.
+    Sorts that can't be paged by keyset fall back to numbered pages counted
+    by CountedPaginator.
+    """
+
+    show_full_result_count = False
+    paginator = CountedPaginator
+    change_list_template = 'django_cf/admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class CountedChangeList(ChangeList):
+    """
+    Changelist showing the stored row count of the table as the full result
+    count instead of counting it.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        if self.full_result_count is None:
+            stored = counts.row_count(self.model, using=self.root_queryset.db)
+            if stored is not None:
+                self.show_full_result_count = True
+                self.full_result_count = stored
+
+
+class CountedPaginationAdminMixin:
+    """
+    ModelAdmin mixin taking changelist counts from the stored row counts
+    (see django_cf.db.counts) instead of ``SELECT COUNT(*)``::
+
+        @admin.register(Post)
+        class PostAdmin(CountedPaginationAdminMixin, admin.ModelAdmin):
+            pass
+
+    Filtered changelists and tables below CountedPaginator.count_threshold
+    rows are still counted.
+    """
+
+    show_full_result_count = False
+    paginator = CountedPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return CountedChangeList
+
+
+class SearchIndexAdminMixin:
+    """
+    ModelAdmin mixin running the changelist search through the model's FTS5
+    index (see django_cf.db.search) instead of ``LIKE '%term%'`` scans::
+
+        @admin.register(Post)
+        class PostAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
+            search_fields = ['title', 'body']
+
+    ``search_fields`` picks the indexed fields to search, so they must all be
+    fields of the index; lookup prefixes such as ``^`` and ``=`` are ignored.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        fields = [name.lstrip('^=@') for name in self.get_search_fields(request)]
+        return search.search(queryset, search_term, fields or None), False
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class DjangoCFConfig(AppConfig):
+    name = 'django_cf'
+
+    def ready(self):
+        from .db import search
+
+        search.register_lookups()
@@ -0,0 +1,119 @@
+"""
+Per-request query budgets for the Cloudflare backends.
+
+Limits on the number of statements, rows read and database time of a request
+are set with ``CLOUDFLARE_QUERY_BUDGET``::
+
+    CLOUDFLARE_QUERY_BUDGET = {
+        'QUERIES': 50,                                   # 'log' when exceeded
+        'ROWS_READ': {'LIMIT': 10000, 'ACTION': 'raise'},
+        'DB_TIME': {'LIMIT': 500, 'ACTION': 'header'},   # milliseconds
+    }
+
+and raised or lowered for a view with the ``query_budget`` decorator. A
+limit is checked after every statement of a request and acted on once per
+request:
+'log' logs a warning, 'header' adds an ``X-Query-Budget-Exceeded`` header to
+the response and 'raise' raises QueryBudgetExceeded.
+"""
+import logging
+from functools import wraps
+
+from django_cf import stats
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('log', 'header', 'raise')
+LIMITS = ('queries', 'rows_read', 'db_time')
+HEADER = 'X-Query-Budget-Exceeded'
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, name, value, limit):
+        super().__init__(f"Query budget exceeded: {name} is {value:g}, the limit is {limit:g}")
+        self.name = name
+        self.value = value
+        self.limit = limit
+
+
+def _validate(action):
+    if action not in ACTIONS:
+        from django.core.exceptions import ImproperlyConfigured
+        raise ImproperlyConfigured(f"Query budget ACTION must be one of {', '.join(ACTIONS)}.")
+    return action
+
+
+def limits():
+    """Effective limits of the current request as ``{name: (limit, action)}``."""
+    from django.conf import settings
+
+    configured = (getattr(settings, 'CLOUDFLARE_QUERY_BUDGET', None) if settings.configured else None) or {}
+    result = {}
+    for name in LIMITS:
+        value = configured.get(name.upper())
+        if isinstance(value, dict):
+            result[name] = (value['LIMIT'], _validate(value.get('ACTION', 'log')))
+        elif value is not None:
+            result[name] = (value, 'log')
+    result.update(stats.current().budget)
+    return result
+
+
+def check():
+    """Act on the limits the current request has gone past; called after every statement."""
+    if not stats.in_request():
+        return  # management commands, migrations, shell
+
+    current = stats.current()
+    for name, (limit, action) in limits().items():
+        if limit is None or name in current.exceeded:
+            continue
+        value = getattr(current, name)
+        if value <= limit:
+            continue
+
+        current.exceeded[name] = (limit, action)
+        if action == 'raise':
+            raise QueryBudgetExceeded(name, value, limit)
+        if action == 'log':
+            logger.warning(f"Query budget exceeded: {name} is {value:g}, the limit is {limit:g}")
+
+
+def header_value():
+    """Value of the X-Query-Budget-Exceeded header for the current request, or None."""
+    current = stats.current()
+    exceeded = [
+        f"{name}={getattr(current, name):g}/{limit:g}"
+        for name, (limit, action) in current.exceeded.items() if action == 'header'
+    ]
+    return ', '.join(exceeded) or None
+
+
+def query_budget(queries=None, rows_read=None, db_time=None, action=None):
+    """
+    Override the budget of the requests handled by a view::
+
+        @query_budget(queries=200, rows_read=50000)
+        def report(request):
+            ...
+
+    Without ``action``, each limit keeps the action configured in
+    CLOUDFLARE_QUERY_BUDGET ('log' if it isn't configured). ``None`` keeps
+    the configured limit.
+    """
+    if action is not None:
+        _validate(action)
+    overrides = {'queries': queries, 'rows_read': rows_read, 'db_time': db_time}
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            configured = limits()
+            budget = stats.current().budget
+            for name, limit in overrides.items():
+                if limit is not None:
+                    budget[name] = (limit, action or configured.get(name, (None, 'log'))[1])
+            return view_func(*args, **kwargs)
+        return wrapper
+
+    return decorator
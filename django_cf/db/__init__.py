@@ -0,0 +1,8 @@
+from .batch import gather, prefetch_related_objects
+from .dirty import DirtyFieldsMixin
+from .query import CFManager, CFQuerySet, UpsertManager, UpsertQuerySet
+
+__all__ = [
+    'gather', 'prefetch_related_objects', 'CFManager', 'CFQuerySet', 'DirtyFieldsMixin', 'UpsertManager',
+    'UpsertQuerySet',
+]
@@ -0,0 +1,189 @@
+"""
+Index suggestions from recorded statements.
+
+Each statement is run through EXPLAIN QUERY PLAN against the current schema
+and every table it scans in full is matched with the columns the statement
+filters, joins or sorts that table on. The columns are mapped back to model
+fields and proposed as a ``models.Index``, ranked by the rows the scanning
+statements read. Whether a scan is worth an index is judged by the size of
+the table, not by the rows the statement returned.
+"""
+import re
+from dataclasses import dataclass, field
+
+from .slowlog import query_plan
+
+_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(?:"([^"]+)"|(\S+))(?: AS (\S+))?')
+_TEMP_ORDER_RE = re.compile(r'^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+_FROM_RE = re.compile(r'\b(?:FROM|JOIN)\s+(?:"([^"]+)"|(\w+))(?:\s+(?:AS\s+)?(?:"([^"]+)"|(\w+)))?', re.IGNORECASE)
+_COLUMN = r'(?:"([^"]+)"|(\w+))\."([^"]+)"'
+_COMPARISON_RE = re.compile(_COLUMN + r'\s*(=|IN\b|IS\b|<=|>=|<|>|LIKE\b|BETWEEN\b)', re.IGNORECASE)
+_JOINED_RE = re.compile(r'=\s*' + _COLUMN)
+# Boolean columns used as conditions on their own: WHERE "t"."is_active"
+_BARE_RE = re.compile(
+    r'(?:\bWHERE|\bAND|\bOR|\bNOT|\()\s*' + _COLUMN + r'\s*(?=\)|\bAND\b|\bOR\b|\bORDER\b|\bLIMIT\b|$)',
+    re.IGNORECASE,
+)
+_ORDER_BY_RE = re.compile(r'\bORDER BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|\)|$)', re.IGNORECASE | re.DOTALL)
+_ORDER_ITEM_RE = re.compile(_COLUMN + r'(?:\s+(ASC|DESC))?', re.IGNORECASE)
+
+_KEYWORDS = {
+    'where', 'inner', 'left', 'right', 'outer', 'cross', 'join', 'on', 'order', 'group', 'limit', 'having',
+    'union', 'natural', 'set', 'values', 'select', 'using',
+}
+
+# Representative values to EXPLAIN a statement recorded with only the types of its params
+_PLACEHOLDER_VALUES = {'int': 0, 'float': 0.0, 'bool': 0, 'bytes': b'', 'NoneType': None}
+
+
+def placeholder_params(shape):
+    """Params standing in for a recorded params shape ('int, str, ...')."""
+    if not shape:
+        return None
+    return tuple(_PLACEHOLDER_VALUES.get(name.strip(), '') for name in shape.split(','))
+
+
+def table_aliases(query):
+    """``{alias or table name: table}`` for the tables in FROM and JOIN clauses."""
+    aliases = {}
+    for match in _FROM_RE.finditer(query):
+        table = match.group(1) or match.group(2)
+        alias = match.group(3) or match.group(4)
+        aliases[table] = table
+        if alias and alias.lower() not in _KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def scans(plan):
+    """Aliases of the tables a plan scans in full, and whether it sorts in a temporary b-tree."""
+    scanned = []
+    temp_order = False
+    for line in plan:
+        line = line.strip()
+        match = _SCAN_RE.match(line)
+        if match:
+            scanned.append(match.group(3) or match.group(1) or match.group(2))
+        elif _TEMP_ORDER_RE.match(line):
+            temp_order = True
+    return scanned, temp_order
+
+
+def index_columns(query, alias, temp_order):
+    """
+    Columns of ``alias`` worth indexing for a statement: equality columns
+    first, then one range column, or else the sort order when SQLite had to
+    sort in a temporary b-tree. Descending columns are prefixed with '-'.
+    """
+    equality, ranges = [], []
+    for match in _COMPARISON_RE.finditer(query):
+        if (match.group(1) or match.group(2)) != alias:
+            continue
+        target = equality if match.group(4).upper() in ('=', 'IN', 'IS') else ranges
+        if match.group(3) not in target:
+            target.append(match.group(3))
+    for match in (*_JOINED_RE.finditer(query), *_BARE_RE.finditer(query)):
+        if (match.group(1) or match.group(2)) == alias and match.group(3) not in equality:
+            equality.append(match.group(3))
+
+    columns = list(equality)
+    range_columns = [column for column in ranges if column not in columns]
+    if range_columns:
+        columns.append(range_columns[0])
+    elif temp_order:
+        order_by = _ORDER_BY_RE.search(query)
+        for match in _ORDER_ITEM_RE.finditer(order_by.group(1) if order_by else ''):
+            if (match.group(1) or match.group(2)) == alias and match.group(3) not in columns:
+                columns.append(('-' if (match.group(4) or '').upper() == 'DESC' else '') + match.group(3))
+    return columns
+
+
+@dataclass
+class Proposal:
+    model: type
+    fields: list
+    rows_read: int = 0
+    statements: list = field(default_factory=list)
+
+    @property
+    def index(self):
+        from django.db import models
+
+        index = models.Index(fields=self.fields)
+        index.set_name_with_model(self.model)
+        return index
+
+
+def _model_fields(table, columns):
+    """The model of ``table`` and its field names for ``columns``, or (None, None)."""
+    from django.apps import apps
+
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.db_table != table:
+            continue
+        if model._meta.auto_created:
+            return None, None  # Implicit many-to-many tables have no Meta to add indexes to
+        by_column = {f.column: f.name for f in model._meta.concrete_fields}
+        names = []
+        for column in columns:
+            descending = column.startswith('-')
+            name = by_column.get(column.lstrip('-'))
+            if name is None:
+                return None, None
+            names.append(('-' if descending else '') + name)
+        return model, names
+    return None, None
+
+
+def table_rows(database_wrapper, model):
+    """Rows in ``model``'s table: its stored row count, or else a COUNT(*)."""
+    from . import counts
+
+    rows = counts.row_count(model, using=database_wrapper.alias)
+    if rows is None:
+        rows = model._base_manager.using(database_wrapper.alias).count()
+    return rows
+
+
+def advise(database_wrapper, statements, min_rows=1000):
+    """
+    Index proposals for recorded statements (dicts with query, params,
+    calls and rows_read, as kept by STATEMENT_STATS), largest rows_read first.
+
+    A full scan reads the whole table whatever the statement returns, so
+    scans of tables with fewer than ``min_rows`` rows are skipped, and a
+    scanning statement is counted as reading at least the table's rows per
+    call.
+    """
+    proposals = {}
+    sizes = {}
+    for statement in statements:
+        if not statement['calls']:
+            continue
+
+        query = statement['query']
+        try:
+            plan = query_plan(database_wrapper, query, placeholder_params(statement['params']))
+        except Exception:
+            continue  # e.g. the statement's table no longer exists
+        if not plan:
+            continue
+
+        scanned, temp_order = scans(plan)
+        aliases = table_aliases(query)
+        for alias in scanned:
+            columns = index_columns(query, alias, temp_order)
+            table = aliases.get(alias, alias)
+            model, names = _model_fields(table, columns) if columns else (None, None)
+            if model is None:
+                continue
+            if model not in sizes:
+                sizes[model] = table_rows(database_wrapper, model)
+            if sizes[model] < min_rows:
+                continue
+
+            proposal = proposals.setdefault((model, tuple(names)), Proposal(model, names))
+            proposal.rows_read += max(statement['rows_read'], sizes[model] * statement['calls'])
+            proposal.statements.append(statement['fingerprint'])
+
+    return sorted(proposals.values(), key=lambda proposal: proposal.rows_read, reverse=True)
@@ -1,8 +1,48 @@
+from functools import lru_cache
+
+import sqlparse
 from django.core.exceptions import ImproperlyConfigured
+from sqlparse import tokens as T
+from sqlparse.sql import Identifier, IdentifierList
 
 from ...base_engine import CFDatabaseWrapper, is_read_only_query, CFResult, replace_date_trunc_in_sql
 
 
+@lru_cache(maxsize=512)
+def unique_result_columns(query):
+    """
+    Whether the result columns of a SELECT have distinct names that keep
+    their order as keys of a JS object, so its rows can be read with all()
+    instead of raw(). Only plain column references and aliased expressions
+    are trusted; anything else (``*``, unaliased expressions) is not.
+    """
+    parsed = sqlparse.parse(query)
+    tokens = [token for token in parsed[0].tokens if not token.is_whitespace] if parsed else []
+    if len(tokens) < 2 or tokens[0].ttype is not T.DML or tokens[0].normalized != 'SELECT':
+        return False
+    columns = tokens[2] if tokens[1].ttype is T.Keyword and tokens[1].normalized == 'DISTINCT' else tokens[1]
+    if isinstance(columns, IdentifierList):
+        items = [token for token in columns.tokens if not token.is_whitespace and token.ttype is not T.Punctuation]
+    else:
+        items = [columns]
+
+    names = []
+    for item in items:
+        if not isinstance(item, Identifier):
+            return False
+        name = item.get_alias()
+        if name is None:
+            # A column reference such as "table"."column" is named after the column
+            if any(token.ttype not in (T.Name, T.String.Symbol, T.Punctuation) for token in item.flatten()):
+                return False
+            name = item.get_real_name()
+        # Integer-like keys are ordered before the others in a JS object
+        if not name or name.isdigit():
+            return False
+        names.append(name)
+    return len(set(names)) == len(names)
+
+
 class DatabaseWrapper(CFDatabaseWrapper):
     vendor = "cloudflare_d1"
     display_name = "D1"
@@ -64,7 +104,7 @@ class DatabaseWrapper(CFDatabaseWrapper):
 
         return query, params
 
-    def run_query(self, query, params=None) -> CFResult:
+    def prepare_statement(self, query, params=None):
         proc_query, params = self.process_query(query, params)
 
         from workers import env
@@ -75,18 +115,88 @@ class DatabaseWrapper(CFDatabaseWrapper):
         else:
             stmt = db.prepare(proc_query);
 
-        read_only = is_read_only_query(proc_query)
+        # all() returns the rows read, but as objects, which would lose
+        # columns of the same name (e.g. the ids of a join); such reads use
+        # raw() and count the rows returned instead
+        raw = is_read_only_query(proc_query) and not unique_result_columns(proc_query)
+        return stmt, params, raw
+
+    def to_result(self, query, params, raw, response) -> CFResult:
+        if raw:
+            response = response.to_py()
+            return CFResult.from_object(query, params, response, len(response), 0)
+
+        return CFResult.from_object(query, params, response.results.to_py(), response.meta.rows_read, response.meta.rows_written,
+                                    response.meta.last_row_id)
+
+    def run_query(self, query, params=None) -> CFResult:
+        stmt, params, raw = self.prepare_statement(query, params)
+
         try:
-            if read_only:
-                response = self.run_sync(stmt.raw()).to_py()
-                result = CFResult.from_object(query, params, response, len(response), 0)
+            if raw:
+                response = self.run_sync(stmt.raw())
             else:
                 response = self.run_sync(stmt.all())
-                result = CFResult.from_object(query, params, response.results.to_py(), response.meta.rows_read, response.meta.rows_written,
-                                            response.meta.last_row_id)
+            result = self.to_result(query, params, raw, response)
         except Exception:
             from js import Error
             Error.stackTraceLimit = 1e10
             raise Error(Error.new().stack)
 
         return result
+
+    def submit(self, statements):
+        """Start every statement and return (prepared statements, promise of all responses)."""
+        # Every statement goes out as its own D1 request and they are awaited
+        # together with Promise.all, so the wait is the slowest statement and
+        # not the sum. D1's batch() would be a single request, but it only
+        # returns object rows, which collapse duplicate column names in joins.
+        from js import Promise
+        from pyodide.ffi import to_js
+
+        prepared = [self.prepare_statement(query, params) for query, params in statements]
+        return prepared, Promise.all(to_js([
+            stmt.raw() if raw else stmt.all()
+            for stmt, _, raw in prepared
+        ]))
+
+    def to_results(self, statements, prepared, responses) -> list:
+        return [
+            self.to_result(query, params, raw, response)
+            for (query, _), (_, params, raw), response in zip(statements, prepared, responses)
+        ]
+
+    def run_queries(self, statements) -> list:
+        try:
+            prepared, responses = self.submit(statements)
+            results = self.to_results(statements, prepared, self.run_sync(responses))
+        except Exception:
+            from js import Error
+            Error.stackTraceLimit = 1e10
+            raise Error(Error.new().stack)
+
+        return results
+
+    async def run_queries_async(self, statements) -> list:
+        prepared, responses = self.submit(statements)
+        return self.to_results(statements, prepared, await responses)
+
+    def run_batch(self, statements) -> list:
+        # batch() is one request running the statements in order, as a transaction
+        from pyodide.ffi import to_js
+        from workers import env
+
+        try:
+            prepared = [self.prepare_statement(query, params) for query, params in statements]
+            responses = self.run_sync(getattr(env, self.binding).batch(to_js([stmt for stmt, _, _ in prepared])))
+            # Its responses are D1Results (object rows) for reads and writes alike
+            results = [
+                self.to_result(query, params, False, response)
+                for (query, _), (_, params, _), response in zip(statements, prepared, responses)
+            ]
+        except Exception:
+            from js import Error
+            Error.stackTraceLimit = 1e10
+            raise Error(Error.new().stack)
+
+        return results
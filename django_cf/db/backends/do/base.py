@@ -1,5 +1,12 @@
 from .storage import get_storage
-from ...base_engine import CFDatabaseWrapper, CFResult
+from ...base_engine import (
+    CFCursorResult, CFDatabaseFeatures, CFDatabaseWrapper, CFResult, CFStreamingCursor, is_read_only_query,
+)
+
+
+class DatabaseFeatures(CFDatabaseFeatures):
+    # QuerySet.iterator() streams one query's rows from the SQL cursor
+    supports_keyset_chunked_reads = False
 
 
 class DatabaseWrapper(CFDatabaseWrapper):
@@ -7,9 +14,16 @@ class DatabaseWrapper(CFDatabaseWrapper):
     display_name = "DO"
     binding: str
 
+    features_class = DatabaseFeatures
+
     def get_connection_params(self):
         return {}
 
+    def chunked_cursor(self):
+        self.ensure_connection()
+        with self.wrap_database_errors:
+            return self._prepare_cursor(CFStreamingCursor(self.connection))
+
 
     def process_query(self, query, params=None):
         if params is None:
@@ -47,6 +61,10 @@ class DatabaseWrapper(CFDatabaseWrapper):
         else:
             stmt = db.exec(proc_query);
 
+        if self.connection._streaming and is_read_only_query(query):
+            # Rows are pulled from the cursor as they're fetched
+            return CFCursorResult(self.stream_rows(stmt), stmt)
+
         try:
             response = stmt.raw().toArray().to_py()
             result = CFResult.from_object(query, params, response, stmt.rowsRead, stmt.rowsWritten)
@@ -56,3 +74,35 @@ class DatabaseWrapper(CFDatabaseWrapper):
             raise Error(Error.new().stack)
 
         return result
+
+    @staticmethod
+    def stream_rows(stmt):
+        """The rows of a SQL cursor as tuples, converted one at a time."""
+        try:
+            from pyodide.ffi import jsnull
+        except ImportError:
+            jsnull = None
+
+        for row in stmt.raw():
+            yield CFResult.to_row(row.to_py(), jsnull)
+
+    def run_batch(self, statements) -> list:
+        # exec() runs a script of several statements but only binds params for
+        # one, so the leading statements without params go out as one script
+        count = next((i for i, (_, params) in enumerate(statements) if params), len(statements))
+        if count < 2:
+            return super().run_batch(statements)
+
+        script = ';\n'.join(self.process_query(query, params)[0] for query, params in statements[:count])
+        stmt = get_storage().exec(script)
+
+        try:
+            # The cursor is the last statement's; rowsRead/rowsWritten cover the script
+            response = stmt.raw().toArray().to_py()
+            result = CFResult.from_object(statements[count - 1][0], None, response, stmt.rowsRead, stmt.rowsWritten)
+        except Exception:
+            from js import Error
+            Error.stackTraceLimit = 1e10
+            raise Error(Error.new().stack)
+
+        return [CFResult([]) for _ in range(count - 1)] + [result] + super().run_batch(statements[count:])
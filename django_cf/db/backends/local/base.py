@@ -0,0 +1,75 @@
+"""
+A local SQLite file standing in for a D1 or Durable Objects database, for
+tooling that runs outside a worker (e.g. the cf_export_migrations command).
+
+Statements go through the same CF engine (CFDatabase, schema editor,
+compiler) as on Cloudflare, and are executed by Python's sqlite3 module on
+the file named by NAME.
+"""
+import sqlite3
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+
+from ...base_engine import CFDatabaseWrapper, CFResult, is_read_only_query
+
+
+class DatabaseWrapper(CFDatabaseWrapper):
+    vendor = "cloudflare_local"
+    display_name = "Local SQLite"
+    sqlite = None
+    recorded = None
+
+    def get_connection_params(self):
+        if not self.settings_dict["NAME"]:
+            raise ImproperlyConfigured(
+                "settings.DATABASES is improperly configured. "
+                "Please supply the NAME value."
+            )
+        return {"name": self.settings_dict["NAME"]}
+
+    def get_new_connection(self, conn_params):
+        if self.sqlite is None:
+            self.sqlite = sqlite3.connect(conn_params["name"], check_same_thread=False, isolation_level=None)
+        return super().get_new_connection(conn_params)
+
+    def process_query(self, query, params=None):
+        if params is None:
+            query = query.replace('%s', '?')
+        else:
+            new_params = []
+            for param in params:
+                if param is None:
+                    query = query.replace('%s', 'null', 1)
+                else:
+                    new_params.append(param)
+                    query = query.replace('%s', '?', 1)
+
+            params = new_params
+
+        return query, params
+
+    def run_query(self, query, params=None) -> CFResult:
+        if self.recorded is not None and not is_read_only_query(query):
+            self.recorded.append((query, params))
+        proc_query, params = self.process_query(query, params)
+
+        cursor = self.sqlite.execute(proc_query, params or ())
+        rows = [list(row) for row in cursor.fetchall()]
+        if is_read_only_query(proc_query):
+            return CFResult.from_object(query, params, rows, len(rows), 0)
+        return CFResult.from_object(query, params, rows, 0, cursor.rowcount, cursor.lastrowid)
+
+    @contextmanager
+    def recording(self):
+        """Collect the (query, params) of the writes run inside this block, before placeholders are replaced."""
+        previous, self.recorded = self.recorded, []
+        try:
+            yield self.recorded
+        finally:
+            self.recorded = previous
+
+    def close_sqlite(self):
+        if self.sqlite is not None:
+            self.sqlite.close()
+            self.sqlite = None
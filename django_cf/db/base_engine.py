@@ -1,5 +1,12 @@
+import copy
+import logging
 import re
+import sqlite3
+import time
 import sqlparse
+from contextlib import contextmanager
+from itertools import islice
+from django.core import signals
 from django.db import DatabaseError, Error, DataError, OperationalError, \
     IntegrityError, InternalError, ProgrammingError, NotSupportedError, InterfaceError
 from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
@@ -10,8 +17,30 @@ from django.db.backends.sqlite3.introspection import DatabaseIntrospection as SQ
 from django.db.backends.sqlite3.operations import DatabaseOperations as SQLiteDatabaseOperations
 from django.db.backends.sqlite3.schema import DatabaseSchemaEditor as SQLiteDatabaseSchemaEditor
 from django.db.models.functions import TruncDate, TruncTime, TruncYear, TruncQuarter, TruncMonth, TruncWeek, TruncDay, TruncHour, TruncMinute, TruncSecond
+from django.db.backends.ddl_references import Statement
+from django.db.models import Index
 from django.db.models.sql.compiler import SQLCompiler
 
+from django_cf import budget, stats
+
+from .deletion import on_delete_sql, referencing_fields, without_action
+
+try:
+    from pyodide.ffi import JsException
+except ImportError:
+    JsException = sqlite3.Error
+
+# What a failing statement raises: D1 and Durable Objects raise JS errors,
+# the local backend sqlite3's, and Django its own
+DATABASE_ERRORS = (DatabaseError, sqlite3.Error, JsException)
+
+logger = logging.getLogger(__name__)
+
+
+def mentions_column(sql, column) -> bool:
+    """Whether ``sql`` names ``column`` as a whole identifier: "id" isn't in rowid, nor "name" in table_name."""
+    return re.search(rf'(?<![\w$]){re.escape(column)}(?![\w$])', sql, re.IGNORECASE) is not None
+
 
 def replace_date_trunc_in_sql(sql):
     """Replace django_date_trunc and django_datetime_trunc function calls with SQLite equivalents."""
@@ -54,7 +83,67 @@ def replace_date_trunc_in_sql(sql):
 
 
 class CFDatabaseIntrospection(SQLiteDatabaseIntrospection):
-    pass
+    """
+    SQLite introspection whose results are cached for the isolate's lifetime,
+    per database, as each PRAGMA and sqlite_master query is a round trip.
+    CFDatabase passes every CREATE, ALTER and DROP statement run on the
+    database to clear_cache(); schema changes made from other isolates aren't
+    seen until the isolate is recycled.
+    """
+
+    _cache = {}
+
+    def cache_key(self):
+        settings_dict = self.connection.settings_dict
+        return (
+            self.connection.alias, settings_dict.get('ENGINE'), settings_dict.get('NAME'),
+            settings_dict.get('CLOUDFLARE_BINDING'),
+        )
+
+    def clear_cache(self, query=None):
+        """
+        Forget what ``query`` may have changed: everything for tables and
+        views being created, dropped or renamed, or without a query; only the
+        per-table results otherwise, for the tables it names when it names them.
+        """
+        results = self._cache.get(self.cache_key())
+        if not results:
+            return
+        words = query.upper().split(None, 3) if query else []
+        if not words or (words[0] != 'ALTER' and words[1] in ('TABLE', 'VIEW', 'VIRTUAL', 'TEMP', 'TEMPORARY')) \
+                or ' RENAME ' in query.upper():
+            self._cache.pop(self.cache_key(), None)
+        elif words[0] == 'DROP':
+            # DROP INDEX and DROP TRIGGER don't name their table
+            for key in [key for key in results if len(key) > 1]:
+                del results[key]
+        else:
+            names = set(re.findall(r'"([^"]+)"', query))
+            for key in [key for key in results if len(key) > 1 and key[1] in names]:
+                del results[key]
+
+    def _cached(self, method, cursor, *args):
+        results = self._cache.setdefault(self.cache_key(), {})
+        key = (method.__name__,) + args
+        if key not in results:
+            results[key] = method(cursor, *args)
+        # Callers may modify what they get back
+        return copy.deepcopy(results[key])
+
+    def get_table_list(self, cursor):
+        return self._cached(super().get_table_list, cursor)
+
+    def get_table_description(self, cursor, table_name):
+        return self._cached(super().get_table_description, cursor, table_name)
+
+    def get_relations(self, cursor, table_name):
+        return self._cached(super().get_relations, cursor, table_name)
+
+    def get_primary_key_columns(self, cursor, table_name):
+        return self._cached(super().get_primary_key_columns, cursor, table_name)
+
+    def get_constraints(self, cursor, table_name):
+        return self._cached(super().get_constraints, cursor, table_name)
 
 
 class CFDatabaseCreation(SQLiteDatabaseCreation):
@@ -66,16 +155,223 @@ class CFDatabaseClient(SQLiteDatabaseClient):
 
 
 class CFDatabaseSchemaEditor(SQLiteDatabaseSchemaEditor):
+    """
+    Schema editor queueing its statements on the connection: a migration's
+    DDL and deferred SQL go out as one batch when the editor exits, or with
+    the next write (e.g. recording the migration) if that comes first.
+    """
+
     def __exit__(self, exc_type, exc_value, traceback):
+        database = self.connection.connection
         if exc_type is None:
             for sql in self.deferred_sql:
                 self.execute(sql)
+            if database is not None:
+                database.flush()
+        elif database is not None:
+            database.discard_queued()
         if self.atomic_migration:
             self.atomic.__exit__(exc_type, exc_value, traceback)
 
+    def execute(self, sql, params=()):
+        if self.collect_sql:
+            return super().execute(sql, params)
+        self.connection.ensure_connection()
+        with self.connection.connection.queueing():
+            super().execute(sql, params)
+
+    def table_sql(self, model):
+        sql, params = super().table_sql(model)
+        # Foreign keys using django_cf.db.deletion handlers get their ON DELETE action
+        for field in model._meta.local_fields:
+            action = on_delete_sql(field)
+            if action is None:
+                continue
+            column = max(sql.find(f'{start}{self.quote_name(field.column)} ') for start in ('(', ', '))
+            fk = sql.find(' DEFERRABLE INITIALLY DEFERRED', column)
+            if column != -1 and fk != -1:
+                sql = sql[:fk] + f' ON DELETE {action}' + sql[fk:]
+        return sql, params
+
+    def add_field(self, model, field):
+        if on_delete_sql(field) is not None:
+            # ALTER TABLE ADD COLUMN would add the foreign key without its action
+            self._remake_table(model, create_field=field)
+        else:
+            super().add_field(model, field)
+
+    def _remake_table(self, model, create_field=None, delete_field=None, alter_fields=None):
+        # Dropping the old table deletes its rows, which would fire the ON
+        # DELETE actions of the tables referencing it: they lose them meanwhile
+        referencing = referencing_fields(model)
+        if model in referencing:
+            raise NotSupportedError(
+                f"{model._meta.label} can't be remade: it references itself with an ON DELETE action, "
+                f"which dropping the old table would run."
+            )
+        removed = [delete_field.column] if delete_field is not None else []
+        removed += [old.column for old, new in alter_fields or () if old.column != new.column]
+        # SQLite drops the triggers with the old table
+        triggers = self._kept_triggers(model, [column for column in removed if column])
+        if referencing:
+            self._remake_referenced_table(model, referencing, create_field, delete_field, alter_fields)
+        else:
+            super()._remake_table(model, create_field, delete_field, alter_fields)
+        for sql in triggers:
+            self.execute(sql)
+
+    def _remake_referenced_table(self, model, referencing, create_field, delete_field, alter_fields):
+        stripped = {
+            child: [(field, without_action(field)) for field in fields] for child, fields in referencing.items()
+        }
+        for child, pairs in stripped.items():
+            self._remake_table(child, alter_fields=pairs)
+        # The children's rows reference the dropped table until the new one
+        # is renamed; switching the pragma off forgets those violations
+        self.execute('PRAGMA defer_foreign_keys = ON')
+        super()._remake_table(model, create_field, delete_field, alter_fields)
+        self.execute('PRAGMA defer_foreign_keys = OFF')
+        for child, pairs in stripped.items():
+            self._remake_table(child, alter_fields=[(new, old) for old, new in pairs])
+
+    def _kept_triggers(self, model, removed_columns=()):
+        """
+        SQL of the row counter and search index triggers on ``model``'s
+        table, to create again once the table is remade. Triggers using one
+        of ``removed_columns`` are left out with a warning.
+        """
+        from . import counts, search
+
+        table = model._meta.db_table
+        prefixes = (counts.trigger_name(table, ''), f'{search.index_table(model)}_')
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+            rows = cursor.fetchall()
+        statements = []
+        for name, sql in rows:
+            if not name.startswith(prefixes):
+                continue
+            lost = [column for column in removed_columns if mentions_column(sql, column)]
+            if lost:
+                logger.warning(
+                    "Trigger %s uses %s, which remaking %s removes; it isn't created again.",
+                    name, ', '.join(lost), table,
+                )
+            else:
+                statements.append(sql)
+        return statements
+
+    def remove_field(self, model, field):
+        if field.many_to_many or field.primary_key or field.unique:
+            return super().remove_field(model, field)
+        if field.db_parameters(connection=self.connection)["type"] is None:
+            return
+        indexes = self._indexes_blocking_drop(model, field.column)
+        if indexes is None:
+            # e.g. the column is in a unique constraint or a trigger: SQLite can't drop it in place
+            return super().remove_field(model, field)
+
+        for name in indexes:
+            self.execute(self._delete_index_sql(model, name))
+        self.execute(self.sql_delete_column % {
+            "table": self.quote_name(model._meta.db_table),
+            "column": self.quote_name(field.column),
+        })
+        for sql in list(self.deferred_sql):
+            if isinstance(sql, Statement) and sql.references_column(model._meta.db_table, field.column):
+                self.deferred_sql.remove(sql)
+
+    def _indexes_blocking_drop(self, model, column):
+        """
+        Names of the single-column indexes to drop before ALTER TABLE DROP
+        COLUMN can drop ``column``, or None if the table has to be remade.
+        """
+        table = model._meta.db_table
+        quoted = self.quote_name(column)
+        with self.connection.cursor() as cursor:
+            # One round trip instead of the introspection's query per index
+            cursor.execute(
+                "SELECT m.type, m.name, m.sql, i.name FROM sqlite_master m "
+                "LEFT JOIN pragma_index_info(m.name) i ON m.type = 'index' "
+                "WHERE m.tbl_name = %s OR m.type = 'view'",
+                [table],
+            )
+            rows = cursor.fetchall()
+
+        indexes = {}
+        for type_, name, sql, indexed in rows:
+            sql = sql or ''
+            if type_ == 'index':
+                indexes.setdefault(name, (sql, []))[1].append(indexed)
+            elif type_ == 'table':
+                # Table-level CHECK and UNIQUE constraints naming the column
+                if any(quoted in constraint for constraint in sql.split('CONSTRAINT ')[1:]):
+                    return None
+            elif mentions_column(sql, column):
+                # Triggers and views
+                return None
+
+        names = []
+        for name, (sql, columns) in indexes.items():
+            if column not in columns and quoted not in sql:
+                continue
+            # Unique, multi-column, expression and partial indexes
+            if not sql.startswith('CREATE INDEX') or columns != [column] or ' WHERE ' in sql:
+                return None
+            names.append(name)
+        return names
+
+    def _alter_field(self, model, old_field, new_field, old_type, new_type, old_db_params, new_db_params,
+                     strict=False):
+        # SQLite renames columns in place, foreign keys included; only the
+        # reference itself must be unchanged
+        if (
+            old_field.column != new_field.column
+            and self.column_sql(model, old_field) == self.column_sql(model, new_field)
+            and self._same_reference(old_field, new_field)
+        ):
+            return self.execute(self._rename_field_sql(model._meta.db_table, old_field, new_field, new_type))
+
+        # Adding or removing db_index is CREATE/DROP INDEX, not a new table
+        if (
+            old_field.db_index != new_field.db_index
+            and not (old_field.unique or new_field.unique)
+            and not self._field_should_be_altered(old_field, new_field, ignore={'db_index'})
+        ):
+            if new_field.db_index:
+                self.execute(self._create_index_sql(model, fields=[new_field]))
+            else:
+                for name in self._constraint_names(
+                    model, [old_field.column], index=True, type_=Index.suffix, unique=False, primary_key=False
+                ):
+                    self.execute(self._delete_index_sql(model, name))
+            return
+
+        return super()._alter_field(
+            model, old_field, new_field, old_type, new_type, old_db_params, new_db_params, strict
+        )
+
+    @staticmethod
+    def _same_reference(old_field, new_field):
+        old_fk = old_field.remote_field is not None and old_field.db_constraint
+        new_fk = new_field.remote_field is not None and new_field.db_constraint
+        if not (old_fk or new_fk):
+            return True
+        return old_fk and new_fk and (
+            old_field.remote_field.model._meta.db_table == new_field.remote_field.model._meta.db_table
+            and old_field.target_field.column == new_field.target_field.column
+            and on_delete_sql(old_field) == on_delete_sql(new_field)
+        )
+
+    def _field_should_be_altered(self, old_field, new_field, ignore=None):
+        # on_delete doesn't change the schema for Django's own handlers
+        return on_delete_sql(old_field) != on_delete_sql(new_field) or super()._field_should_be_altered(
+            old_field, new_field, ignore
+        )
+
 
 class CFDatabaseOperations(SQLiteDatabaseOperations):
-    pass
+    compiler_module = "django_cf.db.compiler"
 
     # This patches some weird bugs related to the Database class
     def _quote_params_for_last_executed_query(self, params):
@@ -149,9 +445,13 @@ class CFDatabaseFeatures(SQLiteDatabaseFeatures):
     create_test_procedure_without_params_sql = None
     create_test_procedure_with_int_param_sql = None
     supports_aggregate_filter_clause = True
+    # QuerySet.iterator() fetches each chunk with its own keyset query
+    supports_keyset_chunked_reads = True
     can_defer_constraint_checks = False
     supports_pragma_foreign_key_check = False
-    can_alter_table_rename_column = False
+    can_alter_table_rename_column = True
+    # D1 and Durable Objects run SQLite >= 3.35, whatever the local sqlite3 module is
+    can_alter_table_drop_column = True
     max_query_params = 100
     supports_forward_references = False
     has_bulk_insert = True
@@ -166,12 +466,24 @@ class CFDatabaseFeatures(SQLiteDatabaseFeatures):
 class CFResult:
     lastrowid = None
     rowcount = -1
+    rows_read = 0
+    rows_written = 0
 
     def __init__(self, data):
         self.data = data
+        # Rows are handed out front to back; data is kept whole for the caches
+        self._position = 0
 
     def __iter__(self):
-        return iter(self.data)
+        return iter(self.data[self._position:])
+
+    def copy(self):
+        instance = CFResult(list(self.data[self._position:]))
+        instance.lastrowid = self.lastrowid
+        instance.rowcount = self.rowcount
+        instance.rows_read = self.rows_read
+        instance.rows_written = self.rows_written
+        return instance
 
     def set_lastrowid(self, value):
         self.lastrowid = value
@@ -180,31 +492,30 @@ class CFResult:
         self.rowcount = value
 
     def fetchone(self):
-        if len(self.data) > 0:
-            return self.data.pop()
+        if self._position < len(self.data):
+            row = self.data[self._position]
+            self._position += 1
+            return row
         return None
 
     def fetchall(self):
-        ret = []
-        while True:
-            row = self.fetchone()
-            if row is None:
-                break
-            ret.append(row)
+        ret = self.data[self._position:]
+        self._position = len(self.data)
         return ret
 
     def fetchmany(self, size=1):
-        ret = []
-        while size > 0:
-            row = self.fetchone()
-            if row is None:
-                break
-            ret.append(row)
-            if size is not None:
-                size -= 1
-
+        if size is None:
+            return self.fetchall()
+        ret = self.data[self._position:self._position + size]
+        self._position += len(ret)
         return ret
 
+    @staticmethod
+    def to_row(row, jsnull=None):
+        """A row converted from JS, as a tuple with jsnull turned into None."""
+        values = row if isinstance(row, list) else row.values()
+        return tuple(None if v is jsnull else v for v in values)
+
     @staticmethod
     def from_object(query, params, data, rows_read=None, rows_written=None, last_row_id=None):
         try:
@@ -212,34 +523,19 @@ class CFResult:
         except ImportError:
             jsnull = None
 
-        result = []
-
-        for row in data:
-            row_items = ()
-            if isinstance(row, list):
-                for v in row:
-                    if v is jsnull:
-                        row_items += (None,)
-                    else:
-                        row_items += (v,)
-            else:
-                for k, v in row.items():
-                    if v is jsnull:
-                        row_items += (None,)
-                    else:
-                        row_items += (v,)
-
-            result.append(row_items)
+        result = [CFResult.to_row(row, jsnull) for row in data]
 
         instance = CFResult(result)
+        instance.rows_read = rows_read or 0
+        instance.rows_written = rows_written or 0
 
-        if rows_read or rows_written:
-            if "INSERT" in query.upper():
-                instance.set_rowcount(rows_written or 0)
-            elif "UPDATE" in query.upper() or "DELETE" in query.upper():
+        # rowcount is the rows changed or returned; the rows the database
+        # scanned for them are rows_read
+        if any(keyword in query.upper() for keyword in ("INSERT", "UPDATE", "DELETE")):
+            if rows_read or rows_written:
                 instance.set_rowcount(rows_written or 0)
-            else:
-                instance.set_rowcount(rows_read or 0)
+        else:
+            instance.set_rowcount(len(result))
 
         if last_row_id is not None:
             instance.set_lastrowid(last_row_id)
@@ -247,9 +543,160 @@ class CFResult:
         return instance
 
 
+class CFCursorResult(CFResult):
+    """
+    A CFResult pulling its rows from a live database cursor as they are
+    fetched, instead of holding the whole result. ``rows`` is an iterator of
+    row tuples and ``cursor`` the database's cursor, whose rowsRead and
+    rowsWritten only cover the rows pulled so far. ``on_close`` is called
+    once the rows run out or the result is closed.
+    """
+
+    def __init__(self, rows, cursor=None, on_close=None):
+        super().__init__([])
+        self._rows = rows
+        self._cursor = cursor
+        self.on_close = on_close
+
+    @property
+    def rows_read(self):
+        return getattr(self._cursor, 'rowsRead', 0) or 0
+
+    @property
+    def rows_written(self):
+        return getattr(self._cursor, 'rowsWritten', 0) or 0
+
+    @property
+    def closed(self):
+        return self._rows is None
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def copy(self):
+        # Whatever is copied has to be read now; this result keeps serving it
+        self.data, self._position = self.fetchall(), 0
+        instance = CFResult(list(self.data))
+        instance.rows_read = self.rows_read
+        instance.rows_written = self.rows_written
+        return instance
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        return self.fetchmany(None)
+
+    def fetchmany(self, size=1):
+        # Rows buffered by copy() go first
+        end = len(self.data) if size is None else self._position + size
+        buffered = self.data[self._position:end]
+        self._position += len(buffered)
+        if self._rows is None or (size is not None and len(buffered) == size):
+            return buffered
+        pulled = list(islice(self._rows, None if size is None else size - len(buffered)))
+        if size is None or len(buffered) + len(pulled) < size:
+            self.close()
+        return buffered + pulled
+
+    def close(self):
+        if self._rows is None:
+            return
+        self._rows = None
+        if self.on_close is not None:
+            self.on_close()
+
+
+class CFStreamingCursor:
+    """
+    Cursor for chunked reads (see DatabaseWrapper.chunked_cursor()) on
+    backends that can stream: its SELECTs run inside CFDatabase.streaming(),
+    and it keeps its own result, so statements run while its rows are being
+    read don't replace them.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.result = CFResult([])
+
+    def execute(self, query, params=None):
+        with self.database.streaming():
+            self.database.execute(query, params)
+        self.result = self.database.lastResult
+        return self
+
+    def fetchone(self):
+        return self.result.fetchone()
+
+    def fetchmany(self, size=1):
+        return self.result.fetchmany(size)
+
+    def fetchall(self):
+        return self.result.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.result.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.result.rowcount
+
+    def close(self):
+        if isinstance(self.result, CFCursorResult):
+            self.result.close()
+
+
+class QueryPlanned(Exception):
+    """
+    Raised by CFDatabase.execute() while the connection is planning, in place
+    of sending the statement to the database.
+    """
+
+    def __init__(self, query, params):
+        super().__init__(query)
+        self.query = query
+        self.params = params
+
+
+def query_key(query, params):
+    """Hashable key for a statement, or None when the params can't be hashed."""
+    try:
+        key = (query, tuple(params) if params is not None else None)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 class CFDatabase:
     def __init__(self, database_wrapper):
         self.databaseWrapper = database_wrapper
+        self._planning = False
+        self._primed = {}
+        self._queueing = False
+        self._queued = []
+        self._streaming = False
+
+        from .nplusone import NPlusOneDetector
+        from .slowlog import SlowQueryLog
+        from .statements import StatementStatsCollector
+        settings_dict = getattr(database_wrapper, 'settings_dict', None)
+        self.nplusone = NPlusOneDetector.from_settings(settings_dict)
+        self.slow_query_log = SlowQueryLog.from_settings(settings_dict)
+        self.statement_stats = StatementStatsCollector.from_settings(settings_dict, database_wrapper)
+
+        # Result caches, fastest first
+        from .cache import ColoQueryCache, QueryCache, RequestCache
+        self.request_cache = RequestCache.from_settings(settings_dict)
+        self.result_caches = [
+            cache for cache in (
+                self.request_cache,
+                QueryCache.from_settings(settings_dict),
+                ColoQueryCache.from_settings(settings_dict),
+            ) if cache is not None
+        ]
 
     DataError = DataError
 
@@ -303,12 +750,14 @@ class CFDatabase:
     def rowcount(self):
         return self.lastResult.rowcount
 
-    def execute(self, query, params=None) -> None:
+    @staticmethod
+    def prepare_query(query, params=None):
+        """Rewrite a statement and its params into the form sent to the database."""
         from decimal import Decimal
-        
+
         # Transform django_date_trunc function calls to SQLite equivalents
         query = replace_date_trunc_in_sql(query)
-        
+
         if params:
             newParams = []
             for v in list(params):
@@ -323,14 +772,249 @@ class CFDatabase:
 
             params = tuple(newParams)
 
-        self.lastResult = self.databaseWrapper.run_query(query, params)
+        return query, params
+
+    @contextmanager
+    def planning(self):
+        """
+        Record statements instead of running them: inside this block the first
+        execute() raises QueryPlanned carrying the prepared statement.
+        """
+        previous = self._planning
+        self._planning = True
+        try:
+            yield
+        finally:
+            self._planning = previous
+
+    @contextmanager
+    def primed(self, results):
+        """
+        Serve the given ((query, params), CFResult) pairs from memory the next
+        time an identical statement is executed inside this block.
+        """
+        added = []
+        for (query, params), result in results:
+            key = query_key(query, params)
+            if key is None:
+                continue
+            self._primed.setdefault(key, []).append(result)
+            added.append((key, result))
+        try:
+            yield
+        finally:
+            # Drop whatever this block primed but never consumed
+            for key, result in added:
+                pending = self._primed.get(key)
+                if pending is None:
+                    continue
+                pending[:] = [r for r in pending if r is not result]
+                if not pending:
+                    del self._primed[key]
+
+    @contextmanager
+    def queueing(self):
+        """
+        Queue the statements executed inside this block instead of running
+        them. Queued statements are sent as one batch by flush(), or together
+        with the next write executed outside the block; a read flushes them
+        first.
+        """
+        previous = self._queueing
+        self._queueing = True
+        try:
+            yield
+        finally:
+            self._queueing = previous
+
+    @contextmanager
+    def streaming(self):
+        """
+        Let the backend return reads executed inside this block as a
+        CFCursorResult over its live cursor. Streamed reads skip the result
+        caches and are recorded on the stats once their rows run out.
+        """
+        previous = self._streaming
+        self._streaming = True
+        try:
+            yield
+        finally:
+            self._streaming = previous
+
+    def flush(self, statements=()):
+        """Send the queued statements, followed by ``statements``, as one batch and return their results."""
+        statements, self._queued = self._queued + list(statements), []
+        if not statements:
+            return []
+        for query, _ in statements:
+            if is_schema_query(query):
+                self.databaseWrapper.introspection.clear_cache(query)
+        results = self.run_batch(statements)
+        for cache in self.result_caches:
+            for query, _ in statements:
+                if not is_read_only_query(query):
+                    cache.invalidate(query)
+        return results
+
+    def discard_queued(self):
+        self._queued = []
+
+    def execute(self, query, params=None) -> None:
+        query, params = self.prepare_query(query, params)
+
+        if self._planning:
+            raise QueryPlanned(query, params)
+
+        if is_schema_query(query):
+            self.databaseWrapper.introspection.clear_cache(query)
+
+        if self._queueing:
+            self._queued.append((query, params))
+            self.lastResult = CFResult([])
+            return self
+
+        if self._queued:
+            if is_read_only_query(query):
+                self.flush()
+            else:
+                self.lastResult = self.flush([(query, params)])[-1]
+                return self
+
+        if self._primed:
+            pending = self._primed.get(query_key(query, params))
+            if pending:
+                self.lastResult = pending.pop(0)
+                return self
+
+        if self.nplusone is not None:
+            self.nplusone.record(query)
+
+        if not self.result_caches or self._streaming:
+            self.lastResult = self.run_query(query, params)
+            return self
+
+        key = query_key(query, params)
+        read_only = is_read_only_query(query)
+        if read_only and key is not None:
+            for index, cache in enumerate(self.result_caches):
+                cached = cache.get(key)
+                if cached is not None:
+                    for faster in self.result_caches[:index]:
+                        faster.set(key, cached)
+                    stats.current().record_cached()
+                    self.lastResult = cached
+                    return self
+
+        self.lastResult = self.run_query(query, params)
+
+        for cache in self.result_caches:
+            if not read_only:
+                cache.invalidate(query)
+            elif key is not None:
+                cache.set(key, self.lastResult)
 
         return self
 
+    def run_query(self, query, params):
+        """Send a prepared statement to the database and record it on the request's stats."""
+        start = time.perf_counter()
+        result = self.databaseWrapper.run_query(query, params)
+        duration = (time.perf_counter() - start) * 1000
+        if isinstance(result, CFCursorResult) and not result.closed:
+            # Rows read are only known once the cursor has been read through
+            result.on_close = lambda: self.record_query(query, params, duration, result)
+        else:
+            self.record_query(query, params, duration, result)
+        return result
+
+    def record_query(self, query, params, duration, result):
+        """Record a statement that took ``duration`` ms on the request's stats."""
+        rows_read, rows_written = getattr(result, 'rows_read', 0), getattr(result, 'rows_written', 0)
+        stats.current().record(query, duration, rows_read, rows_written)
+        if self.statement_stats is not None:
+            self.statement_stats.record(query, params, duration, rows_read, rows_written)
+        if self.slow_query_log is not None:
+            self.slow_query_log.record(self.databaseWrapper, query, params, duration, result)
+        budget.check()
+
+    def run_queries(self, statements):
+        """
+        Send prepared statements together through the wrapper's run_queries()
+        and record them; the batch's wall time is counted once per request.
+        """
+        start = time.perf_counter()
+        results = self.databaseWrapper.run_queries(statements)
+        duration = (time.perf_counter() - start) * 1000
+        stats.current().record(
+            '; '.join(query for query, _ in statements), duration,
+            sum(result.rows_read for result in results), sum(result.rows_written for result in results),
+            count=len(results),
+        )
+        if self.statement_stats is not None:
+            for (query, params), result in zip(statements, results):
+                self.statement_stats.record(query, params, duration, result.rows_read, result.rows_written)
+        budget.check()
+        return results
+
+    def run_batch(self, statements):
+        """
+        Send prepared statements in order through the wrapper's run_batch()
+        and record them as a single round trip.
+        """
+        start = time.perf_counter()
+        results = self.databaseWrapper.run_batch(statements)
+        duration = (time.perf_counter() - start) * 1000
+        stats.current().record(
+            '; '.join(query for query, _ in statements), duration,
+            sum(result.rows_read for result in results), sum(result.rows_written for result in results),
+            count=len(results),
+        )
+        if self.statement_stats is not None:
+            for (query, params), result in zip(statements, results):
+                self.statement_stats.record(query, params, duration, result.rows_read, result.rows_written)
+        budget.check()
+        return results
+
+    def end_request(self):
+        """Drop state that only lives for one request."""
+        if self.request_cache is not None:
+            self.request_cache.clear()
+        if self.nplusone is not None:
+            self.nplusone.clear()
+
     def close(self):
         return
 
 
+def end_request(**kwargs):
+    """request_started/request_finished receiver resetting per-request state on CF connections."""
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        if isinstance(conn, CFDatabaseWrapper) and isinstance(conn.connection, CFDatabase):
+            conn.connection.end_request()
+
+
+signals.request_started.connect(end_request)
+signals.request_finished.connect(end_request)
+
+
+def is_schema_query(query: str) -> bool:
+    """Whether ``query`` changes the schema (CREATE, ALTER or DROP)."""
+    words = query.split(None, 1)
+    return bool(words) and words[0].upper() in ('CREATE', 'ALTER', 'DROP')
+
+
+def table_exists(connection, table) -> bool:
+    """
+    Whether ``table`` exists, looked up in sqlite_master: D1's errors don't
+    keep SQLite's message, so a "no such table" error can't be told apart.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [table])
+        return cursor.fetchone() is not None
+
+
 def is_read_only_query(query: str) -> bool:
     parsed = sqlparse.parse(query.strip())
 
@@ -475,3 +1159,26 @@ class CFDatabaseWrapper(SQLiteDatabaseWrapper):
 
     def run_query(self, query, params=None) -> CFResult:
         raise NotImplementedError()
+
+    def run_queries(self, statements) -> list:
+        """
+        Run independent (query, params) statements, returning one CFResult per
+        statement in the same order. Backends that can overlap round trips
+        override this; the default runs them one after another.
+        """
+        return [self.run_query(query, params) for query, params in statements]
+
+    async def run_queries_async(self, statements) -> list:
+        """
+        Awaitable run_queries() for work scheduled after the response (see
+        ctx.waitUntil). The default runs the statements synchronously.
+        """
+        return self.run_queries(statements)
+
+    def run_batch(self, statements) -> list:
+        """
+        Run dependent (query, params) statements strictly in order, returning
+        one CFResult per statement. Backends that can send them in a single
+        round trip override this; the default runs them one after another.
+        """
+        return [self.run_query(query, params) for query, params in statements]
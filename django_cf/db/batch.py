@@ -0,0 +1,158 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Prefetch, QuerySet
+from django.db.models import prefetch_related_objects as django_prefetch_related_objects
+from django.db.models.constants import LOOKUP_SEP
+
+
+def evaluate(item):
+    """Evaluate a queryset in place, or call a zero-argument query function."""
+    if isinstance(item, QuerySet):
+        item._fetch_all()
+        return item
+    return item()
+
+
+def plan(database, item):
+    """
+    Dry-run ``item`` against a CFDatabase and return the first statement it
+    would send as ``(query, params)``.
+
+    Returns ``(None, value)`` when the item finished without touching the
+    database (for example an already evaluated queryset).
+    """
+    from .base_engine import QueryPlanned
+
+    with database.planning():
+        try:
+            value = evaluate(item)
+        except QueryPlanned as planned:
+            return (planned.query, planned.params), None
+
+    return None, value
+
+
+def run_planned(connection, statements):
+    """
+    Run the planned read-only statements together and return the
+    ``((query, params), CFResult)`` pairs ready to be primed.
+    """
+    from .base_engine import is_read_only_query, query_key
+
+    # Writes keep their place in program order, only reads are sent ahead
+    statements = [statement for statement in statements if is_read_only_query(statement[0])]
+    if not statements:
+        return []
+
+    # Identical statements run once and every caller gets its own copy
+    unique = {}
+    for statement in statements:
+        unique.setdefault(query_key(*statement) or id(statement), statement)
+    results = dict(zip(unique, connection.connection.run_queries(list(unique.values()))))
+
+    return [(statement, results[query_key(*statement) or id(statement)].copy()) for statement in statements]
+
+
+def gather(*items, using=DEFAULT_DB_ALIAS):
+    """
+    Run independent queries concurrently and return their results in order.
+
+    Each item is either a QuerySet, which is evaluated in place and returned
+    with its result cache filled, or a zero-argument callable such as
+    ``qs.count`` or ``lambda: qs.aggregate(Sum('total'))``, whose return value
+    is used.
+
+    Items are first dry-run to capture the SQL they would send, the captured
+    statements are submitted together through the backend's run_queries(),
+    and then every item is evaluated normally with its result already waiting
+    in the connection. A dashboard pays for its slowest query instead of the
+    sum of them.
+
+    Callables are called twice (once to plan, once for real) and only their
+    first query is sent ahead, so they should be plain query thunks without
+    side effects. On non-Cloudflare databases the items are evaluated one
+    after another.
+    """
+    from .base_engine import CFDatabaseWrapper
+
+    connection = connections[using]
+    if not isinstance(connection, CFDatabaseWrapper):
+        return [evaluate(item) for item in items]
+
+    connection.ensure_connection()
+    database = connection.connection
+
+    values = {}
+    statements = []
+    for index, item in enumerate(items):
+        statement, value = plan(database, item)
+        if statement is None:
+            values[index] = value
+        else:
+            statements.append(statement)
+
+    with database.primed(run_planned(connection, statements)):
+        return [
+            values[index] if index in values else evaluate(item)
+            for index, item in enumerate(items)
+        ]
+
+
+def prefetch_related_objects(model_instances, *related_lookups, using=DEFAULT_DB_ALIAS):
+    """
+    Drop-in for Django's prefetch_related_objects() that sends all prefetch
+    queries at the same depth together.
+
+    Lookups are walked one level at a time: ``('a', 'b', 'c__d')`` first
+    plans the ``a``, ``b`` and ``c`` queries and runs them in one
+    run_queries() call, then does the same for ``c__d``. Each level is then
+    applied with Django's own prefetch_related_objects(), which finds its
+    results already waiting, so prefetch semantics are unchanged.
+    """
+    from .base_engine import CFDatabaseWrapper
+
+    connection = connections[using]
+    if not model_instances or not isinstance(connection, CFDatabaseWrapper):
+        return django_prefetch_related_objects(model_instances, *related_lookups)
+
+    connection.ensure_connection()
+    database = connection.connection
+
+    # Paths filled by a Prefetch's to_attr, which later lookups go through
+    # once that Prefetch has run instead of prefetching them again
+    to_attrs = {
+        lookup.prefetch_to for lookup in related_lookups
+        if isinstance(lookup, Prefetch) and lookup.prefetch_to != lookup.prefetch_through
+    }
+
+    depth = 1
+    while True:
+        stage = []
+        for lookup in related_lookups:
+            through = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+            levels = through.split(LOOKUP_SEP)
+            if len(levels) > depth:
+                # Intermediate levels always use the default queryset
+                if LOOKUP_SEP.join(levels[:depth]) not in to_attrs:
+                    stage.append(LOOKUP_SEP.join(levels[:depth]))
+            elif len(levels) == depth:
+                stage.append(lookup)
+
+        if not stage:
+            return
+
+        statements = []
+        for lookup in stage:
+            try:
+                statement, _ = plan(
+                    database, lambda lookup=lookup: django_prefetch_related_objects(model_instances, lookup)
+                )
+            except (AttributeError, ValueError):
+                # Not plannable on its own; Django runs it with the stage below
+                continue
+            if statement is not None:
+                statements.append(statement)
+
+        with database.primed(run_planned(connection, statements)):
+            django_prefetch_related_objects(model_instances, *stage)
+
+        depth += 1
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from .deletion import cascaded_tables
+from .sql import query_tables
+
+logger = logging.getLogger(__name__)
+
+
+class BaseQueryCache:
+    """
+    Common settings of the query result caches: which models are cached and
+    for how long. Subclasses implement get(key), set(key, result) and
+    invalidate(query), where key is the statement's (query, params) pair.
+    """
+
+    def __init__(self, models, max_rows=1000):
+        self.models = models
+        self.max_rows = max_rows
+        self._timeouts = None
+
+    @property
+    def timeouts(self):
+        """TTL per table name, resolved from the model labels on first use."""
+        if self._timeouts is None:
+            from django.apps import apps
+
+            self._timeouts = {
+                apps.get_model(label)._meta.db_table: timeout
+                for label, timeout in self.models.items()
+            }
+        return self._timeouts
+
+    def timeout_for(self, tables):
+        if not tables or not tables.issubset(self.timeouts):
+            return None
+        return min(self.timeouts[table] for table in tables)
+
+
+class QueryCache(BaseQueryCache):
+    """
+    Isolate-level read-through cache of SELECT results.
+
+    Enabled per database with the ``QUERY_CACHE`` key::
+
+        DATABASES = {
+            'default': {
+                'ENGINE': 'django_cf.db.backends.d1',
+                'CLOUDFLARE_BINDING': 'DB',
+                'QUERY_CACHE': {
+                    'MODELS': {'sites.Site': 300, 'blog.Category': 60},  # label -> TTL in seconds
+                    'MAX_ENTRIES': 500,
+                    'MAX_ROWS': 1000,
+                },
+            }
+        }
+
+    Only statements whose tables all belong to the listed models are cached,
+    for the shortest TTL among them. Writes executed by this isolate drop the
+    entries of every table they touch; writes from other isolates are only
+    picked up when the TTL runs out.
+    """
+
+    def __init__(self, models, max_entries=1000, max_rows=1000):
+        super().__init__(models, max_rows=max_rows)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tables, result)
+
+    @classmethod
+    def from_settings(cls, settings_dict):
+        options = settings_dict.get('QUERY_CACHE') if isinstance(settings_dict, dict) else None
+        if not isinstance(options, dict) or not options.get('MODELS'):
+            return None
+
+        return cls(
+            options['MODELS'],
+            max_entries=options.get('MAX_ENTRIES', 1000),
+            max_rows=options.get('MAX_ROWS', 1000),
+        )
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return result.copy()
+
+    def set(self, key, result):
+        if len(result.data) > self.max_rows:
+            return
+
+        tables = query_tables(key[0])
+        timeout = self.timeout_for(tables)
+        if timeout is None:
+            return
+
+        self._entries[key] = (time.monotonic() + timeout, tables, result.copy())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, query):
+        """Drop the entries of every table a write touches (all of them if unknown)."""
+        tables = query_tables(query)
+        if not tables:
+            self._entries.clear()
+            return
+
+        tables = cascaded_tables(tables)
+
+        for key, (_, entry_tables, _) in list(self._entries.items()):
+            if entry_tables & tables:
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class RequestCache:
+    """
+    Per-request memo of read results (an identity map for statements).
+
+    Enabled per database with ``'REQUEST_CACHE': True``. An identical
+    read-only statement with identical params is answered from memory until
+    the connection executes any write or the request ends (Django's
+    request_started/request_finished signals), so repeated lookups in
+    templates and middleware cost one round trip. Statements using RANDOM()
+    are never memoized.
+    """
+
+    def __init__(self, max_rows=1000):
+        self.max_rows = max_rows
+        self._entries = {}
+
+    @classmethod
+    def from_settings(cls, settings_dict):
+        options = settings_dict.get('REQUEST_CACHE') if isinstance(settings_dict, dict) else None
+        if options is True:
+            return cls()
+        if isinstance(options, dict):
+            return cls(max_rows=options.get('MAX_ROWS', 1000))
+        return None
+
+    def get(self, key):
+        result = self._entries.get(key)
+        return result.copy() if result is not None else None
+
+    def set(self, key, result):
+        if len(result.data) > self.max_rows or 'RANDOM(' in key[0].upper():
+            return
+        self._entries[key] = result.copy()
+
+    def invalidate(self, query):
+        self._entries.clear()
+
+    def clear(self):
+        self._entries.clear()
+
+
+class ColoQueryCache(BaseQueryCache):
+    """
+    Query result cache shared by every isolate in a colo, stored with the
+    Workers Cache API (``caches.default``).
+
+    Enabled per database with the ``COLO_CACHE`` key::
+
+        'COLO_CACHE': {
+            'MODELS': {'blog.Category': 300},      # label -> TTL in seconds
+            'VERSIONS_BINDING': 'QUERY_VERSIONS',  # KV namespace holding table versions
+            'VERSIONS_TIMEOUT': 5,                 # seconds a version is trusted in memory
+            'MAX_ROWS': 1000,
+        }
+
+    Entries are keyed on the SQL, the params and the current version of each
+    table involved. A write stores a new version for the tables it touches in
+    KV, so every colo stops finding the old entries as soon as KV propagates
+    the change; nothing has to be purged. Cache or KV failures are logged and
+    treated as misses.
+    """
+
+    url_prefix = 'https://django-cf.cache/query/'
+    version_prefix = 'django_cf:table_version:'
+
+    def __init__(self, models, versions_binding, versions_timeout=5, max_rows=1000):
+        super().__init__(models, max_rows=max_rows)
+        self.versions_binding = versions_binding
+        self.versions_timeout = versions_timeout
+        self._versions = {}  # table -> (expires_at, version)
+        self._run_sync = None
+
+    @classmethod
+    def from_settings(cls, settings_dict):
+        options = settings_dict.get('COLO_CACHE') if isinstance(settings_dict, dict) else None
+        if not isinstance(options, dict) or not options.get('MODELS'):
+            return None
+
+        if not options.get('VERSIONS_BINDING'):
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured(
+                "settings.DATABASES is improperly configured. "
+                "Please supply the COLO_CACHE VERSIONS_BINDING value."
+            )
+
+        return cls(
+            options['MODELS'],
+            options['VERSIONS_BINDING'],
+            versions_timeout=options.get('VERSIONS_TIMEOUT', 5),
+            max_rows=options.get('MAX_ROWS', 1000),
+        )
+
+    def run_sync(self, awaitable):
+        if self._run_sync is None:
+            from pyodide.ffi import run_sync
+            self._run_sync = run_sync
+        return self._run_sync(awaitable)
+
+    def _kv(self):
+        from workers import env
+        return getattr(env, self.versions_binding)
+
+    def versions(self, tables):
+        """Current version of each table, read from KV unless recently seen."""
+        now = time.monotonic()
+        versions = {}
+        missing = []
+        for table in sorted(tables):
+            entry = self._versions.get(table)
+            if entry is not None and entry[0] > now:
+                versions[table] = entry[1]
+            else:
+                missing.append(table)
+
+        if missing:
+            from js import Promise
+            from pyodide.ffi import to_js
+
+            kv = self._kv()
+            values = self.run_sync(Promise.all(to_js([kv.get(self.version_prefix + table) for table in missing])))
+            for table, value in zip(missing, values):
+                version = value if isinstance(value, str) else '0'
+                self._versions[table] = (now + self.versions_timeout, version)
+                versions[table] = version
+
+        return versions
+
+    def url(self, key, versions):
+        query, params = key
+        payload = json.dumps([query, params, sorted(versions.items())], default=str)
+        return self.url_prefix + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        tables = query_tables(key[0])
+        if self.timeout_for(tables) is None:
+            return None
+
+        try:
+            from js import caches
+
+            url = self.url(key, self.versions(tables))
+            response = self.run_sync(caches.default.match(url))
+            if not response:
+                return None
+            rows = json.loads(self.run_sync(response.text()))
+        except Exception as e:
+            logger.warning(f"Colo query cache read failed: {repr(e)}")
+            return None
+
+        from .base_engine import CFResult
+
+        result = CFResult([tuple(row) for row in rows])
+        result.set_rowcount(len(rows))
+        return result
+
+    def set(self, key, result):
+        if len(result.data) > self.max_rows:
+            return
+
+        tables = query_tables(key[0])
+        timeout = self.timeout_for(tables)
+        if timeout is None:
+            return
+
+        try:
+            body = json.dumps([list(row) for row in result.data])
+        except (TypeError, ValueError):
+            return  # e.g. binary columns
+
+        try:
+            from js import Object, Response, caches
+            from pyodide.ffi import to_js
+
+            headers = to_js({'Cache-Control': f'max-age={timeout}', 'Content-Type': 'application/json'},
+                            dict_converter=Object.fromEntries)
+            response = Response.new(body, headers=headers)
+            self.run_sync(caches.default.put(self.url(key, self.versions(tables)), response))
+        except Exception as e:
+            logger.warning(f"Colo query cache write failed: {repr(e)}")
+
+    def invalidate(self, query):
+        """Store a new version for every cached table the write touches."""
+        tables = cascaded_tables(query_tables(query)) & set(self.timeouts)
+        if not tables:
+            return
+
+        version = str(time.time_ns())
+        try:
+            from js import Promise
+            from pyodide.ffi import to_js
+
+            kv = self._kv()
+            self.run_sync(Promise.all(to_js([kv.put(self.version_prefix + table, version) for table in tables])))
+        except Exception as e:
+            logger.error(f"Colo query cache invalidation failed for {sorted(tables)}: {repr(e)}")
+
+        expires_at = time.monotonic() + self.versions_timeout
+        for table in tables:
+            self._versions[table] = (expires_at, version)
@@ -0,0 +1,43 @@
+"""
+SQL compilers of the Cloudflare backends (DatabaseOperations.compiler_module).
+"""
+from itertools import chain
+
+from django.db.models.sql import compiler
+from django.db.models.sql.compiler import (  # NOQA
+    SQLAggregateCompiler, SQLDeleteCompiler, SQLInsertCompiler, SQLUpdateCompiler,
+)
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI
+
+from . import keyset
+from .converters import apply_converters, convert_chunks
+
+
+class SQLCompiler(compiler.SQLCompiler):
+    def execute_sql(self, result_type=MULTI, chunked_fetch=False, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        # D1 returns a statement's whole result at once; QuerySet.iterator()
+        # instead runs one keyset query per chunk
+        if result_type == MULTI and chunked_fetch and self.connection.features.supports_keyset_chunked_reads:
+            chunks = keyset.chunked_results(self, chunk_size)
+            if chunks is not None:
+                return chunks
+        return super().execute_sql(result_type, chunked_fetch, chunk_size)
+
+    def results_iter(self, results=None, tuple_expected=False, chunked_fetch=False,
+                     chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        if results is None:
+            results = self.execute_sql(MULTI, chunked_fetch=chunked_fetch, chunk_size=chunk_size)
+        fields = [s[0] for s in self.select[0:self.col_count]]
+        converters = self.get_converters(fields)
+        if converters:
+            # Each fetched chunk is converted a column at a time
+            results = convert_chunks(self, results, converters)
+        rows = chain.from_iterable(results)
+        if self.has_composite_fields(fields):
+            rows = self.composite_fields_to_tuples(rows, fields)
+        if tuple_expected:
+            rows = map(tuple, rows)
+        return rows
+
+    def apply_converters(self, rows, converters):
+        return apply_converters(self, rows, converters)
@@ -0,0 +1,120 @@
+"""
+Column-at-a-time conversion of query results.
+
+Django converts results row by row: each value of a converted column goes
+through ``converter(value, expression, connection)`` for every converter of
+the column. The Cloudflare compiler instead takes the rows a chunk at a
+time, as they were fetched, turns the chunk into columns and runs each
+column through its converters with one list comprehension per converter.
+
+The converters are resolved once per query. The SQLite backend's own
+converters (dates and times, Decimal, UUID and booleans) are replaced by
+versions working on a whole column, which leave None and values already of
+the right type alone without a call. Converters of fields and expressions,
+such as from_db_value(), are applied as they are.
+"""
+import datetime
+import decimal
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.db.models.expressions import Col
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+BOOLEANS = {0: False, 1: True}
+
+
+def parsing(value_type, parse):
+    """Column converter parsing the values that aren't None or ``value_type`` yet."""
+    def convert(column):
+        return [v if v is None or isinstance(v, value_type) else parse(v) for v in column]
+    return convert
+
+
+def aware(tz):
+    """Column converter making naive datetimes aware in ``tz``."""
+    def convert(column):
+        return [v if v is None or timezone.is_aware(v) else timezone.make_aware(v, tz) for v in column]
+    return convert
+
+
+def backend_converters(connection, expression):
+    """
+    Column versions of the SQLite backend's get_db_converters(expression),
+    or None for converters that have none.
+    """
+    internal_type = expression.output_field.get_internal_type()
+    if internal_type == 'DateTimeField':
+        converters = [parsing(datetime.datetime, parse_datetime)]
+        if settings.USE_TZ:
+            converters.append(aware(connection.timezone))
+        return converters
+    if internal_type == 'DateField':
+        return [parsing(datetime.date, parse_date)]
+    if internal_type == 'TimeField':
+        return [parsing(datetime.time, parse_time)]
+    if internal_type == 'UUIDField':
+        return [lambda column: [None if v is None else uuid.UUID(v) for v in column]]
+    if internal_type == 'BooleanField':
+        get = BOOLEANS.get
+        return [lambda column: [get(v, v) for v in column]]
+    if internal_type == 'DecimalField':
+        # SQLite stores only 15 significant digits, see get_decimalfield_converter()
+        create_decimal = decimal.Context(prec=15).create_decimal_from_float
+        if not isinstance(expression, Col):
+            return [lambda column: [None if v is None else create_decimal(v) for v in column]]
+        quantum = decimal.Decimal(1).scaleb(-expression.output_field.decimal_places)
+        context = expression.output_field.context
+        return [lambda column: [None if v is None else create_decimal(v).quantize(quantum, context=context) for v in column]]
+    return None
+
+
+def row_converter(converter, expression, connection):
+    """Column version of a ``converter(value, expression, connection)``."""
+    return lambda column: [converter(v, expression, connection) for v in column]
+
+
+def column_converters(connection, converters):
+    """
+    ``(position, column converters)`` pairs for the ``{position:
+    (converters, expression)}`` of SQLCompiler.get_converters().
+    """
+    resolved = []
+    for position, (row_converters, expression) in converters.items():
+        # The backend's converters come first, see SQLCompiler.get_converters()
+        count = len(connection.ops.get_db_converters(expression))
+        columns = backend_converters(connection, expression) if count else []
+        if columns is None:
+            columns, count = [], 0
+        columns += [row_converter(converter, expression, connection) for converter in row_converters[count:]]
+        resolved.append((position, columns))
+    return resolved
+
+
+def convert(converters, rows):
+    """Convert a list of rows with the resolved ``converters``, returning them as lists."""
+    columns = list(zip(*rows))
+    for position, steps in converters:
+        column = columns[position]
+        for converter in steps:
+            column = converter(column)
+        columns[position] = column
+    return list(map(list, zip(*columns)))
+
+
+def convert_chunks(compiler, chunks, converters):
+    """Convert the chunks of rows of SQLCompiler.execute_sql(MULTI) one at a time."""
+    converters = column_converters(compiler.connection, converters)
+    for chunk in chunks:
+        yield convert(converters, chunk)
+
+
+def apply_converters(compiler, rows, converters, block_size=GET_ITERATOR_CHUNK_SIZE):
+    """Convert ``rows`` a block of ``block_size`` rows at a time, yielding them as lists."""
+    converters = column_converters(compiler.connection, converters)
+    rows = iter(rows)
+    while block := list(islice(rows, block_size)):
+        yield from convert(converters, block)
@@ -0,0 +1,94 @@
+"""
+Row counts per table, kept in a small counters table so paginators don't
+have to run ``SELECT COUNT(*)``, which on D1 reads every row of the table.
+
+Counts are either maintained by triggers, installed with the
+django_cf.db.operations.InstallRowCounter migration operation, or refreshed
+periodically with refresh_row_counts().
+"""
+from django.db import connections
+
+from .base_engine import DATABASE_ERRORS, table_exists
+
+TABLE = 'django_cf_row_counts'
+
+create_table_sql = (
+    'CREATE TABLE IF NOT EXISTS "{table}" ('
+    '"table_name" TEXT NOT NULL PRIMARY KEY, "row_count" INTEGER NOT NULL, "refreshed_at" TEXT NULL)'
+)
+refresh_sql = (
+    'INSERT OR REPLACE INTO "{table}" ("table_name", "row_count", "refreshed_at") '
+    'SELECT %s, COUNT(*), datetime(\'now\') FROM "{counted}"'
+)
+select_sql = 'SELECT "row_count" FROM "{table}" WHERE "table_name" = %s'
+delete_sql = 'DELETE FROM "{table}" WHERE "table_name" = %s'
+
+create_trigger_sql = (
+    'CREATE TRIGGER IF NOT EXISTS "{trigger}" AFTER {event} ON "{counted}" BEGIN '
+    'UPDATE "{table}" SET "row_count" = "row_count" {sign} 1 WHERE "table_name" = \'{counted}\'; END'
+)
+drop_trigger_sql = 'DROP TRIGGER IF EXISTS "{trigger}"'
+
+TRIGGERS = (('insert', 'INSERT', '+'), ('delete', 'DELETE', '-'))
+
+
+def trigger_name(db_table, suffix):
+    return f'{TABLE}_{db_table}_{suffix}'
+
+
+def install_sql(db_table):
+    """Statements creating the counters table, counting ``db_table`` and installing its triggers."""
+    statements = [
+        (create_table_sql.format(table=TABLE), None),
+        (refresh_sql.format(table=TABLE, counted=db_table), (db_table,)),
+    ]
+    for suffix, event, sign in TRIGGERS:
+        statements.append((create_trigger_sql.format(
+            trigger=trigger_name(db_table, suffix), event=event, counted=db_table, table=TABLE, sign=sign,
+        ), None))
+    return statements
+
+
+def uninstall_sql(db_table):
+    """Statements dropping the triggers and the count of ``db_table``."""
+    statements = [
+        (drop_trigger_sql.format(trigger=trigger_name(db_table, suffix)), None)
+        for suffix, _, _ in TRIGGERS
+    ]
+    statements.append((delete_sql.format(table=TABLE), (db_table,)))
+    return statements
+
+
+def refresh_row_counts(*models, using='default'):
+    """
+    Recount the tables of ``models`` and store the results, for counts that
+    aren't kept by triggers. Meant to run periodically, e.g. from a Cron
+    Trigger; each call reads every row of the tables once.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(create_table_sql.format(table=TABLE))
+        for model in models:
+            db_table = model._meta.db_table
+            cursor.execute(refresh_sql.format(table=TABLE, counted=db_table), (db_table,))
+
+
+def row_count(model, using='default'):
+    """The stored row count of ``model``'s table, or None if it isn't counted."""
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(select_sql.format(table=TABLE), (model._meta.db_table,))
+            row = cursor.fetchone()
+    except DATABASE_ERRORS:
+        if table_exists(connections[using], TABLE):
+            raise
+        return None  # The counters table hasn't been created yet
+    return row[0] if row else None
+
+
+def is_unfiltered(queryset):
+    """Whether ``queryset`` counts the whole table, so a stored count can stand in for it."""
+    query = queryset.query
+    return not (
+        query.where or query.distinct or query.is_sliced or query.combinator or query.group_by is not None
+    )
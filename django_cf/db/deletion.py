@@ -0,0 +1,102 @@
+"""
+on_delete handlers that leave related rows to the database's foreign key
+actions instead of Django's Collector::
+
+    class Comment(models.Model):
+        post = models.ForeignKey(Post, on_delete=DB_CASCADE)
+        author = models.ForeignKey(User, null=True, on_delete=DB_SET_NULL)
+
+The Cloudflare schema editor creates these foreign keys with ``ON DELETE
+CASCADE`` or ``ON DELETE SET NULL``, and deleting a Post skips selecting its
+comments, so ``post.delete()`` is a single DELETE however many comments it
+has. D1 and Durable Objects enforce foreign keys, so SQLite cascades the
+delete itself.
+
+As the rows are removed by the database, no pre_delete/post_delete signals
+are sent for them and instances already in memory aren't updated. The query
+caches drop the entries of the referencing tables along with the parent's.
+Models reached through these foreign keys must in turn only use
+database-level or DO_NOTHING handlers for their own relations. DB_SET_NULL
+needs null=True.
+
+Dropping a table deletes its rows, which runs the actions too, so the schema
+editor remakes the referencing tables without them around any remake of the
+parent table. A model can't reference itself with these handlers.
+"""
+import copy
+
+
+def DB_CASCADE(collector, field, sub_objs, using):
+    """Delete the related rows with ON DELETE CASCADE in the database."""
+
+
+def DB_SET_NULL(collector, field, sub_objs, using):
+    """Null the foreign key of the related rows with ON DELETE SET NULL in the database."""
+
+
+for handler, clause in ((DB_CASCADE, 'CASCADE'), (DB_SET_NULL, 'SET NULL')):
+    # The Collector doesn't fetch the related rows for lazy handlers
+    handler.lazy_sub_objs = True
+    handler.on_delete_sql = clause
+
+
+def on_delete_sql(field):
+    """The ON DELETE action of ``field``'s foreign key, or None if Django handles deletes."""
+    if field.remote_field is None or not field.db_constraint:
+        return None
+    return getattr(field.remote_field.on_delete, 'on_delete_sql', None)
+
+
+def referencing_fields(model):
+    """``{model: fields}`` of the foreign keys referencing ``model`` with an ON DELETE action."""
+    referencing = {}
+    # Hidden relations (related_name='+') included
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not relation.auto_created or relation.concrete or not (relation.one_to_many or relation.one_to_one):
+            continue
+        field = relation.field
+        if field.concrete and on_delete_sql(field) is not None:
+            referencing.setdefault(field.model, []).append(field)
+    return referencing
+
+
+def without_action(field):
+    """A copy of the foreign key ``field`` whose constraint has no ON DELETE action."""
+    from django.db.models import DO_NOTHING
+
+    stripped = copy.copy(field)
+    stripped.remote_field = copy.copy(field.remote_field)
+    stripped.remote_field.on_delete = DO_NOTHING
+    stripped.remote_field.field = stripped
+    return stripped
+
+
+_references = [None, {}]  # [apps.get_models() they were read from, {table: referencing tables}]
+
+
+def referencing_tables():
+    """``{table: tables}`` of the tables whose foreign keys to ``table`` have an ON DELETE action."""
+    from django.apps import apps
+
+    models = apps.get_models(include_auto_created=True)
+    if _references[0] is not models:
+        references = {}
+        for model in models:
+            for field in model._meta.local_fields:
+                if on_delete_sql(field):
+                    references.setdefault(field.related_model._meta.db_table, set()).add(model._meta.db_table)
+        _references[:] = [models, references]
+    return _references[1]
+
+
+def cascaded_tables(tables):
+    """``tables`` and every table the database may delete or null rows of when they're written."""
+    references = referencing_tables()
+    tables = set(tables)
+    pending = list(tables)
+    while pending:
+        for table in references.get(pending.pop(), ()):
+            if table not in tables:
+                tables.add(table)
+                pending.append(table)
+    return tables
@@ -0,0 +1,109 @@
+"""
+Partial saves: write only the columns that changed since an instance was
+loaded or last saved.
+
+Model.save() on an existing row sends every column, which on D1 counts
+towards the rows written, the request size and the 100 bound parameter
+limit. With DirtyFieldsMixin, save() becomes ``UPDATE ... SET`` of the
+changed columns, and is skipped when nothing changed::
+
+    class Post(DirtyFieldsMixin, models.Model):
+        ...
+
+    post = Post.objects.get(pk=1)
+    post.title = 'New title'
+    post.save()  # UPDATE "blog_post" SET "title" = %s WHERE "id" = %s
+    post.save()  # nothing to write, no query and no signals
+"""
+import copy
+
+from django.db.models import DEFERRED
+
+
+def _snapshot_value(value):
+    # Mutable values (e.g. JSONField) can be changed in place
+    return copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin remembering the field values it was loaded or saved with.
+
+    save() without update_fields on an instance that exists in the database
+    saves only the changed fields, plus auto_now fields when anything
+    changed; with no changes it returns without a query or the
+    pre_save/post_save signals. Changing the primary key, saving to another
+    database or passing update_fields or force_insert saves as usual. If the
+    row was deleted meanwhile, the instance is inserted again with every
+    field, as a save() without update_fields would.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames):
+                loaded[field.attname] = _snapshot_value(self.__dict__[field.attname])
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """Names of the concrete fields whose value differs from the one loaded or last saved."""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+
+    def save(self, *args, **kwargs):
+        partial = (
+            not args
+            and not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and kwargs.get('using', self._state.db) == self._state.db
+            and hasattr(self, '_loaded_values')
+        )
+        if partial:
+            dirty = self.get_dirty_fields()
+            if self._meta.pk.name in dirty:
+                partial = False
+            elif not dirty:
+                return
+            else:
+                auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)]
+                kwargs['update_fields'] = dirty + [name for name in auto_now if name not in dirty]
+
+        self._partial_save = partial
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self._partial_save = False
+
+        update_fields = kwargs.get('update_fields')
+        self._snapshot(
+            None if update_fields is None else {self._meta.get_field(name).attname for name in update_fields}
+        )
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        updated = super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if updated or not getattr(self, '_partial_save', False):
+            return updated
+        # Django would raise for update_fields matching no row: insert it in full instead
+        model = base_qs.model
+        fields = [field for field in model._meta.local_concrete_fields if not field.generated]
+        self._do_insert(model._base_manager, using, fields, [], False)
+        return True
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot(None if fields is None else {self._meta.get_field(name).attname for name in fields})
@@ -0,0 +1,176 @@
+"""
+Keyset ("seek") helpers: continue an ordered queryset after a row by
+filtering on the row's ordering values instead of skipping rows with OFFSET.
+
+Used by the keyset paginator and the chunked iterator. On D1 an OFFSET still
+reads every skipped row, while a seek filter on indexed columns reads only
+the rows it returns.
+"""
+import base64
+import binascii
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import Col, OrderBy
+from django.db.models.sql.constants import MULTI
+
+
+def resolve_field(model, name):
+    """The model field a (possibly ``__``-spanning) ordering name refers to."""
+    opts = model._meta
+    parts = name.split(LOOKUP_SEP)
+    for part in parts[:-1]:
+        opts = opts.get_field(part).related_model._meta
+    return opts.pk if parts[-1] == 'pk' else opts.get_field(parts[-1])
+
+
+def ordering_fields(queryset, ordering=None):
+    """
+    The ``(name, descending)`` pairs a queryset is ordered by, ending with
+    the primary key so every row has a unique position.
+
+    ``ordering`` defaults to the queryset's order_by() and then the model's
+    Meta.ordering. Foreign keys are ordered by their column, not by the
+    related model's ordering. Nullable fields, random ordering and
+    expressions other than plain field references are rejected with
+    ValueError, as rows can't be sought past them.
+    """
+    model = queryset.model
+    if ordering is None:
+        ordering = queryset.query.order_by or model._meta.ordering
+
+    fields = []
+    for item in ordering:
+        if isinstance(item, OrderBy) and isinstance(item.expression, F):
+            name, descending = item.expression.name, item.descending
+        elif isinstance(item, str) and item != '?':
+            name, descending = item.lstrip('-'), item.startswith('-')
+        else:
+            raise ValueError(f"Keyset pagination can't order by {item!r}.")
+
+        field = resolve_field(model, name)
+        if field.null:
+            raise ValueError(f"Keyset pagination can't order by the nullable field {name!r}.")
+        if (field.many_to_one or field.one_to_one) and name.split(LOOKUP_SEP)[-1] == field.name:
+            name = name[:-len(field.name)] + field.attname
+        if name == model._meta.pk.attname:
+            name = 'pk'
+        if name not in [existing for existing, _ in fields]:
+            fields.append((name, descending))
+
+    if 'pk' not in [name for name, _ in fields]:
+        fields.append(('pk', fields[-1][1] if fields else False))
+    return fields
+
+
+def order_by(fields, reverse=False):
+    """order_by() arguments for ``fields``, optionally in the opposite direction."""
+    return [('-' if descending != reverse else '') + name for name, descending in fields]
+
+
+def row_values(obj, fields):
+    """The ordering values of a model instance."""
+    return tuple(attrgetter(name.replace(LOOKUP_SEP, '.'))(obj) for name, _ in fields)
+
+
+def seek_q(fields, values, reverse=False):
+    """
+    Q matching the rows after ``values`` in the ``fields`` ordering (before
+    them with ``reverse``): ``a > x OR (a = x AND b > y) OR ...``.
+    """
+    q = Q()
+    for index, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition = Q(**{f'{name}__{lookup}': values[index]})
+        for (previous, _), value in zip(fields[:index], values):
+            condition &= Q(**{previous: value})
+        q |= condition
+    return q
+
+
+def encode_cursor(values, direction='next'):
+    """An opaque, URL-safe cursor for a position and direction."""
+    payload = json.dumps([direction, list(values)], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, model, fields):
+    """``(direction, values)`` from a cursor; ValueError if it doesn't fit ``fields``."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+    if direction not in ('next', 'previous') or not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError("Invalid cursor.")
+
+    try:
+        values = tuple(
+            resolve_field(model, name).to_python(value)
+            for (name, _), value in zip(fields, values)
+        )
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    return direction, values
+
+
+def chunked_results(compiler, chunk_size):
+    """
+    Lists of rows for a chunked execute_sql() (QuerySet.iterator()), read
+    ``chunk_size`` rows per query by seeking past the previous chunk's last
+    row, or None when the query can't be read that way: sliced, combined or
+    grouped queries, orderings keyset pagination rejects, and ordering
+    columns missing from the select.
+    """
+    query = compiler.query
+    if query.model is None or query.is_sliced or query.combinator or query.group_by is not None \
+            or query.extra_order_by:
+        return None
+    try:
+        fields = ordering_fields(QuerySet(model=query.model, query=query))
+    except (ValueError, AttributeError, FieldDoesNotExist):
+        # e.g. ordered by an annotation or an extra() select
+        return None
+
+    if compiler.select is None:
+        compiler.setup_query()
+    positions = []
+    for name, _ in fields:
+        if LOOKUP_SEP in name:
+            return None
+        field = resolve_field(query.model, name)
+        position = next((
+            index for index, (expression, _, _) in enumerate(compiler.select[:compiler.col_count])
+            if isinstance(expression, Col) and expression.alias == query.base_table and expression.target == field
+        ), None)
+        if position is None:
+            return None
+        positions.append(position)
+    return _chunks(compiler, fields, positions, chunk_size)
+
+
+def _chunks(compiler, fields, positions, chunk_size):
+    # Seek values go back into the query as Python values, as the model
+    # fields expect them
+    converters = compiler.get_converters([compiler.select[position][0] for position in positions])
+    values = None
+    while True:
+        query = compiler.query.clone()
+        query.clear_ordering(force=True)
+        query.add_ordering(*order_by(fields))
+        if values is not None:
+            query.add_q(seek_q(fields, values))
+        query.set_limits(high=chunk_size)
+        chunk = query.get_compiler(using=compiler.using, elide_empty=compiler.elide_empty)
+        rows = [row for rows in chunk.execute_sql(MULTI) for row in rows]
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = [rows[-1][position] for position in positions]
+        values = tuple(next(iter(compiler.apply_converters([last], converters))))
@@ -0,0 +1,117 @@
+import logging
+import os
+import re
+import sysconfig
+import traceback
+import warnings
+
+import django
+
+import django_cf
+from django_cf import stats
+from .sql import fingerprint, query_tables
+
+logger = logging.getLogger(__name__)
+
+_LIBRARY_DIRS = tuple(
+    os.path.dirname(module.__file__) + os.sep for module in (django, django_cf)
+) + (sysconfig.get_paths()['stdlib'] + os.sep,)
+_SINGLE_ROW_RE = re.compile(r'\bLIMIT\s+21\b', re.IGNORECASE)
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class NPlusOneError(Exception):
+    """Raised when N_PLUS_ONE_DETECTION's ACTION is 'raise'."""
+
+    def __init__(self, message, fingerprint, count, call_site):
+        super().__init__(message)
+        self.fingerprint = fingerprint
+        self.count = count
+        self.call_site = call_site
+
+
+def call_site():
+    """The innermost stack frame outside Django and django_cf, as 'file:line in function'."""
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(_LIBRARY_DIRS):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def suggestion(query):
+    """What usually fixes a repeated statement of this shape."""
+    tables = ', '.join(sorted(query_tables(query))) or 'the related table'
+    if _SINGLE_ROW_RE.search(query):
+        # Forward foreign keys and one-to-one fields are fetched with get()
+        return f"load {tables} with select_related() on the outer queryset"
+    return f"load {tables} with prefetch_related() on the outer queryset"
+
+
+class NPlusOneDetector:
+    """
+    Flags statements of the same shape running many times in one request.
+
+    Enabled per database with the ``N_PLUS_ONE_DETECTION`` key, meant for
+    development and staging::
+
+        'N_PLUS_ONE_DETECTION': {
+            'THRESHOLD': 5,    # flag the shape when it runs more often than this
+            'ACTION': 'warn',  # 'log', 'warn' (NPlusOneWarning) or 'raise' (NPlusOneError)
+        }
+
+    ``True`` uses the defaults (5, 'log'). Only statements sent while Django
+    handles a request are counted. They are fingerprinted with their literals
+    and IN lists removed and each shape is reported once per request, with the
+    application code that sent it.
+    """
+
+    actions = ('log', 'warn', 'raise')
+
+    def __init__(self, threshold=5, action='log'):
+        if action not in self.actions:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured(
+                "settings.DATABASES is improperly configured. "
+                f"N_PLUS_ONE_DETECTION ACTION must be one of {', '.join(self.actions)}."
+            )
+        self.threshold = threshold
+        self.action = action
+        self._counts = {}
+
+    @classmethod
+    def from_settings(cls, settings_dict):
+        options = settings_dict.get('N_PLUS_ONE_DETECTION') if isinstance(settings_dict, dict) else None
+        if options is True:
+            return cls()
+        if isinstance(options, dict):
+            return cls(threshold=options.get('THRESHOLD', 5), action=options.get('ACTION', 'log'))
+        return None
+
+    def record(self, query):
+        if not stats.in_request():
+            return  # management commands, migrations, shell
+
+        shape = fingerprint(query)
+        count = self._counts.get(shape, 0) + 1
+        self._counts[shape] = count
+        if count == self.threshold + 1:
+            self.report(query, shape, count)
+
+    def report(self, query, shape, count):
+        site = call_site()
+        message = (
+            f"Possible N+1 query: statement ran {count} times in this request"
+            f"{f' from {site}' if site else ''}; {suggestion(query)}. Statement: {shape}"
+        )
+        if self.action == 'raise':
+            raise NPlusOneError(message, shape, count, site)
+        if self.action == 'warn':
+            warnings.warn(message, NPlusOneWarning, stacklevel=2)
+        else:
+            logger.warning(message)
+
+    def clear(self):
+        self._counts.clear()
@@ -0,0 +1,197 @@
+"""
+Migration operations for D1 and Durable Objects databases.
+"""
+from django.db.migrations.operations import RenameField
+from django.db.migrations.operations.base import Operation
+
+from . import counts, rebuild, search
+
+
+class InstallRowCounter(Operation):
+    """
+    Keep the row count of a model's table in the counters table, maintained
+    by insert and delete triggers::
+
+        operations = [
+            InstallRowCounter('post'),
+        ]
+
+    The table is counted once when the operation runs. Each insert and delete
+    then also writes the counter row, which D1 bills as a row written.
+
+    SQLite drops triggers with their table; the schema editor and
+    RebuildTable create them again when they rebuild the table (e.g. to
+    alter a column).
+    """
+
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def deconstruct(self):
+        return (self.__class__.__qualname__, [], {'model_name': self.model_name})
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql, params in counts.install_sql(model._meta.db_table):
+                schema_editor.execute(sql, params)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql, params in counts.uninstall_sql(model._meta.db_table):
+                schema_editor.execute(sql, params)
+
+    def describe(self):
+        return f"Install row counter for {self.model_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return f'{self.model_name.lower()}_row_counter'
+
+
+class CreateSearchIndex(Operation):
+    """
+    Mirror fields of a model into an FTS5 table for full-text search (see
+    django_cf.db.search), kept in sync by triggers::
+
+        operations = [
+            CreateSearchIndex('post', ['title', 'body']),
+        ]
+
+    The existing rows are indexed when the operation runs. The model needs an
+    integer primary key. As with InstallRowCounter, the triggers are created
+    again when the table is rebuilt, unless the rebuild removes or renames an
+    indexed column; remove and re-add the index after such a migration.
+    """
+
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name, fields, tokenize=search.DEFAULT_TOKENIZE):
+        self.model_name = model_name
+        self.fields = list(fields)
+        self.tokenize = tokenize
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'fields': self.fields}
+        if self.tokenize != search.DEFAULT_TOKENIZE:
+            kwargs['tokenize'] = self.tokenize
+        return (self.__class__.__qualname__, [], kwargs)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql in search.create_sql(model, self.fields, self.tokenize):
+                schema_editor.execute(sql, None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql in search.drop_sql(model):
+                schema_editor.execute(sql, None)
+
+    def describe(self):
+        return f"Create search index on {', '.join(self.fields)} of {self.model_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return f'{self.model_name.lower()}_search_index'
+
+
+class RebuildTable(Operation):
+    """
+    Apply model changes that need SQLite to rebuild the table by copying the
+    rows in chunks (see django_cf.db.rebuild), instead of a single
+    ``INSERT ... SELECT`` that can exceed D1's query limits on large tables::
+
+        operations = [
+            RebuildTable('post', [
+                migrations.AlterField('post', 'title', models.CharField(max_length=300)),
+                migrations.RemoveField('post', 'legacy_id'),
+            ]),
+        ]
+
+    ``operations`` change the model state only; the table is rebuilt once for
+    all of them. Copying stops after ``time_limit`` seconds and the migration
+    fails with RebuildIncomplete; running ``migrate`` again, or
+    continue_rebuilds() from a Cron Trigger, resumes it, and the migration is
+    recorded once the tables are swapped. Put the operation in a migration of
+    its own, as the migration's other operations run again on each attempt.
+    """
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, operations, chunk_size=rebuild.DEFAULT_CHUNK_SIZE,
+                 time_limit=rebuild.DEFAULT_TIME_LIMIT):
+        self.model_name = model_name
+        self.operations = list(operations)
+        self.chunk_size = chunk_size
+        self.time_limit = time_limit
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'operations': self.operations}
+        if self.chunk_size != rebuild.DEFAULT_CHUNK_SIZE:
+            kwargs['chunk_size'] = self.chunk_size
+        if self.time_limit != rebuild.DEFAULT_TIME_LIMIT:
+            kwargs['time_limit'] = self.time_limit
+        return (self.__class__.__qualname__, [], kwargs)
+
+    def state_forwards(self, app_label, state):
+        for operation in self.operations:
+            operation.state_forwards(app_label, state)
+
+    def renamed_fields(self):
+        """Current to previous names of the fields renamed by ``operations``."""
+        renamed = {}
+        for operation in self.operations:
+            if isinstance(operation, RenameField) and operation.model_name_lower == self.model_name.lower():
+                renamed[operation.new_name] = renamed.pop(operation.old_name, operation.old_name)
+        return renamed
+
+    def _rebuild(self, schema_editor, old_model, new_model, renamed):
+        connection = schema_editor.connection
+        if not self.allow_migrate_model(connection.alias, new_model):
+            return
+        table = old_model._meta.db_table
+        progress = rebuild.progress(table, connection.alias)
+        if progress is None:
+            rebuild.run_batch(connection, rebuild.start_statements(schema_editor, old_model, new_model, renamed))
+        if progress is None or not progress.finished:
+            progress = rebuild.run(table, connection.alias, self.chunk_size, self.time_limit)
+        if not progress.finished:
+            raise rebuild.RebuildIncomplete(f'{progress} Run migrate again to continue.')
+        rebuild.forget(table, connection.alias)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._rebuild(
+            schema_editor,
+            from_state.apps.get_model(app_label, self.model_name),
+            to_state.apps.get_model(app_label, self.model_name),
+            self.renamed_fields(),
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._rebuild(
+            schema_editor,
+            from_state.apps.get_model(app_label, self.model_name),
+            to_state.apps.get_model(app_label, self.model_name),
+            {old: new for new, old in self.renamed_fields().items()},
+        )
+
+    def describe(self):
+        return f"Rebuild the table of {self.model_name} in chunks"
+
+    @property
+    def migration_name_fragment(self):
+        return f'rebuild_{self.model_name.lower()}'
@@ -0,0 +1,53 @@
+from django.db import models
+
+from . import search as fts
+from . import upsert
+from .batch import prefetch_related_objects
+
+
+class CFQuerySet(models.QuerySet):
+    """
+    QuerySet with round-trip savings for the Cloudflare backends.
+
+    Use it through CFManager (``objects = CFManager()``) or
+    ``CFQuerySet.as_manager()``. On other databases it behaves like a plain
+    QuerySet.
+    """
+
+    def _prefetch_related_objects(self):
+        # Prefetch queries at the same depth go out together
+        prefetch_related_objects(self._result_cache, *self._prefetch_related_lookups, using=self.db)
+        self._prefetch_done = True
+
+    def search(self, text, fields=None):
+        """
+        Rows matching ``text`` in the model's FTS5 index, in every indexed
+        field or only in ``fields``; see django_cf.db.search.
+        """
+        return fts.search(self, text, fields)
+
+
+class CFManager(models.Manager.from_queryset(CFQuerySet)):
+    pass
+
+
+class UpsertQuerySet(CFQuerySet):
+    """
+    CFQuerySet whose get_or_create() and update_or_create() use upserts on
+    the Cloudflare backends, plus create_or_get() for rows that are usually
+    new; see django_cf.db.upsert. They don't call Model.save() or send the
+    pre_save/post_save signals.
+    """
+
+    def get_or_create(self, defaults=None, **kwargs):
+        return upsert.get_or_create(self, defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        return upsert.update_or_create(self, defaults, create_defaults, **kwargs)
+
+    def create_or_get(self, defaults=None, **kwargs):
+        return upsert.create_or_get(self, defaults, **kwargs)
+
+
+class UpsertManager(models.Manager.from_queryset(UpsertQuerySet)):
+    pass
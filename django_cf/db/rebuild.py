@@ -0,0 +1,353 @@
+"""
+Chunked, resumable table rebuilds for tables too large for SQLite's
+``INSERT INTO new SELECT * FROM old`` in a single D1 query.
+
+A rebuild creates the table with its new definition, then copies the rows in
+primary key order, one chunk per batch, recording the last copied key in the
+``django_cf_rebuilds`` state table. Triggers on the old table mirror writes
+to rows that were already copied, so the table stays in use. Once every row
+is copied, a final batch copies the rows added since, drops the old table,
+renames the new one and creates its indexes.
+
+Rebuilds are started by the django_cf.db.operations.RebuildTable migration
+operation and can be continued by running ``migrate`` again, or from a Cron
+Trigger or Durable Object alarm with continue_rebuilds().
+"""
+import copy
+import json
+import logging
+import time
+
+from django.apps.registry import Apps
+from django.db import connections
+from django.db.backends.ddl_references import Statement
+
+from .base_engine import DATABASE_ERRORS, table_exists
+from .deletion import referencing_fields
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'django_cf_rebuilds'
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_TIME_LIMIT = 20
+
+create_table_sql = (
+    'CREATE TABLE IF NOT EXISTS "{table}" ('
+    '"table_name" TEXT NOT NULL PRIMARY KEY, "new_table" TEXT NOT NULL, "pk_column" TEXT NOT NULL, '
+    '"copy_sql" TEXT NOT NULL, "swap_sql" TEXT NOT NULL, "last_pk" NULL, '
+    '"rows_copied" INTEGER NOT NULL, "rows_total" INTEGER NOT NULL, '
+    '"started_at" REAL NOT NULL, "updated_at" REAL NOT NULL, "finished_at" REAL NULL)'
+)
+start_sql = (
+    'INSERT INTO "{table}" ("table_name", "new_table", "pk_column", "copy_sql", "swap_sql", "rows_copied", '
+    '"rows_total", "started_at", "updated_at") SELECT %s, %s, %s, %s, %s, 0, COUNT(*), %s, %s FROM "{rebuilt}"'
+)
+select_sql = (
+    'SELECT "table_name", "new_table", "pk_column", "copy_sql", "swap_sql", "last_pk", "rows_copied", '
+    '"rows_total", "started_at", "updated_at", "finished_at" FROM "{table}"'
+)
+progress_sql = (
+    'UPDATE "{table}" SET "last_pk" = COALESCE((SELECT MAX("{pk}") FROM "{new}"), "last_pk"), '
+    '"rows_copied" = "rows_copied" + (SELECT COUNT(*) FROM "{new}"{after}), "updated_at" = %s{finished} '
+    'WHERE "table_name" = %s'
+)
+delete_sql = 'DELETE FROM "{table}" WHERE "table_name" = %s'
+
+# Writes to already copied rows are applied to the new table as well
+create_trigger_sql = (
+    'CREATE TRIGGER "{new}_{suffix}" AFTER {event} ON "{rebuilt}" BEGIN {body} END'
+)
+sync_row_sql = (
+    'INSERT OR REPLACE INTO "{new}" ({columns}) SELECT {values} FROM "{rebuilt}" WHERE "{pk}" = NEW."{pk}" '
+    'AND "{pk}" <= (SELECT "last_pk" FROM "{table}" WHERE "table_name" = \'{rebuilt}\');'
+)
+delete_row_sql = 'DELETE FROM "{new}" WHERE "{pk}" = OLD."{pk}";'
+
+
+class RebuildIncomplete(Exception):
+    """Raised by RebuildTable when the rows couldn't all be copied within its time limit."""
+
+
+class RebuildProgress:
+    """State of a table rebuild, as recorded in the state table."""
+
+    def __init__(self, table, rows_copied, rows_total, started_at, updated_at, finished_at):
+        self.table = table
+        self.rows_copied = rows_copied
+        self.rows_total = rows_total
+        self.started_at = started_at
+        self.updated_at = updated_at
+        self.finished_at = finished_at
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    @property
+    def rows_per_second(self):
+        elapsed = (self.finished_at or self.updated_at) - self.started_at
+        return self.rows_copied / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def seconds_remaining(self):
+        """Estimated copying time left, or None when the rate isn't known yet."""
+        if self.finished:
+            return 0.0
+        rate = self.rows_per_second
+        return max(self.rows_total - self.rows_copied, 0) / rate if rate else None
+
+    def as_dict(self):
+        return {
+            'table': self.table,
+            'rows_copied': self.rows_copied,
+            'rows_total': self.rows_total,
+            'rows_per_second': self.rows_per_second,
+            'seconds_remaining': self.seconds_remaining,
+            'finished': self.finished,
+        }
+
+    def __str__(self):
+        state = 'finished' if self.finished else 'in progress'
+        return (
+            f'Rebuild of "{self.table}" {state}: {self.rows_copied} of {self.rows_total} rows copied '
+            f'({self.rows_per_second:.0f} rows/s).'
+        )
+
+
+def new_table_name(db_table):
+    return f'rebuild__{db_table}'
+
+
+def renamed_model(model, db_table):
+    """A copy of ``model`` in a private app registry, using the table ``db_table``."""
+    # As in the SQLite schema editor's table remake, self-referential fields
+    # are cloned so they resolve to a model with the original table name
+    apps = Apps()
+
+    def fields():
+        return {
+            field.name: field.clone() if field.is_relation and field.remote_field.model is model else field
+            for field in model._meta.local_concrete_fields
+        }
+
+    def define(name, table):
+        body = copy.deepcopy(fields())
+        body['Meta'] = type('Meta', (), {
+            'app_label': model._meta.app_label,
+            'db_table': table,
+            'unique_together': model._meta.unique_together,
+            'indexes': model._meta.indexes,
+            'constraints': model._meta.constraints,
+            'apps': apps,
+        })
+        body['__module__'] = model.__module__
+        return type(name, model.__bases__, body)
+
+    define(model._meta.object_name, model._meta.db_table)
+    return define(f'Rebuild{model._meta.object_name}', db_table)
+
+
+def copy_columns(schema_editor, old_model, new_model, renamed=None):
+    """``(column, expression)`` pairs filling the new table from the old one."""
+    renamed = renamed or {}
+    old_fields = {field.name: field for field in old_model._meta.local_concrete_fields}
+    columns = []
+    for field in new_model._meta.local_concrete_fields:
+        if field.generated:
+            continue
+        old_field = old_fields.get(renamed.get(field.name, field.name))
+        if old_field is None or old_field.generated:
+            if field.has_db_default():
+                continue
+            expression = schema_editor.prepare_default(schema_editor.effective_default(field))
+        elif old_field.null and not field.null:
+            default = schema_editor.prepare_default(schema_editor.effective_default(field))
+            expression = f'coalesce({schema_editor.quote_name(old_field.column)}, {default})'
+        else:
+            expression = schema_editor.quote_name(old_field.column)
+        columns.append((field.column, expression))
+    return columns
+
+
+def start_statements(schema_editor, old_model, new_model, renamed=None):
+    """
+    Statements creating the new table for ``new_model``, the triggers on
+    ``old_model``'s table and the state row of the rebuild.
+    """
+    db_table = old_model._meta.db_table
+    if new_model._meta.db_table != db_table:
+        raise ValueError("RebuildTable can't rename the table.")
+    pk = old_model._meta.pk.column
+    if pk is None or new_model._meta.pk.column != pk:
+        raise ValueError("RebuildTable needs the same single-column primary key before and after.")
+
+    referencing = referencing_fields(old_model)
+    if referencing:
+        raise ValueError(
+            f"RebuildTable can't rebuild {db_table!r}: {', '.join(sorted(m._meta.label for m in referencing))} "
+            f"reference it with DB_CASCADE or DB_SET_NULL, whose ON DELETE actions dropping the old table would "
+            f"run. Alter it with the schema editor's operations instead."
+        )
+
+    new_table = new_table_name(db_table)
+    quote = schema_editor.quote_name
+    pairs = copy_columns(schema_editor, old_model, new_model, renamed)
+    columns = ', '.join(quote(column) for column, _ in pairs)
+    values = ', '.join(expression for _, expression in pairs)
+    copy_sql = f'INSERT INTO {quote(new_table)} ({columns}) SELECT {values} FROM {quote(db_table)}'
+
+    with schema_editor.connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        temporary = renamed_model(new_model, new_table)
+        editor.create_model(temporary)
+        create_sql = [sql.rstrip(';') for sql in editor.collected_sql]
+        # The indexes, and the triggers dropped with the old table, are
+        # created once the new table has the old one's name
+        swap_sql = ['PRAGMA defer_foreign_keys = ON', f'DROP TABLE {quote(db_table)}',
+                    f'ALTER TABLE {quote(new_table)} RENAME TO {quote(db_table)}']
+        for sql in editor.deferred_sql:
+            if isinstance(sql, Statement):
+                sql.rename_table_references(new_table, db_table)
+            swap_sql.append(str(sql))
+        editor.deferred_sql = []
+        removed = {field.column for field in old_model._meta.local_concrete_fields}
+        removed -= {field.column for field in new_model._meta.local_concrete_fields}
+        swap_sql += schema_editor._kept_triggers(old_model, removed)
+        # Switching it off forgets the violations from dropping the old table,
+        # which the rows referencing it have until the new one is renamed
+        swap_sql.append('PRAGMA defer_foreign_keys = OFF')
+
+    sync = sync_row_sql.format(new=new_table, columns=columns, values=values, rebuilt=db_table, pk=pk, table=TABLE)
+    delete = delete_row_sql.format(new=new_table, pk=pk)
+    triggers = [
+        ('insert', 'INSERT', sync),
+        ('update', 'UPDATE', delete + ' ' + sync),
+        ('delete', 'DELETE', delete),
+    ]
+    now = time.time()
+    return (
+        [(create_table_sql.format(table=TABLE), None)]
+        + [(sql, None) for sql in create_sql]
+        + [
+            (create_trigger_sql.format(new=new_table, suffix=suffix, event=event, rebuilt=db_table, body=body), None)
+            for suffix, event, body in triggers
+        ]
+        + [(start_sql.format(table=TABLE, rebuilt=db_table),
+            (db_table, new_table, pk, copy_sql, json.dumps(swap_sql), now, now))]
+    )
+
+
+def run_batch(connection, statements):
+    """Send ``statements`` to a Cloudflare database in order, as one round trip."""
+    connection.ensure_connection()
+    database = connection.connection
+    return database.flush([database.prepare_query(query, params) for query, params in statements])
+
+
+def _states(connection, table=None):
+    sql = select_sql.format(table=TABLE)
+    params = None
+    if table is not None:
+        sql += ' WHERE "table_name" = %s'
+        params = (table,)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    except DATABASE_ERRORS:
+        if table_exists(connection, TABLE):
+            raise
+        return []  # No rebuild has been started yet
+    keys = ('table', 'new_table', 'pk', 'copy_sql', 'swap_sql', 'last_pk', 'rows_copied', 'rows_total',
+            'started_at', 'updated_at', 'finished_at')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def _progress(state):
+    return RebuildProgress(
+        state['table'], state['rows_copied'], state['rows_total'],
+        state['started_at'], state['updated_at'], state['finished_at'],
+    )
+
+
+def _step(connection, state, chunk_size):
+    """Copy one chunk of ``state``'s rebuild, or swap the tables when none are left; returns the new state."""
+    after, params = '', []
+    if state['last_pk'] is not None:
+        after, params = f' WHERE "{state["pk"]}" > %s', [state['last_pk']]
+
+    finishing = state.get('exhausted')
+    if finishing:
+        # The rows inserted since the last chunk are copied in the same batch as the swap
+        insert = (state['copy_sql'] + after, params or None)
+    else:
+        insert = (state['copy_sql'] + after + f' ORDER BY "{state["pk"]}" LIMIT %s', params + [chunk_size])
+
+    now = time.time()
+    update = (
+        progress_sql.format(
+            table=TABLE, pk=state['pk'], new=state['new_table'], after=after,
+            finished=', "finished_at" = %s' if finishing else '',
+        ),
+        params + [now] + ([now] if finishing else []) + [state['table']],
+    )
+    statements = [insert, update]
+    if finishing:
+        statements = [(json.loads(state['swap_sql'])[0], None)] + statements
+        statements += [(sql, None) for sql in json.loads(state['swap_sql'])[1:]]
+
+    results = run_batch(connection, statements)
+    [state] = _states(connection, state['table'])
+    if not finishing:
+        state['exhausted'] = results[0].rowcount < chunk_size
+    return state
+
+
+def run(table, using='default', chunk_size=DEFAULT_CHUNK_SIZE, time_limit=DEFAULT_TIME_LIMIT):
+    """
+    Continue the rebuild of ``table`` for up to ``time_limit`` seconds, at
+    least one chunk, swapping the tables once every row is copied. Returns
+    its RebuildProgress, or None if the table isn't being rebuilt.
+    """
+    connection = connections[using]
+    states = _states(connection, table)
+    if not states:
+        return None
+    state = states[0]
+
+    deadline = time.monotonic() + time_limit
+    while state['finished_at'] is None:
+        state = _step(connection, state, chunk_size)
+        if time.monotonic() >= deadline:
+            break
+
+    progress = _progress(state)
+    logger.info('%s', progress)
+    return progress
+
+
+def continue_rebuilds(using='default', chunk_size=DEFAULT_CHUNK_SIZE, time_limit=DEFAULT_TIME_LIMIT):
+    """
+    Continue every unfinished rebuild for up to ``time_limit`` seconds in
+    total, e.g. from a Cron Trigger or a Durable Object alarm. Returns the
+    RebuildProgress of each.
+    """
+    deadline = time.monotonic() + time_limit
+    results = []
+    for state in _states(connections[using]):
+        if state['finished_at'] is None:
+            remaining = max(deadline - time.monotonic(), 0)
+            results.append(run(state['table'], using, chunk_size, remaining))
+    return results
+
+
+def progress(table, using='default'):
+    """The RebuildProgress of ``table``, or None if it isn't being rebuilt."""
+    states = _states(connections[using], table)
+    return _progress(states[0]) if states else None
+
+
+def forget(table, using='default'):
+    """Delete the state of a finished rebuild."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(delete_sql.format(table=TABLE), (table,))
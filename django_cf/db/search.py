@@ -0,0 +1,146 @@
+"""
+Full-text search through SQLite FTS5, which both D1 and Durable Objects
+support.
+
+The CreateSearchIndex migration operation (django_cf.db.operations) mirrors
+chosen fields of a model into an external-content FTS5 table named
+``<db_table>_fts``, kept in sync by triggers. Queries then match against
+that index instead of scanning the table with ``LIKE '%term%'``::
+
+    Post.objects.filter(title__search='cloud')     # one indexed field
+    Post.objects.search('cloud workers')           # every indexed field (CFQuerySet)
+    search(Post.objects.all(), 'cloud', ['body'])  # any queryset
+
+Each word of the search text must appear in the row, as a word or the
+start of one: 'clou' finds "Cloudflare" but 'flare' doesn't. The ``__search``
+lookup is registered by register_lookups(), which django_cf's app config
+calls.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db import NotSupportedError, models
+from django.db.models.expressions import Col, RawSQL
+
+DEFAULT_TOKENIZE = 'unicode61 remove_diacritics 2'
+
+create_table_sql = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "{index}" USING fts5({columns}, '
+    'content=\'{table}\', content_rowid=\'{pk}\', tokenize=\'{tokenize}\')'
+)
+drop_table_sql = 'DROP TABLE IF EXISTS "{index}"'
+rebuild_sql = 'INSERT INTO "{index}"("{index}") VALUES (\'rebuild\')'
+
+_insert = 'INSERT INTO "{index}"(rowid, {columns}) VALUES (new."{pk}", {new});'
+_delete = 'INSERT INTO "{index}"("{index}", rowid, {columns}) VALUES (\'delete\', old."{pk}", {old});'
+create_trigger_sql = 'CREATE TRIGGER IF NOT EXISTS "{trigger}" AFTER {event} ON "{table}" BEGIN {body} END'
+drop_trigger_sql = 'DROP TRIGGER IF EXISTS "{trigger}"'
+
+
+def index_table(model):
+    """Name of the FTS5 table of ``model``."""
+    return f'{model._meta.db_table}_fts'
+
+
+def index_columns(model, fields):
+    """Columns of the named fields of ``model``."""
+    return [model._meta.get_field(name).column for name in fields]
+
+
+def create_sql(model, fields, tokenize=DEFAULT_TOKENIZE):
+    """Statements creating the FTS5 table of ``model``, its sync triggers, and indexing the existing rows."""
+    table = model._meta.db_table
+    index = index_table(model)
+    pk = model._meta.pk.column
+    columns = index_columns(model, fields)
+    names = {
+        'index': index,
+        'pk': pk,
+        'columns': ', '.join(f'"{column}"' for column in columns),
+        'new': ', '.join(f'new."{column}"' for column in columns),
+        'old': ', '.join(f'old."{column}"' for column in columns),
+    }
+    insert, delete = _insert.format(**names), _delete.format(**names)
+    # Updates of columns that aren't indexed leave the index alone
+    update_of = 'UPDATE OF ' + ', '.join(f'"{column}"' for column in columns)
+
+    statements = [create_table_sql.format(
+        index=index, columns=names['columns'], table=table, pk=pk, tokenize=tokenize,
+    )]
+    for suffix, event, body in (('insert', 'INSERT', insert), ('delete', 'DELETE', delete),
+                                ('update', update_of, delete + ' ' + insert)):
+        statements.append(create_trigger_sql.format(
+            trigger=f'{index}_{suffix}', event=event, table=table, body=body,
+        ))
+    statements.append(rebuild_sql.format(index=index))
+    return statements
+
+
+def drop_sql(model):
+    """Statements dropping the FTS5 table of ``model`` and its triggers."""
+    index = index_table(model)
+    statements = [drop_trigger_sql.format(trigger=f'{index}_{suffix}') for suffix in ('insert', 'delete', 'update')]
+    statements.append(drop_table_sql.format(index=index))
+    return statements
+
+
+def match_expression(text, columns=None):
+    """
+    An FTS5 query matching rows containing every word of ``text`` as a word
+    or word prefix, optionally only in ``columns``; None if there are no words.
+
+    Words are quoted, so FTS5 syntax in the text is searched for literally.
+    """
+    words = ['"' + word.replace('"', '""') + '"*' for word in str(text).split()]
+    if not words:
+        return None
+    expression = ' '.join(words)
+    if columns:
+        return '{' + ' '.join(f'"{column}"' for column in columns) + '} : (' + expression + ')'
+    return expression
+
+
+def search(queryset, text, fields=None):
+    """
+    Filter ``queryset`` to the rows matching ``text`` in the FTS5 index of its
+    model, in every indexed field or only in ``fields``.
+    """
+    model = queryset.model
+    expression = match_expression(text, index_columns(model, fields) if fields else None)
+    if expression is None:
+        return queryset.none()
+    index = index_table(model)
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM "{index}" WHERE "{index}" MATCH %s', (expression,)))
+
+
+class Search(models.Lookup):
+    """``field__search='text'``: rows whose ``field`` matches in the model's FTS5 index."""
+
+    lookup_name = 'search'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        from .base_engine import CFDatabaseWrapper
+
+        if not isinstance(connection, CFDatabaseWrapper):
+            raise NotSupportedError("__search is only supported by the Cloudflare database backends.")
+        if not isinstance(self.lhs, Col) or hasattr(self.rhs, 'resolve_expression'):
+            raise NotSupportedError("__search only supports a model field and a literal search text.")
+
+        field = self.lhs.target
+        expression = match_expression(self.rhs, [field.column])
+        if expression is None:
+            raise EmptyResultSet
+
+        index = connection.ops.quote_name(index_table(field.model))
+        pk = f'{compiler.quote_name_unless_alias(self.lhs.alias)}.{connection.ops.quote_name(field.model._meta.pk.column)}'
+        return f'{pk} IN (SELECT rowid FROM {index} WHERE {index} MATCH %s)', [expression]
+
+
+def register_lookups():
+    """
+    Register ``__search`` on CharField and TextField. Done when django_cf is
+    in INSTALLED_APPS; projects without it can call this themselves.
+    """
+    for field_class in (models.CharField, models.TextField):
+        # Don't replace another backend's __search, such as django.contrib.postgres's
+        if Search.lookup_name not in field_class.get_class_lookups():
+            field_class.register_lookup(Search)
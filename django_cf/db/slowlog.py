@@ -0,0 +1,167 @@
+import logging
+import random
+from collections import deque
+from datetime import datetime, timezone
+
+from .sql import fingerprint
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def params_shape(params):
+    """Type names of the params, e.g. 'int, str, NoneType', without the values."""
+    if not params:
+        return ''
+    return ', '.join(type(param).__name__ for param in params)
+
+
+def query_plan(database_wrapper, query, params):
+    """
+    The statement's EXPLAIN QUERY PLAN as lines indented two spaces per
+    level, or None for statements it doesn't apply to.
+    """
+    if not query.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+
+    rows = database_wrapper.run_query('EXPLAIN QUERY PLAN ' + query, params).data
+    # Rows are (id, parent, notused, detail); parents come before their children
+    depths = {0: -1}
+    lines = []
+    for row in rows:
+        node, parent, detail = row[0], row[1], row[-1]
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node] + str(detail))
+    return lines
+
+
+class SlowQueryLog:
+    """
+    Records statements that exceed a latency or rows_read threshold.
+
+    Enabled per database with the ``SLOW_QUERY_LOG`` key::
+
+        'SLOW_QUERY_LOG': {
+            'DURATION': 200,              # milliseconds
+            'ROWS_READ': 10000,
+            'EXPLAIN_SAMPLE_RATE': 0.1,   # share of slow statements to run EXPLAIN QUERY PLAN for
+            'TABLE': 'django_cf_slow_query',  # optional, defaults to the django_cf.db.slowlog logger
+        }
+
+    Either threshold may be omitted. Entries hold the statement's fingerprint,
+    the types of its params (never the values), its timing and rows, and for
+    sampled statements the query plan, where ``SCAN`` lines are the full table
+    scans that burn read quota. Entries for the table are queued and written
+    after the response, like the statement stats (see
+    django_cf.db.statements.pending_flushes); the table is created by the
+    first flush. At most ``max_pending`` entries wait, the oldest are dropped.
+    """
+
+    max_pending = 100
+
+    create_table_sql = (
+        'CREATE TABLE IF NOT EXISTS "{table}" ('
+        '"id" INTEGER PRIMARY KEY AUTOINCREMENT, "created_at" TEXT NOT NULL, "fingerprint" TEXT NOT NULL, '
+        '"params" TEXT NOT NULL, "duration" REAL NOT NULL, "rows_read" INTEGER NOT NULL, '
+        '"rows_written" INTEGER NOT NULL, "plan" TEXT NULL)'
+    )
+    insert_sql = (
+        'INSERT INTO "{table}" ("created_at", "fingerprint", "params", "duration", "rows_read", "rows_written", "plan") '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    )
+
+    def __init__(self, duration=None, rows_read=None, explain_sample_rate=0, table=None):
+        self.duration = duration
+        self.rows_read = rows_read
+        self.explain_sample_rate = explain_sample_rate
+        self.table = table
+        self._table_created = False
+        self._pending = deque(maxlen=self.max_pending)
+
+    @classmethod
+    def from_settings(cls, settings_dict):
+        options = settings_dict.get('SLOW_QUERY_LOG') if isinstance(settings_dict, dict) else None
+        if not isinstance(options, dict):
+            return None
+
+        if options.get('DURATION') is None and options.get('ROWS_READ') is None:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured(
+                "settings.DATABASES is improperly configured. "
+                "Please supply the SLOW_QUERY_LOG DURATION or ROWS_READ value."
+            )
+
+        return cls(
+            duration=options.get('DURATION'),
+            rows_read=options.get('ROWS_READ'),
+            explain_sample_rate=options.get('EXPLAIN_SAMPLE_RATE', 0),
+            table=options.get('TABLE'),
+        )
+
+    def is_slow(self, duration, rows_read):
+        return (
+            (self.duration is not None and duration >= self.duration)
+            or (self.rows_read is not None and rows_read >= self.rows_read)
+        )
+
+    def record(self, database_wrapper, query, params, duration, result):
+        """Log the statement if it crossed a threshold; never raises."""
+        rows_read = getattr(result, 'rows_read', 0) or 0
+        if not self.is_slow(duration, rows_read):
+            return
+
+        try:
+            plan = None
+            if self.explain_sample_rate and random.random() < self.explain_sample_rate:
+                plan = self.explain(database_wrapper, query, params)
+
+            entry = {
+                'fingerprint': fingerprint(query),
+                'params': params_shape(params),
+                'duration': round(duration, 3),
+                'rows_read': rows_read,
+                'rows_written': getattr(result, 'rows_written', 0) or 0,
+                'plan': plan,
+            }
+            if self.table:
+                entry['created_at'] = datetime.now(timezone.utc).isoformat()
+                self._pending.append(entry)
+            else:
+                logger.warning(
+                    f"Slow query ({entry['duration']}ms, {entry['rows_read']} rows read, "
+                    f"{entry['rows_written']} rows written): {entry['fingerprint']} [{entry['params']}]"
+                    + (f"\n{plan}" if plan else '')
+                )
+        except Exception as e:
+            logger.warning(f"Slow query log failed: {repr(e)}")
+
+    def explain(self, database_wrapper, query, params):
+        """The statement's EXPLAIN QUERY PLAN as indented text, or None for statements it doesn't apply to."""
+        plan = query_plan(database_wrapper, query, params)
+        return '\n'.join(plan) if plan is not None else None
+
+    def due(self):
+        return bool(self._pending)
+
+    async def flush(self, database_wrapper):
+        """Write the queued entries to the table; never raises."""
+        entries = list(self._pending)
+        self._pending.clear()
+        if not entries:
+            return
+        try:
+            if not self._table_created:
+                await database_wrapper.run_queries_async([(self.create_table_sql.format(table=self.table), None)])
+                self._table_created = True
+
+            insert_sql = self.insert_sql.format(table=self.table)
+            await database_wrapper.run_queries_async([
+                (insert_sql, (
+                    entry['created_at'], entry['fingerprint'], entry['params'], entry['duration'],
+                    entry['rows_read'], entry['rows_written'], entry['plan'],
+                ))
+                for entry in entries
+            ])
+        except Exception as e:
+            logger.warning(f"Slow query log failed: {repr(e)}")
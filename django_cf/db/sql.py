@@ -0,0 +1,63 @@
+import re
+
+# A table name as it appears after FROM/JOIN/INTO/UPDATE/TABLE: "quoted",
+# `quoted`, [quoted] or bare
+_IDENTIFIER = r'(?:"([^"]+)"|`([^`]+)`|\[([^\]]+)\]|([A-Za-z_][\w$]*))'
+
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+' + _IDENTIFIER
+    + r'((?:\s*,\s*' + _IDENTIFIER + r')*)',
+    re.IGNORECASE,
+)
+_LIST_ITEM_RE = re.compile(r',\s*' + _IDENTIFIER)
+
+_KEYWORDS = {'select', 'values', 'set', 'where', 'default'}
+
+
+def _name(groups):
+    name = next((group for group in groups if group), None)
+    if name is None or name.lower() in _KEYWORDS:
+        return None
+    return name
+
+
+def query_tables(query):
+    """
+    Best-effort set of the tables a statement reads or writes.
+
+    Works on the SQL Django generates (quoted identifiers after FROM, JOIN,
+    INTO, UPDATE and TABLE) and on most hand-written SQL. Subqueries are
+    found through their own FROM clauses.
+    """
+    tables = set()
+    for match in _TABLE_RE.finditer(query):
+        name = _name(match.groups()[:4])
+        if name:
+            tables.add(name)
+        for item in _LIST_ITEM_RE.finditer(match.group(5) or ''):
+            name = _name(item.groups())
+            if name:
+                tables.add(name)
+    return tables
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w"$])-?\d+(?:\.\d+)?(?![\w"])')
+_PLACEHOLDER_RE = re.compile(r'%s|\?\d*|:\w+')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(query):
+    """
+    Shape of a statement with its values taken out.
+
+    String and number literals and placeholders become ``?`` and IN lists of
+    any length become ``IN (...)``, so the statements an ORM loop sends for
+    different rows share one fingerprint.
+    """
+    query = _STRING_RE.sub('?', query)
+    query = _PLACEHOLDER_RE.sub('?', query)
+    query = _NUMBER_RE.sub('?', query)
+    query = _IN_LIST_RE.sub('IN (...)', query)
+    return _WHITESPACE_RE.sub(' ', query).strip()
@@ -0,0 +1,242 @@
+import hashlib
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from .slowlog import params_shape
+from .sql import fingerprint
+
+logger = logging.getLogger(__name__)
+
+OTHER = '<other>'
+
+
+class StatementStats:
+    """Running totals for one statement fingerprint."""
+
+    def __init__(self, query, params, max_samples=1000):
+        self.query = query
+        self.params = params_shape(params)
+        self.calls = 0
+        self.total_time = 0.0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.durations = deque(maxlen=max_samples)
+
+    def add(self, duration, rows_read=0, rows_written=0):
+        self.calls += 1
+        self.total_time += duration
+        self.rows_read += rows_read or 0
+        self.rows_written += rows_written or 0
+        self.durations.append(duration)
+
+    def p95(self):
+        """95th percentile of the most recent durations."""
+        if not self.durations:
+            return 0.0
+        durations = sorted(self.durations)
+        return durations[max(math.ceil(len(durations) * 0.95) - 1, 0)]
+
+    def as_dict(self, shape):
+        return {
+            'fingerprint': shape,
+            'query': self.query,
+            'params': self.params,
+            'calls': self.calls,
+            'total_time': round(self.total_time, 3),
+            'p95_time': round(self.p95(), 3),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+        }
+
+
+class LogSink:
+    async def write(self, rows):
+        for row in rows:
+            logger.info(
+                f"{row['calls']} calls, {row['total_time']}ms total, p95 {row['p95_time']}ms, "
+                f"{row['rows_read']} rows read, {row['rows_written']} rows written: {row['fingerprint']}"
+            )
+
+
+class TableSink:
+    """Appends one row per fingerprint and flush to a table in the same database."""
+
+    create_table_sql = (
+        'CREATE TABLE IF NOT EXISTS "{table}" ('
+        '"id" INTEGER PRIMARY KEY AUTOINCREMENT, "flushed_at" TEXT NOT NULL, "fingerprint" TEXT NOT NULL, '
+        '"query" TEXT NOT NULL, "params" TEXT NOT NULL, "calls" INTEGER NOT NULL, "total_time" REAL NOT NULL, '
+        '"p95_time" REAL NOT NULL, "rows_read" INTEGER NOT NULL, "rows_written" INTEGER NOT NULL)'
+    )
+    insert_sql = (
+        'INSERT INTO "{table}" ("flushed_at", "fingerprint", "query", "params", "calls", "total_time", '
+        '"p95_time", "rows_read", "rows_written") VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+    )
+
+    def __init__(self, database_wrapper, table):
+        self.database_wrapper = database_wrapper
+        self.table = table
+        self._table_created = False
+
+    async def write(self, rows):
+        if not self._table_created:
+            await self.database_wrapper.run_queries_async([(self.create_table_sql.format(table=self.table), None)])
+            self._table_created = True
+
+        flushed_at = datetime.now(timezone.utc).isoformat()
+        insert_sql = self.insert_sql.format(table=self.table)
+        await self.database_wrapper.run_queries_async([
+            (insert_sql, (
+                flushed_at, row['fingerprint'], row['query'], row['params'], row['calls'],
+                row['total_time'], row['p95_time'], row['rows_read'], row['rows_written'],
+            ))
+            for row in rows
+        ])
+
+
+class AnalyticsEngineSink:
+    """
+    Writes one Workers Analytics Engine data point per fingerprint and flush:
+    blobs are (fingerprint, params), doubles are (calls, total_time, p95_time,
+    rows_read, rows_written) and the index is a hash of the fingerprint.
+    """
+
+    def __init__(self, binding):
+        self.binding = binding
+
+    async def write(self, rows):
+        from js import Object
+        from pyodide.ffi import to_js
+        from workers import env
+
+        dataset = getattr(env, self.binding)
+        for row in rows:
+            dataset.writeDataPoint(to_js({
+                'indexes': [hashlib.sha256(row['fingerprint'].encode('utf-8')).hexdigest()[:32]],
+                'blobs': [row['fingerprint'][:4096], row['params'][:512]],
+                'doubles': [row['calls'], row['total_time'], row['p95_time'], row['rows_read'], row['rows_written']],
+            }, dict_converter=Object.fromEntries))
+
+
+class StatementStatsCollector:
+    """
+    Per-fingerprint statement statistics aggregated in isolate memory, in the
+    spirit of PostgreSQL's pg_stat_statements.
+
+    Enabled per database with the ``STATEMENT_STATS`` key::
+
+        'STATEMENT_STATS': {
+            'SINK': 'table',                      # 'log', 'table' or 'analytics_engine'
+            'TABLE': 'django_cf_statement_stats',  # for 'table'
+            'ANALYTICS_BINDING': 'QUERY_STATS',    # for 'analytics_engine'
+            'FLUSH_INTERVAL': 60,                  # seconds between flushes
+            'MAX_STATEMENTS': 500,                 # distinct fingerprints kept between flushes
+        }
+
+    The worker bridge flushes the totals after a response once FLUSH_INTERVAL
+    has passed, through ``ctx.waitUntil`` so the response isn't held up, and
+    counting starts over. Statements sent together by gather() are each
+    charged the batch's wall time. Fingerprints past MAX_STATEMENTS are
+    counted under ``<other>``.
+    """
+
+    sinks = ('log', 'table', 'analytics_engine')
+
+    def __init__(self, sink, flush_interval=60, max_statements=500, max_samples=1000):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_statements = max_statements
+        self.max_samples = max_samples
+        self._statements = {}
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls, settings_dict, database_wrapper):
+        options = settings_dict.get('STATEMENT_STATS') if isinstance(settings_dict, dict) else None
+        if options is True:
+            options = {}
+        if not isinstance(options, dict):
+            return None
+
+        from django.core.exceptions import ImproperlyConfigured
+
+        kind = options.get('SINK', 'log')
+        if kind == 'log':
+            sink = LogSink()
+        elif kind == 'table':
+            sink = TableSink(database_wrapper, options.get('TABLE', 'django_cf_statement_stats'))
+        elif kind == 'analytics_engine':
+            if not options.get('ANALYTICS_BINDING'):
+                raise ImproperlyConfigured(
+                    "settings.DATABASES is improperly configured. "
+                    "Please supply the STATEMENT_STATS ANALYTICS_BINDING value."
+                )
+            sink = AnalyticsEngineSink(options['ANALYTICS_BINDING'])
+        else:
+            raise ImproperlyConfigured(
+                "settings.DATABASES is improperly configured. "
+                f"STATEMENT_STATS SINK must be one of {', '.join(cls.sinks)}."
+            )
+
+        return cls(
+            sink,
+            flush_interval=options.get('FLUSH_INTERVAL', 60),
+            max_statements=options.get('MAX_STATEMENTS', 500),
+        )
+
+    def record(self, query, params, duration, rows_read=0, rows_written=0):
+        shape = fingerprint(query)
+        stats = self._statements.get(shape)
+        if stats is None:
+            if len(self._statements) >= self.max_statements:
+                shape, query, params = OTHER, OTHER, None
+                stats = self._statements.get(shape)
+            if stats is None:
+                stats = self._statements[shape] = StatementStats(query, params, self.max_samples)
+        stats.add(duration, rows_read, rows_written)
+
+    def top(self, limit=20, order_by='total_time'):
+        """The statements recorded since the last flush, highest ``order_by`` first."""
+        rows = [stats.as_dict(shape) for shape, stats in self._statements.items()]
+        return sorted(rows, key=lambda row: row[order_by], reverse=True)[:limit]
+
+    def due(self):
+        return bool(self._statements) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def drain(self):
+        rows = [stats.as_dict(shape) for shape, stats in self._statements.items()]
+        self._statements = {}
+        self._last_flush = time.monotonic()
+        return rows
+
+    async def flush(self):
+        rows = self.drain()
+        if not rows:
+            return
+        try:
+            await self.sink.write(rows)
+        except Exception as e:
+            logger.warning(f"Statement stats flush failed: {repr(e)}")
+
+
+def pending_flushes():
+    """
+    Flush coroutines of the CF connections' statement stats whose
+    FLUSH_INTERVAL has passed and of their queued slow query log entries.
+    """
+    from django.db import connections
+    from .base_engine import CFDatabase, CFDatabaseWrapper
+
+    flushes = []
+    for conn in connections.all(initialized_only=True):
+        if not isinstance(conn, CFDatabaseWrapper) or not isinstance(conn.connection, CFDatabase):
+            continue
+        collector = conn.connection.statement_stats
+        if collector is not None and collector.due():
+            flushes.append(collector.flush())
+        slow_query_log = conn.connection.slow_query_log
+        if slow_query_log is not None and slow_query_log.due():
+            flushes.append(slow_query_log.flush(conn.connection.databaseWrapper))
+    return flushes
@@ -0,0 +1,183 @@
+"""
+get_or_create() and update_or_create() in fewer round trips, using SQLite's
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` and ``UPDATE ... RETURNING``.
+
+Django's versions read the row first and then insert or save it, so
+update_or_create() always takes two statements, and a concurrent insert
+surfaces as an IntegrityError, which D1 doesn't raise as one. Here:
+
+- update_or_create() updates in place and only inserts when nothing was
+  updated: one statement when the row exists, two when it doesn't.
+- create_or_get() inserts first and only reads the row back on a conflict:
+  one statement when the row is new.
+- get_or_create() reads first, then continues as create_or_get(), so a
+  concurrent insert is picked up instead of failing.
+
+The fast path applies on the Cloudflare backends when the lookup is on
+concrete fields of the model covering a primary key, unique field or
+unconditional unique constraint, as then at most one row can match. Other
+lookups and databases use Django's implementation.
+
+The rows are written with SQL, not Model.save(): save() overrides and the
+pre_save/post_save signals don't run. auto_now fields are updated.
+"""
+from django.db import IntegrityError, connections
+from django.db.models import QuerySet
+from django.db.models.sql import InsertQuery, UpdateQuery
+from django.db.models.utils import resolve_callables
+
+
+def _field_names(opts, names):
+    """The concrete fields of ``names``, or None if any name isn't a plain local field."""
+    fields = []
+    for name in names:
+        if name == 'pk':
+            fields.append(opts.pk)
+            continue
+        field = next((f for f in opts.local_concrete_fields if name in (f.name, f.attname)), None)
+        if field is None:
+            return None
+        fields.append(field)
+    return fields
+
+
+def _unique_sets(opts):
+    yield {opts.pk}
+    for field in opts.local_concrete_fields:
+        if field.unique:
+            yield {field}
+    for names in opts.unique_together:
+        yield {opts.get_field(name) for name in names}
+    for constraint in opts.total_unique_constraints:
+        if not constraint.expressions:
+            yield {opts.get_field(name) for name in constraint.fields}
+
+
+def supports_upsert(queryset, kwargs, *defaults):
+    """Whether ``queryset`` can take the fast path for a lookup on ``kwargs`` setting ``defaults``."""
+    from .base_engine import CFDatabaseWrapper
+
+    opts = queryset.model._meta
+    if not isinstance(connections[queryset.db], CFDatabaseWrapper) or opts.parents:
+        return False
+    if any(hasattr(value, 'resolve_expression') for value in kwargs.values()):
+        return False
+
+    lookup = _field_names(opts, kwargs)
+    if lookup is None or any(_field_names(opts, names or ()) is None for names in defaults):
+        return False
+    return any(unique.issubset(lookup) for unique in _unique_sets(opts))
+
+
+def _returning(queryset):
+    connection = connections[queryset.db]
+    fields = queryset.model._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    return fields, f' RETURNING {columns}'
+
+
+def _fetch_instance(queryset, compiler, sql, params, fields):
+    """Run a RETURNING statement and return its row as an instance, or None."""
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    opts = queryset.model._meta
+    converters = compiler.get_converters([field.get_col(opts.db_table) for field in fields])
+    if converters:
+        row = next(iter(compiler.apply_converters([row], converters)))
+    return queryset.model.from_db(queryset.db, [field.attname for field in fields], row)
+
+
+def insert_or_ignore(queryset, values):
+    """Insert a row with ``values``; the new instance, or None if it conflicted with an existing row."""
+    obj = queryset.model(**values)
+    opts = queryset.model._meta
+    insert_fields = [field for field in opts.local_concrete_fields if not getattr(field, 'generated', False)]
+    if obj.pk is None:
+        insert_fields = [field for field in insert_fields if field is not opts.auto_field]
+
+    query = InsertQuery(queryset.model)
+    query.insert_values(insert_fields, [obj])
+    compiler = query.get_compiler(using=queryset.db)
+    [(sql, params)] = compiler.as_sql()
+
+    fields, returning = _returning(queryset)
+    return _fetch_instance(queryset, compiler, sql + ' ON CONFLICT DO NOTHING' + returning, params, fields)
+
+
+def update_returning(queryset, kwargs, values):
+    """Update the row matching ``kwargs`` with ``values``; the updated instance, or None if there was none."""
+    opts = queryset.model._meta
+    values = dict(values)
+    for field in opts.local_concrete_fields:
+        if getattr(field, 'auto_now', False) and field.name not in values:
+            values[field.name] = field.pre_save(queryset.model(), add=False)
+
+    query = queryset.filter(**kwargs).query.chain(UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+
+    fields, returning = _returning(queryset)
+    return _fetch_instance(queryset, compiler, sql + returning, params, fields)
+
+
+def create_or_get(queryset, defaults=None, **kwargs):
+    """
+    Like get_or_create(), but inserting first: ``(object, created)``. Cheaper
+    than get_or_create() when the row usually doesn't exist yet.
+    """
+    queryset._for_write = True
+    if not supports_upsert(queryset, kwargs, defaults):
+        return QuerySet.get_or_create(queryset, defaults, **kwargs)
+
+    obj = insert_or_ignore(queryset, {**kwargs, **dict(resolve_callables(defaults or {}))})
+    if obj is not None:
+        return obj, True
+    try:
+        return queryset.get(**kwargs), False
+    except queryset.model.DoesNotExist:
+        raise IntegrityError(f"{queryset.model._meta.object_name} conflicts with a row not matching {kwargs!r}.")
+
+
+def get_or_create(queryset, defaults=None, **kwargs):
+    """QuerySet.get_or_create() that treats a concurrent insert as found; ``(object, created)``."""
+    queryset._for_write = True
+    if not supports_upsert(queryset, kwargs, defaults):
+        return QuerySet.get_or_create(queryset, defaults, **kwargs)
+
+    try:
+        return queryset.get(**kwargs), False
+    except queryset.model.DoesNotExist:
+        return create_or_get(queryset, defaults, **kwargs)
+
+
+def update_or_create(queryset, defaults=None, create_defaults=None, **kwargs):
+    """QuerySet.update_or_create() updating in place before inserting; ``(object, created)``."""
+    if create_defaults is None:
+        create_defaults = defaults
+    queryset._for_write = True
+    if not supports_upsert(queryset, kwargs, defaults, create_defaults):
+        return QuerySet.update_or_create(queryset, defaults, create_defaults, **kwargs)
+
+    update_values = dict(resolve_callables(defaults or {}))
+
+    def update():
+        if not update_values:
+            return queryset.filter(**kwargs).first()
+        return update_returning(queryset, kwargs, update_values)
+
+    obj = update()
+    if obj is not None:
+        return obj, False
+    obj = insert_or_ignore(queryset, {**kwargs, **dict(resolve_callables(create_defaults or {}))})
+    if obj is not None:
+        return obj, True
+    # Inserted concurrently since the update
+    obj = update()
+    if obj is None:
+        raise IntegrityError(f"{queryset.model._meta.object_name} conflicts with a row not matching {kwargs!r}.")
+    return obj, False
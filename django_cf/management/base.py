@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from django_cf.db.base_engine import CFDatabaseWrapper
+
+COLUMNS = ('calls', 'total_time', 'p95_time', 'rows_read', 'rows_written')
+
+
+class StatementStatsCommand(BaseCommand):
+    """Base for commands reading the statements recorded by STATEMENT_STATS."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias. Defaults to "default".')
+        parser.add_argument('--limit', type=int, default=20, help='Number of statements to read.')
+        parser.add_argument(
+            '--memory', action='store_true',
+            help="Use this isolate's totals since the last flush instead of the flushed table.",
+        )
+
+    def get_connection(self, options):
+        connection = connections[options['database']]
+        if not isinstance(connection, CFDatabaseWrapper):
+            raise CommandError(f"Database '{options['database']}' does not use a django_cf backend.")
+        if not connection.settings_dict.get('STATEMENT_STATS'):
+            raise CommandError(f"STATEMENT_STATS is not enabled for database '{options['database']}'.")
+        return connection
+
+    def statements(self, connection, options, order_by):
+        """Recorded statements as dicts (fingerprint, query, params and COLUMNS), highest ``order_by`` first."""
+        if options['memory']:
+            connection.ensure_connection()
+            return connection.connection.statement_stats.top(options['limit'], order_by)
+
+        settings = connection.settings_dict['STATEMENT_STATS']
+        if not isinstance(settings, dict) or settings.get('SINK') != 'table':
+            raise CommandError("Only the 'table' STATEMENT_STATS sink can be read; use --memory for this isolate.")
+
+        table = connection.ops.quote_name(settings.get('TABLE', 'django_cf_statement_stats'))
+        # p95 can't be merged across flushes, the worst one is shown
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT "fingerprint", MAX("query"), MAX("params"), SUM("calls") AS "calls", '
+                f'SUM("total_time") AS "total_time", MAX("p95_time") AS "p95_time", '
+                f'SUM("rows_read") AS "rows_read", SUM("rows_written") AS "rows_written" FROM {table} '
+                f'GROUP BY "fingerprint" ORDER BY "{order_by}" DESC LIMIT %s',
+                [options['limit']],
+            )
+            rows = [dict(zip(('fingerprint', 'query', 'params') + COLUMNS, row)) for row in cursor.fetchall()]
+        return sorted(rows, key=lambda row: row[order_by], reverse=True)
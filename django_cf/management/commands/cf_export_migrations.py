@@ -0,0 +1,184 @@
+import copy
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.operations import RunPython
+from django.db.models.signals import post_migrate
+from django.db.utils import load_backend
+
+NUMBERED_FILE = re.compile(r'^(\d+)_.*\.sql$')
+CREATE_TABLE = re.compile(r'^CREATE TABLE "([^"]+)"')
+DROP_TABLE = re.compile(r'^DROP TABLE (?:IF EXISTS )?"([^"]+)"')
+RENAME_TABLE = re.compile(r'^ALTER TABLE "([^"]+)" RENAME TO "([^"]+)"')
+ACTION_REFERENCE = re.compile(r'REFERENCES "([^"]+)" \([^)]*\) ON DELETE (?:CASCADE|SET NULL)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the pending migrations into numbered .sql files for `wrangler d1 migrations apply`, "
+        "using a local SQLite file that tracks the exported schema."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias whose migrations are exported (routers apply). Defaults to "default".',
+        )
+        parser.add_argument(
+            '--output', default='migrations',
+            help='Directory of the wrangler migrations (migrations_dir). Defaults to "migrations".',
+        )
+        parser.add_argument(
+            '--state',
+            help='Local SQLite file the migrations are applied to. Defaults to django_cf_state.sqlite3 in --output.',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+        state = options['state'] or output / 'django_cf_state.sqlite3'
+
+        settings_dict = connections.configure_settings({
+            alias: {'ENGINE': 'django_cf.db.backends.local', 'NAME': str(state)},
+        })[alias]
+        local = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+        # Models, routers and the migration recorder all reach the database by alias
+        previous = connections[alias]
+        connections[alias] = local
+        try:
+            self.export(local, output)
+        finally:
+            connections[alias] = previous
+            local.close_sqlite()
+
+    def export(self, connection, output):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write("No migrations to export.")
+            return
+        if any(backwards for _, backwards in plan):
+            raise CommandError("The state database has migrations applied that no longer exist.")
+
+        number = self.next_number(output)
+        state = executor._create_project_state(with_applied_migrations=True)
+        quote_value = connection.schema_editor().quote_value
+        for index, (migration, _) in enumerate(plan):
+            exported, skipped = self.exportable(migration)
+            references = self.action_references(connection)
+            with connection.recording() as statements:
+                if index == 0:
+                    executor.recorder.ensure_schema()
+                state = executor.apply_migration(state, exported)
+
+            path = output / f'{number:04d}_{migration.app_label}_{migration.name}.sql'
+            skipped = [operation for operation in skipped if operation.code is not RunPython.noop]
+            lines = [f'-- {migration.app_label}.{migration.name}, exported by cf_export_migrations']
+            lines += [f'-- Skipped, not expressible as SQL: {operation.describe()}' for operation in skipped]
+            # Table remakes drop tables other tables reference
+            lines.append('PRAGMA defer_foreign_keys = true;')
+            lines += [self.render(query, params, quote_value) + ';' for query, params in statements]
+            # Switching it off forgets the violations the dropped tables left
+            lines.append('PRAGMA defer_foreign_keys = false;')
+            path.write_text('\n'.join(lines) + '\n')
+            self.stdout.write(f"Wrote {path} ({len(statements)} statements)")
+            for table, children in self.unsafe_drops(references, statements):
+                self.stderr.write(self.style.WARNING(
+                    f"{migration.app_label}.{migration.name}: {path.name} drops \"{table}\" while "
+                    f"{', '.join(children)} reference it with ON DELETE actions. Applying it deletes or nulls "
+                    f"their rows."
+                ))
+            if skipped:
+                self.stderr.write(self.style.WARNING(
+                    f"{migration.app_label}.{migration.name}: skipped {len(skipped)} RunPython operation(s); "
+                    f"their data changes aren't in {path.name}."
+                ))
+            number += 1
+
+        if post_migrate.has_listeners():
+            self.stderr.write(self.style.WARNING(
+                "post_migrate handlers, such as the ones creating content types and permissions, didn't run. "
+                "Their rows aren't in the exported files."
+            ))
+
+    @staticmethod
+    def exportable(migration):
+        """A copy of ``migration`` without its RunPython operations, and the operations left out."""
+        operations, skipped = [], []
+        for operation in migration.operations:
+            if operation.reduces_to_sql:
+                operations.append(operation)
+                continue
+            if not isinstance(operation, RunPython):
+                raise CommandError(
+                    f"{migration.app_label}.{migration.name} can't be exported: "
+                    f"'{operation.describe()}' doesn't reduce to SQL. Apply it with migrate."
+                )
+            skipped.append(operation)
+
+        exported = copy.copy(migration)
+        exported.operations = operations
+        return exported, skipped
+
+    @staticmethod
+    def action_references(connection):
+        """``{table: referenced tables}`` of the foreign keys with an ON DELETE action in the state database."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT m.name, f.\"table\" FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f "
+                "WHERE m.type = 'table' AND f.on_delete IN ('CASCADE', 'SET NULL')"
+            )
+            rows = cursor.fetchall()
+        references = {}
+        for table, referenced in rows:
+            references.setdefault(table, set()).add(referenced)
+        return references
+
+    @staticmethod
+    def unsafe_drops(references, statements):
+        """
+        ``(table, referencing tables)`` for each DROP TABLE in ``statements``
+        run while other tables reference the table with ON DELETE actions,
+        following the ``references`` of action_references() through the
+        statements' CREATE TABLE and renames.
+        """
+        references = {table: set(referenced) for table, referenced in references.items()}
+        unsafe = []
+        for query, _ in statements:
+            if match := CREATE_TABLE.match(query):
+                references[match[1]] = set(ACTION_REFERENCE.findall(query))
+            elif match := DROP_TABLE.match(query):
+                table = match[1]
+                children = sorted(child for child, referenced in references.items()
+                                  if table in referenced and child != table)
+                if children:
+                    unsafe.append((table, children))
+                references.pop(table, None)
+            elif match := RENAME_TABLE.match(query):
+                old, new = match[1], match[2]
+                references[new] = references.pop(old, set())
+                # SQLite renames the references to the table too
+                for referenced in references.values():
+                    if old in referenced:
+                        referenced.discard(old)
+                        referenced.add(new)
+        return unsafe
+
+    @staticmethod
+    def render(query, params, quote_value):
+        """``query`` with its params inlined as SQL literals."""
+        if not params:
+            return query  # A % in the query is then a literal %
+        return query % tuple(quote_value(param) for param in params)
+
+    @staticmethod
+    def next_number(output):
+        """The number after the highest numbered .sql file, as wrangler d1 migrations create counts."""
+        matches = [NUMBERED_FILE.match(path.name) for path in output.iterdir()]
+        numbers = [int(match.group(1)) for match in matches if match]
+        return max(numbers, default=-1) + 1
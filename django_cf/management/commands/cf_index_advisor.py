@@ -0,0 +1,44 @@
+from django_cf.db.advisor import advise
+from django_cf.management.base import StatementStatsCommand
+
+
+class Command(StatementStatsCommand):
+    help = (
+        "Propose indexes for the statements recorded by STATEMENT_STATS that scan whole tables, "
+        "ranked by the rows those statements read."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(limit=200)
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Skip scans of tables with fewer rows than this. Defaults to 1000.',
+        )
+        parser.add_argument(
+            '--format', default='meta', choices=('meta', 'migration'),
+            help="Print Meta.indexes entries (default) or migrations.AddIndex operations.",
+        )
+
+    def handle(self, *args, **options):
+        connection = self.get_connection(options)
+        statements = self.statements(connection, options, 'rows_read')
+        proposals = advise(connection, statements, min_rows=options['min_rows'])
+
+        if not proposals:
+            self.stdout.write("No missing indexes found.")
+            return
+
+        for proposal in proposals:
+            index = proposal.index
+            opts = proposal.model._meta
+            self.stdout.write(
+                f"# {opts.label}: {proposal.rows_read} rows read by {len(proposal.statements)} scanning statement(s)"
+            )
+            if options['format'] == 'migration':
+                self.stdout.write(
+                    f"migrations.AddIndex(model_name='{opts.model_name}', "
+                    f"index=models.Index(fields={index.fields!r}, name='{index.name}')),"
+                )
+            else:
+                self.stdout.write(f"models.Index(fields={index.fields!r}),")
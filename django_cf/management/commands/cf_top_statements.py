@@ -0,0 +1,23 @@
+from django_cf.management.base import COLUMNS, StatementStatsCommand
+
+
+class Command(StatementStatsCommand):
+    help = "List the statements with the highest cost recorded by STATEMENT_STATS."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--order-by', default='total_time', choices=COLUMNS, help='Column to rank by.')
+
+    def handle(self, *args, **options):
+        connection = self.get_connection(options)
+        rows = self.statements(connection, options, options['order_by'])
+
+        if not rows:
+            self.stdout.write("No statements recorded.")
+            return
+
+        for row in rows:
+            self.stdout.write(
+                f"{row['calls']:>8} calls {row['total_time']:>12.1f}ms total {row['p95_time']:>9.1f}ms p95 "
+                f"{row['rows_read']:>10} read {row['rows_written']:>8} written  {row['fingerprint']}"
+            )
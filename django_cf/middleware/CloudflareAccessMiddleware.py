@@ -5,12 +5,17 @@ import time
 import urllib.request
 import urllib.error
 from django.contrib.auth import get_user_model, login
-from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser, BaseUserManager, UserManager
+from django.db import router
+from django.db.models.signals import post_save, pre_save
 from django.http import JsonResponse
 from django.conf import settings
 from django.core.cache import cache
 import logging
 
+from django_cf.db.upsert import create_or_get, supports_upsert
+
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
@@ -470,21 +475,56 @@ class CloudflareAccessMiddleware:
                 name_parts = name.split(' ', 1)
                 user.first_name = name_parts[0]
                 user.last_name = name_parts[1] if len(name_parts) > 1 else ''
-                user.save()
+                user.save(update_fields=['first_name', 'last_name'])
 
             return user
 
         except User.DoesNotExist:
             # Create new user
             name_parts = name.split(' ', 1) if name else ['', '']
-
-            user = User.objects.create_user(
-                username=email,  # Use email as username
-                email=email,
-                first_name=name_parts[0],
-                last_name=name_parts[1] if len(name_parts) > 1 else '',
-                is_active=True
+            first_name = name_parts[0]
+            last_name = name_parts[1] if len(name_parts) > 1 else ''
+
+            manager = User._default_manager
+            username = User.normalize_username(email)  # Use email as username
+            if (getattr(type(manager), 'create_user', None) is not UserManager.create_user
+                    or not supports_upsert(manager.all(), {'username': username})):
+                # A custom create_user() may do more than insert the row, and
+                # other databases save() it as usual
+                user = manager.create_user(
+                    username=email,  # Use email as username
+                    email=email,
+                    first_name=first_name,
+                    last_name=last_name,
+                    is_active=True
+                )
+                logger.info(f"Created new user from Cloudflare Access: {email}")
+                return user
+
+            # Inserting with ON CONFLICT DO NOTHING lets a concurrent first
+            # request for the same user find the row instead of failing on
+            # the unique username. The row is written with SQL, so the save
+            # signals are sent here; pre_save receivers may change the values.
+            user = User(
+                username=username,
+                email=BaseUserManager.normalize_email(email),
+                first_name=first_name,
+                last_name=last_name,
+                password=make_password(None),
+                is_active=True,
             )
-
-            logger.info(f"Created new user from Cloudflare Access: {email}")
+            using = router.db_for_write(User, instance=user)
+            pre_save.send(sender=User, instance=user, raw=False, using=using, update_fields=None)
+            user, created = create_or_get(
+                manager.db_manager(using).all(),
+                defaults={
+                    field.attname: getattr(user, field.attname)
+                    for field in User._meta.local_concrete_fields
+                    if field is not User._meta.pk and field.attname != 'username'
+                },
+                username=user.username,
+            )
+            if created:
+                post_save.send(sender=User, instance=user, created=True, update_fields=None, raw=False, using=using)
+                logger.info(f"Created new user from Cloudflare Access: {email}")
             return user
@@ -0,0 +1,147 @@
+"""
+Keyset (seek) pagination.
+
+Django's Paginator pages with OFFSET, and on D1 every skipped row counts as
+read, so page 500 costs 500 times page 1. KeysetPaginator continues after
+the last row of the previous page instead, so every page costs the same::
+
+    paginator = KeysetPaginator(Post.objects.order_by('-pub_date'), 25)
+    page = paginator.page(request.GET.get('cursor'))
+    page.next_cursor  # pass back as ?cursor=... for the following page
+
+Pages are addressed with opaque cursors rather than numbers, and there is no
+page count. Where numbered pages are wanted, CountedPaginator at least skips
+the ``COUNT(*)`` of large tables by using stored row counts.
+"""
+from collections.abc import Sequence
+
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+
+from django_cf.db import counts, keyset
+
+
+class KeysetPage(Sequence):
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Page of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by its ordering fields plus the primary key.
+
+    ``ordering`` overrides the queryset's ordering; see
+    django_cf.db.keyset.ordering_fields() for what can be ordered by. Fields
+    spanning relations are read from the objects, so select_related() them.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        try:
+            self.fields = keyset.ordering_fields(object_list, ordering)
+        except ValueError as e:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured(str(e))
+
+    def page(self, cursor=None):
+        """The page at ``cursor``, or the first page; InvalidPage for a malformed cursor."""
+        direction, values = 'next', None
+        if cursor:
+            try:
+                direction, values = keyset.decode_cursor(cursor, self.object_list.model, self.fields)
+            except ValueError:
+                raise InvalidPage(_("That page contains no results"))
+
+        backwards = direction == 'previous'
+        queryset = self.object_list.order_by(*keyset.order_by(self.fields, reverse=backwards))
+        if values is not None:
+            queryset = queryset.filter(keyset.seek_q(self.fields, values, reverse=backwards))
+
+        # One extra row tells whether there is more in this direction
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows, self)
+
+        has_next = True if backwards else more
+        has_previous = more if backwards else values is not None
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=keyset.encode_cursor(keyset.row_values(rows[-1], self.fields)) if has_next else None,
+            previous_cursor=(
+                keyset.encode_cursor(keyset.row_values(rows[0], self.fields), 'previous') if has_previous else None
+            ),
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for ListView (or any MultipleObjectMixin view)::
+
+        class PostList(KeysetPaginationMixin, ListView):
+            queryset = Post.objects.order_by('-pub_date')
+            paginate_by = 25
+
+    The page is chosen with the ``cursor`` query parameter and the template
+    gets the usual ``page_obj``, whose ``next_cursor``/``previous_cursor``
+    build the links.
+    """
+
+    cursor_kwarg = 'cursor'
+    keyset_ordering = None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator taking the count of an unfiltered queryset from the stored row
+    counts (see django_cf.db.counts) once the table has at least
+    ``count_threshold`` rows. Smaller tables, filtered querysets and tables
+    without a stored count are counted as usual.
+    """
+
+    count_threshold = 1000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and counts.is_unfiltered(queryset):
+            stored = counts.row_count(queryset.model, using=queryset.db)
+            if stored is not None and stored >= self.count_threshold:
+                return stored
+        return super().count
@@ -0,0 +1,109 @@
+"""
+Per-request database statistics for the Cloudflare backends.
+
+Every statement executed through a D1/DO connection is recorded on the
+current QueryStats, which is reset when Django starts handling a request::
+
+    from django_cf import stats
+
+    def my_view(request):
+        ...
+        print(stats.current().as_dict())
+
+With ``CLOUDFLARE_SERVER_TIMING = True`` in settings, the worker bridge also
+adds the totals to each response as a ``Server-Timing`` header.
+"""
+import logging
+
+from django.core import signals
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = 0
+        self.cached = 0
+        self.db_time = 0.0  # milliseconds
+        self.rows_read = 0
+        self.rows_written = 0
+        self.slowest_query = None
+        self.slowest_time = 0.0
+        # See django_cf.budget: limits set by query_budget and those already exceeded
+        self.budget = {}
+        self.exceeded = {}
+
+    def record(self, query, duration, rows_read=0, rows_written=0, count=1):
+        """Account for ``count`` statements that took ``duration`` ms of wall time together."""
+        self.queries += count
+        self.db_time += duration
+        self.rows_read += rows_read or 0
+        self.rows_written += rows_written or 0
+        if self.slowest_query is None or duration > self.slowest_time:
+            self.slowest_query = query
+            self.slowest_time = duration
+
+    def record_cached(self):
+        self.cached += 1
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'cached': self.cached,
+            'db_time': round(self.db_time, 3),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'slowest_query': self.slowest_query,
+            'slowest_time': round(self.slowest_time, 3),
+        }
+
+    def server_timing(self):
+        """Value for a Server-Timing header."""
+        desc = f"{self.queries} queries, {self.rows_read} rows read, {self.rows_written} rows written"
+        if self.cached:
+            desc += f", {self.cached} cached"
+        return f'db;dur={self.db_time:.1f};desc="{desc}"'
+
+
+_current = QueryStats()
+_in_request = False
+
+
+def current():
+    """Statistics of the request being handled."""
+    return _current
+
+
+def reset():
+    """Start a new QueryStats."""
+    global _current
+    _current = QueryStats()
+    return _current
+
+
+def in_request():
+    """Whether Django is between request_started and request_finished."""
+    return _in_request
+
+
+def request_started(**kwargs):
+    global _in_request
+    _in_request = True
+    reset()
+
+
+def request_finished(**kwargs):
+    global _in_request
+    _in_request = False
+
+
+def log_request(method, path):
+    stats = _current
+    logger.debug(
+        f"{method} {path}: {stats.queries} queries in {stats.db_time:.1f}ms, "
+        f"{stats.rows_read} rows read, {stats.rows_written} rows written, {stats.cached} cached"
+    )
+
+
+signals.request_started.connect(request_started)
+signals.request_finished.connect(request_finished)
@@ -0,0 +1,78 @@
+"""
+In-memory SQLite stand-in for the Cloudflare backends.
+
+Runs every statement that would go to D1/DO through Python's sqlite3 module, so
+the CF engine (CFDatabase, schema editor, compiler) can be exercised without a
+worker runtime. ``statements`` records every statement that reached the
+"database", ``batches`` every run_queries() call and ``sequences`` every
+run_batch() call, which lets tests count round trips.
+"""
+import sqlite3
+
+from django_cf.db.base_engine import CFDatabaseWrapper, CFResult, is_read_only_query
+
+
+class DatabaseWrapper(CFDatabaseWrapper):
+    vendor = "cloudflare_test"
+    display_name = "Test"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reset()
+
+    def reset(self):
+        self.sqlite = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        self.statements = []
+        self.batches = []
+        self.sequences = []
+        self.connection = None
+        # A new database under the same alias
+        self.introspection.clear_cache()
+
+    def get_connection_params(self):
+        return {}
+
+    def process_query(self, query, params=None):
+        if params is None:
+            query = query.replace('%s', '?')
+        else:
+            new_params = []
+            for param in params:
+                if param is None:
+                    query = query.replace('%s', 'null', 1)
+                else:
+                    new_params.append(param)
+                    query = query.replace('%s', '?', 1)
+
+            params = new_params
+
+        return query, params
+
+    def run_query(self, query, params=None) -> CFResult:
+        proc_query, params = self.process_query(query, params)
+        self.statements.append((proc_query, params))
+
+        cursor = self.sqlite.execute(proc_query, params or ())
+        rows = [list(row) for row in cursor.fetchall()]
+        if is_read_only_query(proc_query):
+            return CFResult.from_object(query, params, rows, len(rows), 0)
+        return CFResult.from_object(query, params, rows, 0, cursor.rowcount, cursor.lastrowid)
+
+    def run_queries(self, statements) -> list:
+        self.batches.append(list(statements))
+        return super().run_queries(statements)
+
+    def run_batch(self, statements) -> list:
+        self.sequences.append(list(statements))
+        if self.sqlite.in_transaction:
+            return super().run_batch(statements)
+        # D1 and Durable Objects run a batch as one transaction, so deferred
+        # foreign keys are only checked at its end
+        self.sqlite.execute('BEGIN')
+        try:
+            results = super().run_batch(statements)
+        except BaseException:
+            self.sqlite.execute('ROLLBACK')
+            raise
+        self.sqlite.execute('COMMIT')
+        return results
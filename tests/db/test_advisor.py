@@ -0,0 +1,131 @@
+"""Tests for django_cf/db/advisor.py - Index suggestions."""
+from io import StringIO
+
+from .utils import cf_db, create_users  # NOQA
+
+
+def statement(qs, rows_read=5000, calls=1):
+    from django_cf.db.slowlog import params_shape
+
+    query, params = qs.query.sql_with_params()
+    return {'fingerprint': query, 'query': query, 'params': params_shape(params), 'calls': calls, 'rows_read': rows_read}
+
+
+class TestPlanParsing:
+    """Tests for reading plans and statements."""
+
+    def test_scans(self):
+        """Test full scans and temporary sorts are found, searches are not."""
+        from django_cf.db.advisor import scans
+
+        plan = ['SCAN U0', '  SEARCH auth_group USING INDEX x (id=?)', 'USE TEMP B-TREE FOR ORDER BY']
+        assert scans(plan) == (['U0'], True)
+        assert scans(['SEARCH t USING INTEGER PRIMARY KEY (rowid=?)']) == ([], False)
+
+    def test_table_aliases(self):
+        """Test aliases map back to their tables."""
+        from django_cf.db.advisor import table_aliases
+
+        query = 'SELECT * FROM "blog_post" INNER JOIN "auth_user" T3 ON (1) WHERE "blog_post"."id" IN (SELECT U0."id" FROM "blog_post" U0)'
+        assert table_aliases(query) == {'blog_post': 'blog_post', 'auth_user': 'auth_user', 'T3': 'auth_user', 'U0': 'blog_post'}
+
+    def test_index_columns(self):
+        """Test equality columns come before the range column."""
+        from django_cf.db.advisor import index_columns
+
+        query = 'SELECT * FROM "t" WHERE ("t"."created" > %s AND "t"."author_id" = %s AND "t"."draft")'
+        assert index_columns(query, 't', False) == ['author_id', 'draft', 'created']
+
+    def test_index_columns_sort(self):
+        """Test the sort order is used when SQLite sorts in a temporary b-tree."""
+        from django_cf.db.advisor import index_columns
+
+        query = 'SELECT * FROM "t" WHERE "t"."author_id" = %s ORDER BY "t"."created" DESC, "t"."id" ASC'
+        assert index_columns(query, 't', True) == ['author_id', '-created', 'id']
+        assert index_columns(query, 't', False) == ['author_id']
+
+    def test_placeholder_params(self):
+        """Test stand-in params follow the recorded types."""
+        from django_cf.db.advisor import placeholder_params
+
+        assert placeholder_params('int, str, NoneType') == (0, '', None)
+        assert placeholder_params('') is None
+
+
+class TestAdvise:
+    """Tests for index proposals."""
+
+    def test_proposes_index_for_scan(self, cf_db):
+        """Test a scanning filter and sort becomes an index on model fields."""
+        from django.contrib.auth.models import User
+        from django_cf.db.advisor import advise
+
+        proposals = advise(cf_db, [statement(User.objects.filter(is_staff=True).order_by('-date_joined'))], min_rows=0)
+
+        assert len(proposals) == 1
+        assert proposals[0].model is User
+        assert proposals[0].fields == ['is_staff', '-date_joined']
+        assert proposals[0].index.name.startswith('auth_user_')
+
+    def test_indexed_lookup_not_proposed(self, cf_db):
+        """Test statements already using an index get no proposal."""
+        from django.contrib.auth.models import User
+        from django_cf.db.advisor import advise
+
+        assert advise(cf_db, [statement(User.objects.filter(username='a'))], min_rows=0) == []
+
+    def test_ranked_by_rows_read(self, cf_db):
+        """Test proposals are merged per index and ranked by rows read."""
+        from django.contrib.auth.models import User
+        from django_cf.db.advisor import advise
+
+        proposals = advise(cf_db, [
+            statement(User.objects.filter(email='a'), rows_read=2000),
+            statement(User.objects.filter(last_name='a'), rows_read=9000),
+            statement(User.objects.filter(email='b').only('id'), rows_read=3000),
+        ], min_rows=0)
+
+        assert [(p.fields, p.rows_read) for p in proposals] == [(['last_name'], 9000), (['email'], 5000)]
+
+    def test_small_tables_skipped(self, cf_db):
+        """Test scans of tables with fewer than min_rows rows are ignored."""
+        from django.contrib.auth.models import User
+        from django_cf.db.advisor import advise
+
+        create_users(20)
+
+        assert advise(cf_db, [statement(User.objects.filter(email='a'), rows_read=5000)], min_rows=21) == []
+
+    def test_selective_scan_proposed(self, cf_db):
+        """Test a scan returning few rows counts the rows of the table it scans."""
+        from django.contrib.auth.models import User
+        from django_cf.db.advisor import advise
+
+        create_users(20)
+
+        proposals = advise(cf_db, [statement(User.objects.filter(email='a'), rows_read=1, calls=3)], min_rows=20)
+
+        assert [(p.fields, p.rows_read) for p in proposals] == [(['email'], 60)]
+
+
+class TestIndexAdvisorCommand:
+    """Tests for the cf_index_advisor command."""
+
+    def test_migration_format(self, cf_db):
+        """Test proposals from this isolate's statements as AddIndex operations."""
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+
+        cf_db.settings_dict['STATEMENT_STATS'] = True
+        cf_db.reset()
+        call_command('migrate', verbosity=0)
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+        list(User.objects.filter(email='a@example.com'))
+        list(User.objects.filter(email='a@example.com'))
+
+        out = StringIO()
+        call_command('cf_index_advisor', memory=True, min_rows=0, format='migration', stdout=out)
+
+        assert "# auth.User: " in out.getvalue()
+        assert "migrations.AddIndex(model_name='user', index=models.Index(fields=['email'], name='auth_user_" \
+            in out.getvalue()
@@ -3,6 +3,8 @@ import pytest
 from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
+from .utils import cf_db, create_users  # NOQA
+
 
 class TestCFResult:
     """Tests for the CFResult class."""
@@ -28,6 +30,21 @@ class TestCFResult:
         items = list(result)
         assert items == [(1, 'a'), (2, 'b')]
 
+    def test_copy(self):
+        """Test copy returns an independent result with the same metadata."""
+        from django_cf.db.base_engine import CFResult
+
+        result = CFResult([(1, 'a'), (2, 'b')])
+        result.set_rowcount(2)
+        result.set_lastrowid(7)
+
+        copied = result.copy()
+        copied.fetchall()
+
+        assert len(result.data) == 2
+        assert copied.rowcount == 2
+        assert copied.lastrowid == 7
+
     def test_set_lastrowid(self):
         """Test setting lastrowid."""
         from django_cf.db.base_engine import CFResult
@@ -47,15 +64,15 @@ class TestCFResult:
         assert result.rowcount == 10
 
     def test_fetchone_with_data(self):
-        """Test fetchone returns and removes last item."""
+        """Test fetchone returns rows in order."""
         from django_cf.db.base_engine import CFResult
 
         data = [(1, 'a'), (2, 'b'), (3, 'c')]
         result = CFResult(data)
 
-        row = result.fetchone()
-        assert row == (3, 'c')
-        assert len(result.data) == 2
+        assert result.fetchone() == (1, 'a')
+        assert result.fetchone() == (2, 'b')
+        assert result.fetchall() == [(3, 'c')]
 
     def test_fetchone_empty(self):
         """Test fetchone returns None when empty."""
@@ -74,9 +91,8 @@ class TestCFResult:
         result = CFResult(data)
 
         rows = result.fetchall()
-        # Note: fetchall uses fetchone which pops from end, so order is reversed
-        assert rows == [(3, 'c'), (2, 'b'), (1, 'a')]
-        assert len(result.data) == 0
+        assert rows == [(1, 'a'), (2, 'b'), (3, 'c')]
+        assert result.fetchall() == []
 
     def test_fetchall_empty(self):
         """Test fetchall on empty result."""
@@ -95,8 +111,8 @@ class TestCFResult:
         result = CFResult(data)
 
         rows = result.fetchmany()
-        assert rows == [(3, 'c')]
-        assert len(result.data) == 2
+        assert rows == [(1, 'a')]
+        assert result.fetchmany() == [(2, 'b')]
 
     def test_fetchmany_specific_size(self):
         """Test fetchmany with specific size."""
@@ -106,8 +122,8 @@ class TestCFResult:
         result = CFResult(data)
 
         rows = result.fetchmany(2)
-        assert len(rows) == 2
-        assert len(result.data) == 1
+        assert rows == [(1, 'a'), (2, 'b')]
+        assert result.fetchmany(2) == [(3, 'c')]
 
     def test_fetchmany_more_than_available(self):
         """Test fetchmany when requesting more than available."""
@@ -118,7 +134,7 @@ class TestCFResult:
 
         rows = result.fetchmany(5)
         assert len(rows) == 2
-        assert len(result.data) == 0
+        assert result.fetchone() is None
 
     def test_from_object_with_list_rows(self):
         """Test from_object with list-style row data."""
@@ -212,6 +228,31 @@ class TestCFResult:
         assert result.lastrowid == 42
 
 
+class TestCFResultOrder:
+    """Regression tests for rows coming back in the order the database sent them."""
+
+    def test_fetches_in_order(self):
+        """Test fetchone, fetchmany and fetchall hand rows out front to back."""
+        from django_cf.db.base_engine import CFResult
+
+        result = CFResult([(i,) for i in range(7)])
+
+        assert result.fetchone() == (0,)
+        assert result.fetchmany(3) == [(1,), (2,), (3,)]
+        assert result.copy().fetchall() == [(4,), (5,), (6,)]
+        assert result.fetchall() == [(4,), (5,), (6,)]
+
+    def test_ordered_queryset(self, cf_db):
+        """Test an ordered queryset spanning several fetchmany() chunks keeps its order."""
+        from django.contrib.auth.models import User
+
+        create_users(250)
+
+        usernames = list(User.objects.order_by('-username').values_list('username', flat=True))
+
+        assert usernames == sorted((f'user{i:02}' for i in range(250)), reverse=True)
+
+
 class TestIsReadOnlyQuery:
     """Tests for the is_read_only_query function."""
 
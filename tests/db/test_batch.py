@@ -0,0 +1,149 @@
+"""Tests for django_cf/db/batch.py - Concurrent query gathering."""
+import pytest
+
+from .utils import cf_db, create_users  # NOQA
+
+
+class TestPlan:
+    """Tests for planning statements without running them."""
+
+    def test_plan_queryset_captures_sql(self, cf_db):
+        """Test planning a queryset returns its SQL without running it."""
+        from django.contrib.auth.models import User
+        from django_cf.db.batch import plan
+
+        cf_db.ensure_connection()
+        statement, value = plan(cf_db.connection, User.objects.filter(username='a'))
+
+        query, params = statement
+        assert 'FROM "auth_user"' in query
+        assert params == ('a',)
+        assert value is None
+        assert cf_db.statements == []
+
+    def test_plan_callable_captures_sql(self, cf_db):
+        """Test planning a callable returns the first statement it sends."""
+        from django.contrib.auth.models import User
+        from django_cf.db.batch import plan
+
+        cf_db.ensure_connection()
+        statement, value = plan(cf_db.connection, User.objects.all().count)
+
+        assert 'COUNT(*)' in statement[0]
+        assert cf_db.statements == []
+
+    def test_plan_evaluated_queryset_returns_value(self, cf_db):
+        """Test planning an evaluated queryset needs no statement."""
+        from django.contrib.auth.models import User
+        from django_cf.db.batch import plan
+
+        create_users(1)
+        qs = User.objects.all()
+        list(qs)
+
+        statement, value = plan(cf_db.connection, qs)
+
+        assert statement is None
+        assert value is qs
+
+
+class TestGather:
+    """Tests for gather()."""
+
+    def test_results_match_sequential_evaluation(self, cf_db):
+        """Test gathered results are the same as evaluating each item."""
+        from django.contrib.auth.models import User
+        from django.db.models import Count
+        from django_cf.db import gather
+
+        create_users(4)
+        cf_db.statements.clear()
+
+        users, staff_count, totals = gather(
+            User.objects.order_by('username'),
+            User.objects.filter(is_staff=True).count,
+            lambda: User.objects.aggregate(total=Count('id')),
+        )
+
+        assert sorted(u.username for u in users) == ['user00', 'user01', 'user02', 'user03']
+        assert staff_count == 2
+        assert totals == {'total': 4}
+
+    def test_queries_are_sent_together(self, cf_db):
+        """Test every gathered query is sent in a single run_queries call."""
+        from django.contrib.auth.models import User, Group
+        from django_cf.db import gather
+
+        create_users(2)
+        cf_db.statements.clear()
+
+        gather(User.objects.all(), Group.objects.all(), User.objects.all().count)
+
+        assert len(cf_db.batches) == 1
+        assert len(cf_db.batches[0]) == 3
+        assert len(cf_db.statements) == 3
+
+    def test_queryset_is_returned_evaluated(self, cf_db):
+        """Test querysets come back with their result cache filled."""
+        from django.contrib.auth.models import User
+        from django_cf.db import gather
+
+        create_users(2)
+        qs = User.objects.all()
+
+        result, = gather(qs)
+
+        assert result is qs
+        assert qs._result_cache is not None
+        cf_db.statements.clear()
+        assert len(qs) == 2
+        assert cf_db.statements == []
+
+    def test_identical_queries_each_get_a_result(self, cf_db):
+        """Test two identical querysets are both hydrated."""
+        from django.contrib.auth.models import User
+        from django_cf.db import gather
+
+        create_users(3)
+
+        first, second = gather(User.objects.all(), User.objects.all())
+
+        assert len(first) == 3
+        assert len(second) == 3
+
+    def test_writes_are_not_sent_ahead(self, cf_db):
+        """Test a write planned by a callable runs in program order."""
+        from django.contrib.auth.models import User
+        from django_cf.db import gather
+
+        create_users(2)
+        cf_db.statements.clear()
+
+        updated, users = gather(
+            lambda: User.objects.update(is_active=False),
+            User.objects.all(),
+        )
+
+        assert updated == 2
+        assert len(users) == 2
+        assert len(cf_db.batches[0]) == 1
+        assert cf_db.batches[0][0][0].startswith('SELECT')
+
+    def test_unconsumed_results_are_discarded(self, cf_db):
+        """Test primed results do not leak past the gather call."""
+        from django.contrib.auth.models import User
+        from django_cf.db import gather
+
+        gather(User.objects.all())
+
+        assert cf_db.connection._primed == {}
+
+    def test_errors_propagate(self, cf_db):
+        """Test an error raised by an item surfaces from gather."""
+        from django_cf.db import gather
+
+        def broken():
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            gather(broken)
@@ -0,0 +1,152 @@
+"""Tests for django_cf/budget.py - Per-request query budgets."""
+import logging
+
+import pytest
+from django.test import override_settings
+
+from .utils import cf_db, create_users, setup_django  # NOQA
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    """Run the test inside a request, keeping its budgets out of the next one."""
+    setup_django()
+    from django.core import signals
+
+    signals.request_started.send(sender=None)
+    yield
+    signals.request_finished.send(sender=None)
+
+
+class TestLimits:
+    """Tests for reading the configured limits."""
+
+    def test_number_and_dict_forms(self, cf_db):
+        """Test a bare number logs and a dict sets the action."""
+        from django_cf import budget, stats
+
+        stats.reset()
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': 5, 'ROWS_READ': {'LIMIT': 10, 'ACTION': 'raise'}}):
+            assert budget.limits() == {'queries': (5, 'log'), 'rows_read': (10, 'raise')}
+
+    def test_invalid_action(self, cf_db):
+        """Test an unknown action is rejected."""
+        from django.core.exceptions import ImproperlyConfigured
+        from django_cf import budget
+
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': {'LIMIT': 1, 'ACTION': 'email'}}):
+            with pytest.raises(ImproperlyConfigured):
+                budget.limits()
+
+
+class TestEnforcement:
+    """Tests for budgets enforced as statements run."""
+
+    def test_raise(self, cf_db):
+        """Test the statement crossing the limit raises."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+        from django_cf.budget import QueryBudgetExceeded
+
+        create_users(3)
+        stats.reset()
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': {'LIMIT': 2, 'ACTION': 'raise'}}):
+            list(User.objects.all())
+            list(User.objects.all())
+            with pytest.raises(QueryBudgetExceeded) as excinfo:
+                list(User.objects.all())
+
+        assert excinfo.value.name == 'queries'
+        assert excinfo.value.value == 3
+        assert excinfo.value.limit == 2
+
+    def test_log_once(self, cf_db, caplog):
+        """Test a logged limit is reported once per request."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+
+        create_users(3)
+        stats.reset()
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'ROWS_READ': 4}):
+            with caplog.at_level(logging.WARNING, logger='django_cf.budget'):
+                for _ in range(4):
+                    list(User.objects.all())
+
+        assert len(caplog.records) == 1
+        assert 'rows_read is 6, the limit is 4' in caplog.text
+
+    def test_header(self, cf_db):
+        """Test header limits are collected for the response."""
+        from django.contrib.auth.models import User
+        from django_cf import budget, stats
+
+        stats.reset()
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': {'LIMIT': 1, 'ACTION': 'header'}}):
+            assert budget.header_value() is None
+            list(User.objects.all())
+            list(User.objects.all())
+            list(User.objects.all())
+
+        assert budget.header_value() == 'queries=3/1'
+
+
+    def test_outside_request(self, cf_db):
+        """Test statements outside a request, as run by migrate or the shell, aren't limited."""
+        from django.contrib.auth.models import User
+        from django.core import signals
+        from django_cf import stats
+
+        signals.request_finished.send(sender=None)
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': {'LIMIT': 1, 'ACTION': 'raise'}}):
+            for _ in range(3):
+                User.objects.count()
+
+        assert stats.current().queries > 1
+        assert stats.current().exceeded == {}
+
+
+class TestQueryBudgetDecorator:
+    """Tests for the query_budget decorator."""
+
+    def test_raises_limit_for_view(self, cf_db):
+        """Test a view can allow more than the configured budget, keeping its action."""
+        from django.contrib.auth.models import User
+        from django_cf import budget, stats
+        from django_cf.budget import query_budget
+
+        @query_budget(queries=3)
+        def view():
+            for _ in range(3):
+                list(User.objects.all())
+            return budget.limits()
+
+        stats.reset()
+        with override_settings(CLOUDFLARE_QUERY_BUDGET={'QUERIES': {'LIMIT': 1, 'ACTION': 'raise'}}):
+            assert view() == {'queries': (3, 'raise')}
+
+    def test_action(self, cf_db):
+        """Test a view can set its own action."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+        from django_cf.budget import QueryBudgetExceeded, query_budget
+
+        @query_budget(queries=1, action='raise')
+        def view():
+            list(User.objects.all())
+            list(User.objects.all())
+
+        stats.reset()
+        with pytest.raises(QueryBudgetExceeded):
+            view()
+
+    def test_reset_with_request(self, cf_db):
+        """Test overrides end with the request."""
+        from django_cf import budget, stats
+        from django_cf.budget import query_budget
+
+        stats.reset()
+        query_budget(queries=3)(lambda: None)()
+        assert budget.limits() == {'queries': (3, 'log')}
+
+        stats.reset()
+        assert budget.limits() == {}
@@ -0,0 +1,417 @@
+"""Tests for django_cf/db/cache.py - Isolate-level query result cache."""
+from unittest.mock import patch
+
+from .utils import cf_db  # NOQA
+
+
+CATEGORIES = ('SELECT * FROM "blog_category"', None)
+SITES = ('SELECT * FROM "django_site"', None)
+
+
+def make_cache(**kwargs):
+    from django_cf.db.cache import QueryCache
+
+    cache = QueryCache({}, **kwargs)
+    cache._timeouts = {'blog_category': 60, 'django_site': 300}
+    return cache
+
+
+def make_result(rows):
+    from django_cf.db.base_engine import CFResult
+
+    return CFResult(list(rows))
+
+
+class TestQueryCacheSettings:
+    """Tests for QueryCache.from_settings."""
+
+    def test_disabled_without_setting(self):
+        """Test no cache is built when QUERY_CACHE is missing."""
+        from django_cf.db.cache import QueryCache
+
+        assert QueryCache.from_settings({'ENGINE': 'x'}) is None
+
+    def test_disabled_without_models(self):
+        """Test no cache is built when no models are listed."""
+        from django_cf.db.cache import QueryCache
+
+        assert QueryCache.from_settings({'QUERY_CACHE': {}}) is None
+
+    def test_ignores_non_dict_settings(self):
+        """Test non-dict settings (e.g. mocks) disable the cache."""
+        from unittest.mock import MagicMock
+        from django_cf.db.cache import QueryCache
+
+        assert QueryCache.from_settings(MagicMock()) is None
+
+    def test_options(self):
+        """Test options are read from settings."""
+        from django_cf.db.cache import QueryCache
+
+        cache = QueryCache.from_settings({'QUERY_CACHE': {
+            'MODELS': {'sites.Site': 300}, 'MAX_ENTRIES': 5, 'MAX_ROWS': 10,
+        }})
+
+        assert cache.models == {'sites.Site': 300}
+        assert cache.max_entries == 5
+        assert cache.max_rows == 10
+
+
+class TestQueryCache:
+    """Tests for QueryCache storage, expiry and invalidation."""
+
+    def test_set_and_get(self):
+        """Test a cached result is returned as an independent copy."""
+        cache = make_cache()
+        cache.set(CATEGORIES, make_result([(1,)]))
+
+        first = cache.get(CATEGORIES)
+        first.fetchall()
+
+        assert cache.get(CATEGORIES).data == [(1,)]
+
+    def test_uncached_tables_are_skipped(self):
+        """Test statements touching unlisted tables are not cached."""
+        cache = make_cache()
+        key = ('SELECT * FROM "blog_category" JOIN "blog_post" ON 1', None)
+        cache.set(key, make_result([]))
+
+        assert cache.get(key) is None
+
+    def test_shortest_ttl_wins(self):
+        """Test the TTL is the smallest among the statement's tables."""
+        cache = make_cache()
+
+        assert cache.timeout_for({'blog_category', 'django_site'}) == 60
+
+    def test_expiry(self):
+        """Test entries expire after their TTL."""
+        cache = make_cache()
+        with patch('django_cf.db.cache.time.monotonic', return_value=0):
+            cache.set(CATEGORIES, make_result([]))
+        with patch('django_cf.db.cache.time.monotonic', return_value=61):
+            assert cache.get(CATEGORIES) is None
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = make_cache(max_entries=2)
+        a, b, c = [('SELECT * FROM "blog_category" WHERE id = %s', (i,)) for i in range(3)]
+        cache.set(a, make_result([]))
+        cache.set(b, make_result([]))
+        cache.get(a)
+        cache.set(c, make_result([]))
+
+        assert cache.get(a) is not None
+        assert cache.get(b) is None
+        assert cache.get(c) is not None
+
+    def test_large_results_are_skipped(self):
+        """Test results above MAX_ROWS are not cached."""
+        cache = make_cache(max_rows=1)
+        cache.set(CATEGORIES, make_result([(1,), (2,)]))
+
+        assert cache.get(CATEGORIES) is None
+
+    def test_invalidate_by_table(self):
+        """Test a write drops only the entries of the tables it touches."""
+        cache = make_cache()
+        cache.set(CATEGORIES, make_result([]))
+        cache.set(SITES, make_result([]))
+
+        cache.invalidate('UPDATE "blog_category" SET "name" = %s')
+
+        assert cache.get(CATEGORIES) is None
+        assert cache.get(SITES) is not None
+
+    def test_invalidate_unknown_tables_clears_all(self):
+        """Test a write without recognisable tables clears everything."""
+        cache = make_cache()
+        cache.set(CATEGORIES, make_result([]))
+
+        cache.invalidate('VACUUM')
+
+        assert cache.get(CATEGORIES) is None
+
+
+class TestQueryCacheBackend:
+    """Tests for the cache wired into CFDatabase.execute."""
+
+    def enable(self, cf_db, models):
+        cf_db.settings_dict['QUERY_CACHE'] = {'MODELS': models}
+        cf_db.connection = None
+
+    def test_repeated_reads_hit_the_cache(self, cf_db):
+        """Test a repeated SELECT on a cached model runs once."""
+        from django.contrib.auth.models import Group
+
+        self.enable(cf_db, {'auth.Group': 60})
+        Group.objects.create(name='a')
+        cf_db.statements.clear()
+
+        assert list(Group.objects.values_list('name', flat=True)) == ['a']
+        assert list(Group.objects.values_list('name', flat=True)) == ['a']
+        assert len(cf_db.statements) == 1
+
+    def test_writes_invalidate(self, cf_db):
+        """Test a write to the table refreshes the cached read."""
+        from django.contrib.auth.models import Group
+
+        self.enable(cf_db, {'auth.Group': 60})
+        Group.objects.create(name='a')
+        assert Group.objects.count() == 1
+
+        Group.objects.create(name='b')
+
+        assert Group.objects.count() == 2
+
+    def test_other_models_are_not_cached(self, cf_db):
+        """Test reads of models not listed always reach the database."""
+        from django.contrib.auth.models import User
+
+        self.enable(cf_db, {'auth.Group': 60})
+        cf_db.statements.clear()
+
+        User.objects.count()
+        User.objects.count()
+
+        assert len(cf_db.statements) == 2
+
+
+class FakeKV:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def put(self, key, value):
+        self.values[key] = value
+
+
+class FakeResponse:
+    def __init__(self, body, headers=None):
+        self.body = body
+        self.headers = headers
+
+    @classmethod
+    def new(cls, body, headers=None):
+        return cls(body, headers)
+
+    def text(self):
+        return self.body
+
+
+class FakeCache:
+    def __init__(self):
+        self.responses = {}
+
+    def match(self, url):
+        return self.responses.get(url)
+
+    def put(self, url, response):
+        self.responses[url] = response
+
+
+def worker_modules(kv, cache):
+    """sys.modules entries standing in for the worker runtime."""
+    from unittest.mock import MagicMock
+
+    js = MagicMock()
+    js.Promise.all = lambda values: list(values)
+    js.Response = FakeResponse
+    js.caches.default = cache
+    ffi = MagicMock()
+    ffi.run_sync = lambda value: value
+    ffi.to_js = lambda value, **kwargs: value
+    workers = MagicMock()
+    workers.env.QUERY_VERSIONS = kv
+
+    return {'js': js, 'pyodide': MagicMock(ffi=ffi), 'pyodide.ffi': ffi, 'workers': workers}
+
+
+def make_colo_cache():
+    from django_cf.db.cache import ColoQueryCache
+
+    cache = ColoQueryCache({}, 'QUERY_VERSIONS')
+    cache._timeouts = {'blog_category': 60}
+    return cache
+
+
+class TestColoQueryCache:
+    """Tests for the Cache API backed ColoQueryCache."""
+
+    def test_requires_versions_binding(self):
+        """Test a missing VERSIONS_BINDING is reported."""
+        import pytest
+        from django.core.exceptions import ImproperlyConfigured
+        from django_cf.db.cache import ColoQueryCache
+
+        with pytest.raises(ImproperlyConfigured):
+            ColoQueryCache.from_settings({'COLO_CACHE': {'MODELS': {'blog.Category': 60}}})
+
+    def test_disabled_without_setting(self):
+        """Test no cache is built when COLO_CACHE is missing."""
+        from django_cf.db.cache import ColoQueryCache
+
+        assert ColoQueryCache.from_settings({}) is None
+
+    def test_miss_then_hit(self):
+        """Test a stored result is found by the next lookup."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            assert cache.get(CATEGORIES) is None
+            cache.set(CATEGORIES, make_result([(1, 'a')]))
+            result = cache.get(CATEGORIES)
+
+        assert result.data == [(1, 'a')]
+        assert 'max-age=60' in list(cache_api.responses.values())[0].headers['Cache-Control']
+
+    def test_uncached_tables_skip_the_cache(self):
+        """Test statements touching unlisted tables never reach the Cache API."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+        key = ('SELECT * FROM "blog_post"', None)
+
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            cache.set(key, make_result([(1,)]))
+            assert cache.get(key) is None
+
+        assert cache_api.responses == {}
+
+    def test_write_bumps_table_version(self):
+        """Test a write stores a new version so old entries are no longer found."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            cache.set(CATEGORIES, make_result([(1,)]))
+            cache.invalidate('UPDATE "blog_category" SET "name" = %s')
+            result = cache.get(CATEGORIES)
+
+        assert result is None
+        assert 'django_cf:table_version:blog_category' in kv.values
+
+    def test_other_isolates_see_new_versions(self):
+        """Test a version written elsewhere is picked up once the memo expires."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            with patch('django_cf.db.cache.time.monotonic', return_value=0):
+                cache.set(CATEGORIES, make_result([(1,)]))
+            kv.put('django_cf:table_version:blog_category', '42')
+            with patch('django_cf.db.cache.time.monotonic', return_value=1):
+                assert cache.get(CATEGORIES) is not None
+            with patch('django_cf.db.cache.time.monotonic', return_value=10):
+                assert cache.get(CATEGORIES) is None
+
+    def test_binary_rows_are_not_cached(self):
+        """Test results that can't be serialized are skipped."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            cache.set(CATEGORIES, make_result([(b'\x00',)]))
+
+        assert cache_api.responses == {}
+
+    def test_cache_failures_are_misses(self):
+        """Test a failing Cache API is treated as a miss."""
+        kv, cache_api = FakeKV(), FakeCache()
+        cache = make_colo_cache()
+
+        def broken(url):
+            raise RuntimeError('cache down')
+
+        cache_api.match = broken
+        with patch.dict('sys.modules', worker_modules(kv, cache_api)):
+            assert cache.get(CATEGORIES) is None
+
+
+class TestResultCacheLayers:
+    """Tests for CFDatabase consulting several caches in order."""
+
+    def test_slower_hit_fills_faster_cache(self):
+        """Test a hit in a later cache is copied into the earlier ones."""
+        from unittest.mock import MagicMock
+        from django_cf.db.base_engine import CFDatabase
+
+        wrapper = MagicMock()
+        db = CFDatabase(wrapper)
+        fast, slow = make_cache(), MagicMock()
+        slow.get.return_value = make_result([(1,)])
+        db.result_caches = [fast, slow]
+
+        db.execute('SELECT * FROM "blog_category"')
+
+        assert db.fetchall() == [(1,)]
+        wrapper.run_query.assert_not_called()
+        assert fast.get(CATEGORIES).data == [(1,)]
+
+
+class TestRequestCache:
+    """Tests for the per-request statement memo."""
+
+    def enable(self, cf_db):
+        cf_db.settings_dict['REQUEST_CACHE'] = True
+        cf_db.connection = None
+
+    def test_settings(self):
+        """Test REQUEST_CACHE accepts True or an options dict."""
+        from django_cf.db.cache import RequestCache
+
+        assert RequestCache.from_settings({}) is None
+        assert RequestCache.from_settings({'REQUEST_CACHE': True}).max_rows == 1000
+        assert RequestCache.from_settings({'REQUEST_CACHE': {'MAX_ROWS': 5}}).max_rows == 5
+
+    def test_identical_reads_run_once(self, cf_db):
+        """Test repeated identical SELECTs within a request hit the database once."""
+        from django.contrib.auth.models import User
+
+        self.enable(cf_db)
+        User.objects.create(username='a')
+        cf_db.statements.clear()
+
+        for _ in range(3):
+            assert User.objects.get(username='a').username == 'a'
+
+        assert len(cf_db.statements) == 1
+
+    def test_any_write_clears_the_memo(self, cf_db):
+        """Test a write to any table forgets every memoized read."""
+        from django.contrib.auth.models import User, Group
+
+        self.enable(cf_db)
+        User.objects.create(username='a')
+        assert User.objects.count() == 1
+
+        Group.objects.create(name='g')
+        User.objects.create(username='b')
+
+        assert User.objects.count() == 2
+
+    def test_request_finished_clears_the_memo(self, cf_db):
+        """Test the memo does not outlive the request."""
+        from django.contrib.auth.models import User
+        from django.core.signals import request_finished
+
+        self.enable(cf_db)
+        User.objects.count()
+        cf_db.statements.clear()
+
+        request_finished.send(sender=None)
+        User.objects.count()
+
+        assert len(cf_db.statements) == 1
+
+    def test_random_ordering_is_not_memoized(self):
+        """Test statements using RANDOM() always run."""
+        from django_cf.db.cache import RequestCache
+
+        cache = RequestCache()
+        key = ('SELECT "id" FROM "t" ORDER BY RANDOM() ASC', None)
+        cache.set(key, make_result([(1,)]))
+
+        assert cache.get(key) is None
@@ -0,0 +1,77 @@
+"""Tests for django_cf/db/converters.py - Column-at-a-time result conversion."""
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.readings import make_readings, reading_model
+
+from .utils import cf_db  # NOQA
+
+
+@pytest.fixture
+def Reading(cf_db):
+    model = reading_model()
+    with cf_db.schema_editor() as editor:
+        editor.create_model(model)
+    model.objects.bulk_create(make_readings(model, 250))
+    return model
+
+
+def row_by_row(queryset):
+    """The rows of ``queryset`` converted by Django's own, row at a time, apply_converters()."""
+    from django.db.models.sql.compiler import SQLCompiler
+
+    compiler = queryset.query.get_compiler(queryset.db)
+    rows = [row for chunk in compiler.execute_sql() for row in chunk]
+    fields = [s[0] for s in compiler.select[0:compiler.col_count]]
+    converters = compiler.get_converters(fields)
+    return [tuple(row) for row in SQLCompiler.apply_converters(compiler, rows, converters)]
+
+
+class TestConversion:
+    """Tests for columns converted the same way Django converts rows."""
+
+    def test_matches_row_conversion(self, Reading):
+        """Test every converted type comes out as Django's converters produce it."""
+        queryset = Reading.objects.order_by('pk').values_list(
+            'pk', 'price', 'taken', 'day', 'at', 'valid', 'token', 'extra', 'note',
+        )
+
+        rows = list(queryset)
+
+        assert rows == row_by_row(queryset)
+        assert rows[1] == (
+            2, Decimal('0.25'), datetime.datetime(2024, 1, 1, 13, 30, 0, 1), datetime.date(2024, 1, 2),
+            datetime.time(1, 15), False, uuid.UUID(int=1), {'i': 1}, 'Reading 1',
+        )
+        assert rows[0][1:7] == (None, datetime.datetime(2024, 1, 1, 12, 30), None, None, True, None)
+
+    def test_models_and_expressions(self, Reading):
+        """Test model instances and annotations, which aren't plain columns, are converted."""
+        from django.db.models import BooleanField, ExpressionWrapper, Q, Sum
+
+        readings = list(Reading.objects.order_by('pk').annotate(
+            cheap=ExpressionWrapper(Q(price__lt=10), output_field=BooleanField()),
+        ))
+
+        assert [reading.price for reading in readings[:3]] == [None, Decimal('0.25'), Decimal('0.50')]
+        assert (readings[1].cheap, readings[41].cheap, readings[3].cheap) == (True, False, None)
+        assert Reading.objects.aggregate(total=Sum('price'))['total'] == sum(
+            reading.price for reading in readings if reading.price is not None
+        )
+
+    def test_chunks_converted_as_fetched(self, Reading):
+        """Test iterator() converts a chunk at a time rather than reading ahead."""
+        from django.db import connection
+
+        rows = Reading.objects.order_by('pk').iterator(chunk_size=10)
+        next(rows)
+        connection.statements.clear()
+
+        for _ in range(9):
+            next(rows)
+        assert connection.statements == []
+        next(rows)
+        assert len(connection.statements) == 1
@@ -0,0 +1,184 @@
+"""Tests for stored row counts - django_cf/db/counts.py and the InstallRowCounter operation."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from .utils import cf_db, create_users, d1_errors  # NOQA
+
+
+def run_operation(connection, backwards=False):
+    from django.apps import apps
+    from django.db.migrations.state import ProjectState
+    from django_cf.db.operations import InstallRowCounter
+
+    state = ProjectState.from_apps(apps)
+    operation = InstallRowCounter('user')
+    with connection.schema_editor() as editor:
+        if backwards:
+            operation.database_backwards('auth', editor, state, state)
+        else:
+            operation.database_forwards('auth', editor, state, state)
+
+
+class TestInstallRowCounter:
+    """Tests for the trigger-maintained counts."""
+
+    def test_counts_existing_rows_and_follows_writes(self, cf_db):
+        """Test the table is counted on install and kept up to date by the triggers."""
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import row_count
+
+        create_users(2)
+        assert row_count(User) is None
+
+        run_operation(cf_db)
+        assert row_count(User) == 2
+
+        create_users(3, start=2)
+        User.objects.filter(username='user00').delete()
+        assert row_count(User) == 4
+
+    def test_backwards(self, cf_db):
+        """Test reversing drops the triggers and the count."""
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import row_count
+
+        run_operation(cf_db)
+        run_operation(cf_db, backwards=True)
+        create_users(1)
+
+        assert row_count(User) is None
+        assert not cf_db.sqlite.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+
+    def test_remake_keeps_triggers(self, cf_db):
+        """Test remaking the table creates the triggers SQLite drops with it again."""
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import row_count
+
+        create_users(2)
+        run_operation(cf_db)
+        with cf_db.schema_editor() as editor:
+            editor._remake_table(User)
+        create_users(1, start=2)
+
+        assert row_count(User) == 3
+
+    def test_other_errors_raise(self, cf_db):
+        """Test only a missing counters table reads as no stored count."""
+        import sqlite3
+
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import row_count
+
+        cf_db.sqlite.execute('CREATE VIEW "django_cf_row_counts" AS SELECT * FROM "missing"')
+
+        with pytest.raises(sqlite3.OperationalError, match='no such table: main.missing'):
+            row_count(User)
+
+    def test_missing_table_on_d1(self, cf_db):
+        """Test a missing counters table is recognised from D1's errors, which lose SQLite's message."""
+        import sqlite3
+
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import row_count
+
+        with d1_errors(cf_db):
+            assert row_count(User) is None
+
+            cf_db.sqlite.execute('CREATE VIEW "django_cf_row_counts" AS SELECT * FROM "missing"')
+            with pytest.raises(sqlite3.OperationalError):
+                row_count(User)
+
+    def test_deconstruct(self):
+        """Test the operation serializes into migrations."""
+        from django_cf.db.operations import InstallRowCounter
+
+        assert InstallRowCounter('post').deconstruct() == ('InstallRowCounter', [], {'model_name': 'post'})
+        assert InstallRowCounter('post').migration_name_fragment == 'post_row_counter'
+
+
+class TestRefreshRowCounts:
+    """Tests for periodically refreshed counts."""
+
+    def test_refresh(self, cf_db):
+        """Test refreshing stores the current counts."""
+        from django.contrib.auth.models import Group, User
+        from django_cf.db.counts import refresh_row_counts, row_count
+
+        create_users(3)
+        refresh_row_counts(User, Group)
+        assert (row_count(User), row_count(Group)) == (3, 0)
+
+        create_users(1, start=3)
+        assert row_count(User) == 3
+        refresh_row_counts(User)
+        assert row_count(User) == 4
+
+
+class TestCountedPaginator:
+    """Tests for the CountedPaginator class."""
+
+    def test_uses_stored_count_above_threshold(self, cf_db):
+        """Test large unfiltered querysets aren't counted."""
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import refresh_row_counts
+        from django_cf.pagination import CountedPaginator
+
+        create_users(3)
+        refresh_row_counts(User)
+        cf_db.sqlite.execute("UPDATE django_cf_row_counts SET row_count = 5000")
+        cf_db.statements.clear()
+
+        paginator = CountedPaginator(User.objects.order_by('username'), 2)
+        assert paginator.count == 5000
+        assert not any('COUNT(' in query for query, _ in cf_db.statements)
+
+    def test_counts_below_threshold_or_filtered(self, cf_db):
+        """Test small tables and filtered querysets are counted."""
+        from django.contrib.auth.models import User
+        from django_cf.db.counts import refresh_row_counts
+        from django_cf.pagination import CountedPaginator
+
+        create_users(3)
+        refresh_row_counts(User)
+        cf_db.sqlite.execute("UPDATE django_cf_row_counts SET row_count = 5000")
+
+        assert CountedPaginator(User.objects.filter(username='user00').order_by('pk'), 2).count == 1
+        paginator = CountedPaginator(User.objects.order_by('pk'), 2)
+        paginator.count_threshold = 10000
+        assert paginator.count == 3
+
+    def test_no_stored_count(self, cf_db):
+        """Test tables without a stored count are counted."""
+        from django.contrib.auth.models import User
+        from django_cf.pagination import CountedPaginator
+
+        create_users(1)
+        assert CountedPaginator(User.objects.order_by('pk'), 2).count == 1
+
+
+class TestCountedChangeList:
+    """Tests for the admin integration."""
+
+    def test_full_result_count_from_stored_count(self, cf_db):
+        """Test the changelist shows the stored total without counting the table."""
+        from django.contrib import admin
+        from django.contrib.auth.models import User
+        from django.test import RequestFactory
+        from django_cf.admin import CountedPaginationAdminMixin
+
+        class UserAdmin(CountedPaginationAdminMixin, admin.ModelAdmin):
+            list_per_page = 2
+
+        create_users(3)
+        run_operation(cf_db)
+        cf_db.sqlite.execute("UPDATE django_cf_row_counts SET row_count = 5000")
+        cf_db.statements.clear()
+
+        request = RequestFactory().get('/')
+        request.user = MagicMock(is_superuser=True)
+        cl = UserAdmin(User, admin.AdminSite()).get_changelist_instance(request)
+
+        assert (cl.result_count, cl.full_result_count) == (5000, 5000)
+        assert cl.show_full_result_count
+        assert not any('COUNT(' in query for query, _ in cf_db.statements)
@@ -331,3 +331,54 @@ class TestD1ParameterHandling:
 
         assert result_query.count('?') == 50
         assert len(result_params) == 50
+
+
+class TestD1ReadResults:
+    """Tests for reads going through all(), which reports the rows D1 read."""
+
+    @pytest.mark.parametrize('query, expected', [
+        ('SELECT "auth_user"."id", "auth_user"."username" FROM "auth_user" WHERE "auth_user"."id" = ?', True),
+        ('SELECT COUNT(*) AS "__count" FROM "auth_user"', True),
+        ('SELECT DISTINCT (1) AS "a", "auth_user"."id" FROM "auth_user" LIMIT 1', True),
+        # Columns object rows would lose or reorder
+        ('SELECT "auth_user"."id", "auth_group"."id" FROM "auth_user" INNER JOIN "auth_group"', False),
+        ('SELECT "a"."x" AS "id", "a"."id" FROM "a"', False),
+        ('SELECT "a"."x" AS "1", "a"."y" FROM "a"', False),
+        ('SELECT * FROM "a"', False),
+        ('SELECT COUNT(*), MAX("a"."x") FROM "a"', False),
+        ('PRAGMA table_info("a")', False),
+    ])
+    def test_unique_result_columns(self, query, expected):
+        """Test which reads have distinct, object-safe column names."""
+        from django_cf.db.backends.d1.base import unique_result_columns
+
+        assert unique_result_columns(query) is expected
+
+    def test_rows_read_from_meta(self):
+        """Test an all() response takes rows read from its meta, not from the rows returned."""
+        from django_cf.db.backends.d1.base import DatabaseWrapper
+
+        response = MagicMock()
+        response.results.to_py.return_value = [{'id': 3, 'username': 'ada'}]
+        response.meta.rows_read = 500
+        response.meta.rows_written = 0
+        response.meta.last_row_id = None
+
+        result = DatabaseWrapper.to_result(None, 'SELECT "id", "username" FROM "auth_user"', [], False, response)
+
+        assert result.fetchall() == [(3, 'ada')]
+        assert result.rows_read == 500
+        assert result.rowcount == 1
+
+    def test_raw_rows(self):
+        """Test a raw() response, which has no meta, counts the rows returned for both rowcount and rows read."""
+        from django_cf.db.backends.d1.base import DatabaseWrapper
+
+        response = MagicMock()
+        response.to_py.return_value = [[3, 1], [4, 1]]
+
+        result = DatabaseWrapper.to_result(None, 'SELECT "a"."id", "b"."id" FROM "a" JOIN "b"', [], True, response)
+
+        assert result.fetchall() == [(3, 1), (4, 1)]
+        assert result.rows_read == 2
+        assert result.rowcount == 2
@@ -0,0 +1,181 @@
+"""Tests for django_cf/db/deletion.py - Database-level ON DELETE actions."""
+from unittest.mock import patch
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+_models = {}
+
+
+def models_():
+    """Author and Book models using the database-level handlers, defined once Django is set up."""
+    if 'Author' not in _models:
+        from django.db import models
+        from django_cf.db.deletion import DB_CASCADE, DB_SET_NULL
+
+        class Author(models.Model):
+            name = models.CharField(max_length=100)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        class Book(models.Model):
+            title = models.CharField(max_length=100)
+            author = models.ForeignKey(Author, on_delete=DB_CASCADE, related_name='books')
+            editor = models.ForeignKey(Author, null=True, on_delete=DB_SET_NULL, related_name='edited')
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models.update(Author=Author, Book=Book)
+    return _models['Author'], _models['Book']
+
+
+def node_model():
+    """A model referencing itself with DB_CASCADE, defined once Django is set up."""
+    if 'Node' not in _models:
+        from django.db import models
+        from django_cf.db.deletion import DB_CASCADE
+
+        class Node(models.Model):
+            parent = models.ForeignKey('self', null=True, on_delete=DB_CASCADE)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models['Node'] = Node
+    return _models['Node']
+
+
+@pytest.fixture
+def library(cf_db):
+    Author, Book = models_()
+    # D1 and Durable Objects enforce foreign keys; the sqlite3 stand-in has to be told to
+    cf_db.sqlite.execute('PRAGMA foreign_keys = ON')
+    with cf_db.schema_editor() as editor:
+        editor.create_model(Author)
+        editor.create_model(Book)
+    cf_db.statements.clear()
+    return Author, Book
+
+
+def table_sql(cf_db, table):
+    return cf_db.sqlite.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+
+
+class TestSchema:
+    """Tests for the foreign key DDL."""
+
+    def test_on_delete_actions(self, library, cf_db):
+        """Test the handlers become ON DELETE clauses."""
+        sql = table_sql(cf_db, 'django_cf_book')
+
+        assert 'REFERENCES "django_cf_author" ("id") ON DELETE CASCADE DEFERRABLE' in sql
+        assert 'REFERENCES "django_cf_author" ("id") ON DELETE SET NULL DEFERRABLE' in sql
+
+    def test_changing_handler_rebuilds_table(self, library, cf_db):
+        """Test switching between Django and database handlers alters the field."""
+        from django.db import models
+
+        Author, Book = library
+        old_field = Book._meta.get_field('author')
+        new_field = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
+        new_field.set_attributes_from_name('author')
+        new_field.model = Book
+
+        with cf_db.schema_editor() as editor:
+            assert editor._field_should_be_altered(old_field, new_field)
+            assert not editor._field_should_be_altered(old_field, old_field)
+            editor.alter_field(Book, old_field, new_field)
+
+        assert 'ON DELETE CASCADE' not in table_sql(cf_db, 'django_cf_book')
+
+    def test_parent_remake_keeps_children(self, library, cf_db):
+        """Test remaking the referenced table doesn't run the actions on the referencing rows."""
+        from django.db import models
+
+        Author, Book = library
+        author = Author.objects.create(name='Ada')
+        Book.objects.create(title='Book', author=author, editor=author)
+        old_field = Author._meta.get_field('name')
+        new_field = models.CharField(max_length=200)
+        new_field.set_attributes_from_name('name')
+        new_field.model = Author
+
+        with cf_db.schema_editor() as editor:
+            editor.alter_field(Author, old_field, new_field)
+
+        assert 'varchar(200)' in table_sql(cf_db, 'django_cf_author')
+        assert list(Book.objects.values_list('title', 'author', 'editor')) == [('Book', author.pk, author.pk)]
+        assert 'ON DELETE CASCADE' in table_sql(cf_db, 'django_cf_book')
+        assert 'ON DELETE SET NULL' in table_sql(cf_db, 'django_cf_book')
+
+    def test_hidden_relations(self, library):
+        """Test foreign keys without a reverse accessor are found."""
+        from django.db import models
+        from django_cf.db.deletion import DB_SET_NULL, referencing_fields
+
+        Author, Book = library
+        field = models.ForeignKey(Author, null=True, on_delete=DB_SET_NULL, related_name='+')
+        field.set_attributes_from_name('reviewer')
+        field.model = Book
+        with patch.object(Author._meta, 'get_fields', return_value=[field.remote_field]):
+            assert referencing_fields(Author) == {Book: [field]}
+
+    def test_self_reference_remake_refused(self, cf_db):
+        """Test a table referencing itself with an action can't be remade."""
+        from django.db import NotSupportedError
+
+        Node = node_model()
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Node)
+            with pytest.raises(NotSupportedError, match='references itself'):
+                editor._remake_table(Node)
+
+    def test_handlers_serialize(self):
+        """Test migrations can reference the handlers."""
+        from django.db.migrations.serializer import serializer_factory
+        from django_cf.db.deletion import DB_CASCADE
+
+        assert serializer_factory(DB_CASCADE).serialize()[0] == 'django_cf.db.deletion.DB_CASCADE'
+
+
+class TestDelete:
+    """Tests for deletes left to the database."""
+
+    def test_single_statement(self, library, cf_db):
+        """Test deleting a parent is one DELETE that cascades and nulls in the database."""
+        Author, Book = library
+        author, other = Author.objects.create(name='Ada'), Author.objects.create(name='Grace')
+        Book.objects.bulk_create(
+            [Book(title=f'Book {i}', author=author) for i in range(5)]
+            + [Book(title='Edited', author=other, editor=author)]
+        )
+        cf_db.statements.clear()
+
+        author.delete()
+
+        assert len(cf_db.statements) == 1
+        assert cf_db.statements[0][0].startswith('DELETE FROM "django_cf_author"')
+        assert list(Book.objects.values_list('title', 'editor')) == [('Edited', None)]
+
+    def test_cached_children_invalidated(self, library, cf_db):
+        """Test deleting a parent drops cached reads of the rows the database cascaded to."""
+        Author, Book = library
+        cf_db.settings_dict['QUERY_CACHE'] = {'MODELS': {'django_cf.Book': 60}}
+        cf_db.connection = None
+        author = Author.objects.create(name='Ada')
+        Book.objects.create(title='Book', author=author)
+        assert Book.objects.count() == 1
+
+        author.delete()
+
+        assert Book.objects.count() == 0
+
+    def test_cascaded_tables(self, library):
+        """Test the tables the database may change follow the ON DELETE actions."""
+        from django_cf.db.deletion import cascaded_tables
+
+        assert cascaded_tables({'django_cf_author'}) == {'django_cf_author', 'django_cf_book'}
+        assert cascaded_tables({'django_cf_book'}) == {'django_cf_book'}
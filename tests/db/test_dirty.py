@@ -0,0 +1,129 @@
+"""Tests for django_cf/db/dirty.py - Partial saves of changed fields."""
+import pytest
+
+from .utils import cf_db  # NOQA
+
+_models = {}
+
+
+def note_model():
+    """A model using DirtyFieldsMixin, defined once Django is set up."""
+    if 'Note' not in _models:
+        from django.db import models
+        from django_cf.db import DirtyFieldsMixin
+
+        class Note(DirtyFieldsMixin, models.Model):
+            title = models.CharField(max_length=100)
+            body = models.TextField(default='')
+            data = models.JSONField(default=dict)
+            parent = models.ForeignKey('self', null=True, on_delete=models.SET_NULL)
+            updated = models.DateTimeField(auto_now=True)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models['Note'] = Note
+    return _models['Note']
+
+
+@pytest.fixture
+def Note(cf_db):
+    model = note_model()
+    with cf_db.schema_editor() as editor:
+        editor.create_model(model)
+    model.objects.create(title='First', body='Hello')
+    cf_db.statements.clear()
+    return model
+
+
+def updates(cf_db):
+    return [query for query, _ in cf_db.statements if query.startswith('UPDATE')]
+
+
+class TestDirtyFields:
+    """Tests for change tracking."""
+
+    def test_loaded_instance_is_clean(self, Note):
+        """Test instances start clean and report assigned fields."""
+        note = Note.objects.get()
+        assert not note.is_dirty()
+
+        note.title = 'Second'
+        note.data['key'] = 'value'
+        assert note.get_dirty_fields() == ['title', 'data']
+
+    def test_foreign_key(self, Note):
+        """Test assigning a relation marks the foreign key dirty."""
+        note = Note.objects.get()
+        note.parent = Note.objects.create(title='Parent')
+        assert note.get_dirty_fields() == ['parent']
+
+
+class TestSave:
+    """Tests for partial saves."""
+
+    def test_saves_changed_columns(self, Note, cf_db):
+        """Test only the changed and auto_now columns are written."""
+        note = Note.objects.get()
+        note.title = 'Second'
+        note.save()
+
+        [query] = updates(cf_db)
+        assert '"title"' in query and '"updated"' in query
+        assert '"body"' not in query and '"data"' not in query
+        assert Note.objects.get().title == 'Second'
+        assert not note.is_dirty()
+
+    def test_unchanged_save_skipped(self, Note, cf_db):
+        """Test saving without changes sends nothing."""
+        note = Note.objects.get()
+        note.title = note.title
+        note.save()
+
+        note.body = 'Changed'
+        note.save()
+        cf_db.statements.clear()
+        note.save()
+
+        assert cf_db.statements == []
+
+    def test_deleted_row_saved_in_full(self, Note, cf_db):
+        """Test a partial save of a row deleted meanwhile inserts it with every field."""
+        note = Note.objects.get()
+        Note.objects.all().delete()
+        note.title = 'Second'
+        note.save()
+
+        saved = Note.objects.get()
+        assert (saved.pk, saved.title, saved.body) == (note.pk, 'Second', 'Hello')
+        assert not note.is_dirty()
+
+    def test_created_instance_tracks_changes(self, Note, cf_db):
+        """Test instances are tracked after they are inserted."""
+        note = Note.objects.create(title='New')
+        cf_db.statements.clear()
+        note.save()
+        assert cf_db.statements == []
+
+        note.body = 'Text'
+        note.save()
+        assert '"title"' not in updates(cf_db)[0]
+
+    def test_update_fields_respected(self, Note, cf_db):
+        """Test explicit update_fields saves as requested."""
+        note = Note.objects.get()
+        note.title = 'Second'
+        note.body = 'Changed'
+        note.save(update_fields=['body'])
+
+        assert note.get_dirty_fields() == ['title']
+        assert Note.objects.get().body == 'Changed'
+
+    def test_refresh_from_db(self, Note):
+        """Test refreshed fields are clean."""
+        note = Note.objects.get()
+        Note.objects.update(title='Elsewhere')
+        note.refresh_from_db()
+
+        assert note.title == 'Elsewhere'
+        assert not note.is_dirty()
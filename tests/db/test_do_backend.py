@@ -3,6 +3,8 @@ import pytest
 from unittest.mock import MagicMock, patch
 import sys
 
+from .utils import cf_db, create_users  # NOQA
+
 
 class TestDODatabaseWrapperProcessQuery:
     """Tests for DO DatabaseWrapper.process_query method."""
@@ -371,3 +373,150 @@ class TestDOPragmaReturnTypeBug:
         assert isinstance(result, str)
         # The params ['test'] are completely lost!
         # This will cause issues when trying to unpack: proc_query, params = result
+
+
+class FakeArray(list):
+    """A JS array: converted with to_py()."""
+
+    def to_py(self):
+        return list(self)
+
+
+class FakeRaw:
+    """The iterator returned by a DO cursor's raw()."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.cursor.rows.fetchone()
+        if row is None:
+            raise StopIteration
+        self.cursor.rowsRead += 1
+        return FakeArray(row)
+
+    def toArray(self):
+        return FakeArray(FakeArray(row) for row in self)
+
+
+class FakeCursor:
+    """A DO SQL cursor over a sqlite3 cursor, counting the rows pulled from it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.rowsRead = 0
+        self.rowsWritten = max(rows.rowcount, 0)
+
+    def raw(self):
+        return FakeRaw(self)
+
+
+class FakeStorage:
+    """ctx.storage.sql backed by the stand-in's sqlite3 database."""
+
+    def __init__(self, sqlite):
+        self.sqlite = sqlite
+        self.cursors = []
+
+    def exec(self, query, *params):
+        self.cursors.append(FakeCursor(self.sqlite.execute(query, params)))
+        return self.cursors[-1]
+
+
+@pytest.fixture
+def do_db(cf_db):
+    """The migrated stand-in database, served through the DO backend."""
+    from django.db import connections
+    from django_cf import stats
+    from django_cf.db.backends.do import base
+
+    storage = FakeStorage(cf_db.sqlite)
+    stand_in = connections['default']
+    wrapper = base.DatabaseWrapper(dict(stand_in.settings_dict, ENGINE='django_cf.db.backends.do'), alias='default')
+    stats.reset()
+    with patch.object(base, 'get_storage', lambda: storage):
+        connections['default'] = wrapper
+        try:
+            yield storage
+        finally:
+            connections['default'] = stand_in
+
+
+class TestDOStreaming:
+    """Tests for iterator() streaming rows from the DO SQL cursor."""
+
+    def test_iterator_pulls_chunks(self, do_db):
+        """Test iterator() runs one query and pulls a chunk at a time from its cursor."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+
+        create_users(25)
+        do_db.cursors.clear()
+        stats.reset()
+
+        users = User.objects.order_by('pk').iterator(chunk_size=10)
+        assert next(users).username == 'user00'
+        assert len(do_db.cursors) == 1
+        assert do_db.cursors[0].rowsRead == 10
+        # Rows read are recorded once the cursor is read through
+        assert stats.current().queries == 0
+
+        assert [user.username for user in users] == [f'user{i:02}' for i in range(1, 25)]
+        assert len(do_db.cursors) == 1
+        assert (stats.current().queries, stats.current().rows_read) == (1, 25)
+
+    def test_queries_while_iterating(self, do_db):
+        """Test statements run between chunks don't replace the streamed rows."""
+        from django.contrib.auth.models import User
+
+        create_users(7)
+
+        usernames = []
+        for user in User.objects.order_by('pk').iterator(chunk_size=2):
+            usernames.append(user.username)
+            assert User.objects.filter(pk=user.pk).exists()
+
+        assert usernames == [f'user{i:02}' for i in range(7)]
+
+    def test_abandoned_iterator(self, do_db):
+        """Test an iterator that isn't read through still records its query."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+
+        create_users(5)
+        stats.reset()
+
+        users = User.objects.order_by('pk').iterator(chunk_size=2)
+        next(users)
+        users.close()
+
+        assert (stats.current().queries, stats.current().rows_read) == (1, 2)
+
+    def test_other_reads_stay_whole(self, do_db):
+        """Test reads outside iterator() are copied out of the cursor at once."""
+        from django.contrib.auth.models import User
+        from django.db import connection
+
+        create_users(5)
+        do_db.cursors.clear()
+
+        assert User.objects.count() == 5
+        assert len(list(User.objects.all())) == 5
+        assert [cursor.rowsRead for cursor in do_db.cursors] == [1, 5]
+        assert not connection.connection._streaming
+
+    def test_cursor_result_copy(self):
+        """Test copying a streamed result reads it through without losing rows."""
+        from django_cf.db.base_engine import CFCursorResult
+
+        closed = []
+        result = CFCursorResult(iter([(1,), (2,), (3,)]), on_close=lambda: closed.append(True))
+        assert result.fetchone() == (1,)
+
+        assert list(result.copy()) == [(2,), (3,)]
+        assert closed == [True]
+        assert result.fetchmany(5) == [(2,), (3,)]
+        assert result.fetchone() is None
@@ -0,0 +1,154 @@
+"""Tests for the cf_export_migrations management command."""
+import sqlite3
+from io import StringIO
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+
+def export(tmp_path):
+    from django.core.management import call_command
+
+    out = StringIO()
+    call_command('cf_export_migrations', output=str(tmp_path), stdout=out)
+    return out.getvalue()
+
+
+def sql_files(tmp_path):
+    return sorted(path for path in tmp_path.iterdir() if path.suffix == '.sql')
+
+
+class TestExportMigrations:
+    """Tests for exporting migrations as wrangler SQL files."""
+
+    def test_numbered_files(self, cf_db, tmp_path):
+        """Test each pending migration becomes a numbered file recording itself."""
+        export(tmp_path)
+
+        files = sql_files(tmp_path)
+        assert files[0].name == '0000_contenttypes_0001_initial.sql'
+        assert files[1].name == '0001_auth_0001_initial.sql'
+        for path in files:
+            sql = path.read_text()
+            assert 'INSERT INTO "django_migrations"' in sql
+            assert '%s' not in sql
+            assert sql.endswith('PRAGMA defer_foreign_keys = false;\n')
+        assert 'CREATE TABLE "django_migrations"' in files[0].read_text()
+
+    def test_files_rebuild_the_schema(self, cf_db, tmp_path):
+        """Test applying the files in order gives the migrated schema."""
+        export(tmp_path)
+
+        database = sqlite3.connect(':memory:')
+        for path in sql_files(tmp_path):
+            database.executescript(path.read_text())
+        tables = {row[0] for row in database.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        applied = database.execute('SELECT COUNT(*) FROM django_migrations').fetchone()[0]
+
+        assert {'auth_user', 'django_admin_log', 'django_content_type'} <= tables
+        assert applied == len(sql_files(tmp_path))
+
+    def test_only_pending_migrations(self, cf_db, tmp_path):
+        """Test a second export has nothing left to write."""
+        export(tmp_path)
+        count = len(sql_files(tmp_path))
+
+        assert export(tmp_path) == 'No migrations to export.\n'
+        assert len(sql_files(tmp_path)) == count
+        assert (tmp_path / 'django_cf_state.sqlite3').exists()
+
+    def test_warns_about_python_data(self, cf_db, tmp_path):
+        """Test skipped RunPython operations and post_migrate handlers are reported."""
+        from django.core.management import call_command
+
+        err = StringIO()
+        call_command('cf_export_migrations', output=str(tmp_path), stdout=StringIO(), stderr=err)
+
+        warnings = err.getvalue().splitlines()
+        assert warnings[0].startswith('auth.0011_update_proxy_permissions: skipped 1 RunPython operation(s)')
+        assert warnings[1].startswith("post_migrate handlers")
+        assert len(warnings) == 2
+
+    def test_connection_restored(self, cf_db, tmp_path):
+        """Test the configured database is used again after the export."""
+        from django.db import connections
+
+        configured = connections['default']
+        export(tmp_path)
+
+        assert connections['default'] is configured
+
+
+class TestExportable:
+    """Tests for operations that can't be written as SQL."""
+
+    def test_run_python_skipped(self, cf_db):
+        """Test RunPython operations are left out."""
+        from django.db import migrations
+        from django_cf.management.commands.cf_export_migrations import Command
+
+        run_python = migrations.RunPython(print)
+        migration = migrations.Migration('0002_data', 'blog')
+        migration.operations = [migrations.RunSQL('SELECT 1'), run_python]
+
+        exported, skipped = Command.exportable(migration)
+
+        assert len(exported.operations) == 1 and skipped == [run_python]
+        assert len(migration.operations) == 2
+
+    def test_render(self):
+        """Test params are inlined, and a query without params is left as it is."""
+        from django_cf.management.commands.cf_export_migrations import Command
+
+        def quote_value(value):
+            return f"'{value}'"
+
+        assert Command.render('SELECT %s', ['a'], quote_value) == "SELECT 'a'"
+        assert Command.render("SELECT '100%'", [], quote_value) == "SELECT '100%'"
+        assert Command.render("SELECT '100%'", None, quote_value) == "SELECT '100%'"
+
+    def test_unsafe_drops(self):
+        """Test dropping a table still referenced with ON DELETE actions is found, a remake of its children isn't."""
+        from django_cf.management.commands.cf_export_migrations import Command
+
+        def remake(table, references=''):
+            return [
+                (f'CREATE TABLE "new__{table}" ("id" integer NOT NULL PRIMARY KEY{references})', None),
+                (f'INSERT INTO "new__{table}" ("id") SELECT "id" FROM "{table}"', None),
+                (f'DROP TABLE "{table}"', None),
+                (f'ALTER TABLE "new__{table}" RENAME TO "{table}"', None),
+            ]
+
+        cascade = ', "author_id" integer NOT NULL REFERENCES "author" ("id") ON DELETE CASCADE DEFERRABLE'
+        plain = ', "author_id" integer NOT NULL REFERENCES "author" ("id") DEFERRABLE'
+        references = {'book': {'author'}}
+
+        assert Command.unsafe_drops(references, remake('author')) == [('author', ['book'])]
+        assert Command.unsafe_drops(references, remake('book', plain) + remake('author') + remake('book', cascade)) == []
+        assert Command.unsafe_drops({}, remake('book', cascade) + remake('author')) == [('author', ['book'])]
+
+    def test_action_references(self, cf_db):
+        """Test the foreign keys with ON DELETE actions are read from the schema."""
+        from django_cf.management.commands.cf_export_migrations import Command
+
+        cf_db.sqlite.execute('CREATE TABLE "author" ("id" integer PRIMARY KEY)')
+        cf_db.sqlite.execute(
+            'CREATE TABLE "book" ("id" integer PRIMARY KEY, "author_id" integer REFERENCES "author" ("id") '
+            'ON DELETE SET NULL, "editor_id" integer REFERENCES "author" ("id"))'
+        )
+
+        assert Command.action_references(cf_db) == {'book': {'author'}}
+
+    def test_rebuild_refused(self, cf_db):
+        """Test operations that must run against the live database stop the export."""
+        from django.core.management.base import CommandError
+        from django.db import migrations
+        from django_cf.db.operations import RebuildTable
+        from django_cf.management.commands.cf_export_migrations import Command
+
+        migration = migrations.Migration('0003_rebuild', 'blog')
+        migration.operations = [RebuildTable('post', [])]
+
+        with pytest.raises(CommandError, match="Apply it with migrate"):
+            Command.exportable(migration)
@@ -0,0 +1,78 @@
+"""Tests for CFDatabaseIntrospection - Cached introspection results."""
+from .utils import cf_db  # NOQA
+
+
+def introspect(cf_db, method, *args):
+    with cf_db.cursor() as cursor:
+        return getattr(cf_db.introspection, method)(cursor, *args)
+
+
+class TestCache:
+    """Tests for caching introspection queries."""
+
+    def test_table_names_cached(self, cf_db):
+        """Test repeated table lists cost one query."""
+        assert 'auth_user' in cf_db.introspection.table_names()
+        assert 'auth_user' in cf_db.introspection.table_names()
+
+        assert len(cf_db.statements) == 1
+
+    def test_per_table_results_cached(self, cf_db):
+        """Test constraints and descriptions are cached per table and returned as copies."""
+        constraints = introspect(cf_db, 'get_constraints', 'auth_user')
+        constraints.clear()
+        introspect(cf_db, 'get_table_description', 'auth_user')
+        count = len(cf_db.statements)
+
+        assert introspect(cf_db, 'get_constraints', 'auth_user')
+        introspect(cf_db, 'get_table_description', 'auth_user')
+        assert len(cf_db.statements) == count
+
+        introspect(cf_db, 'get_constraints', 'auth_group')
+        assert len(cf_db.statements) > count
+
+
+class TestInvalidation:
+    """Tests for clearing the cache on schema changes."""
+
+    def test_create_table(self, cf_db):
+        """Test creating a table refreshes the table list."""
+        cf_db.introspection.table_names()
+        with cf_db.cursor() as cursor:
+            cursor.execute('CREATE TABLE "extra" ("id" integer)')
+
+        assert 'extra' in cf_db.introspection.table_names()
+
+    def test_index_keeps_other_tables(self, cf_db):
+        """Test an index clears only its table's results."""
+        cf_db.introspection.table_names()
+        introspect(cf_db, 'get_constraints', 'auth_user')
+        introspect(cf_db, 'get_constraints', 'auth_group')
+        with cf_db.schema_editor() as editor:
+            editor.execute('CREATE INDEX "user_email" ON "auth_user" ("email")')
+        cf_db.statements.clear()
+
+        assert 'user_email' in introspect(cf_db, 'get_constraints', 'auth_user')
+        count = len(cf_db.statements)
+        introspect(cf_db, 'get_constraints', 'auth_group')
+        cf_db.introspection.table_names()
+
+        assert count > 0 and len(cf_db.statements) == count
+
+    def test_drop_index(self, cf_db):
+        """Test dropping an index, which doesn't name its table, clears every table."""
+        with cf_db.schema_editor() as editor:
+            editor.execute('CREATE INDEX "user_email" ON "auth_user" ("email")')
+        assert 'user_email' in introspect(cf_db, 'get_constraints', 'auth_user')
+
+        with cf_db.schema_editor() as editor:
+            editor.execute('DROP INDEX "user_email"')
+
+        assert 'user_email' not in introspect(cf_db, 'get_constraints', 'auth_user')
+
+    def test_databases_kept_apart(self, cf_db):
+        """Test a new database under the same alias isn't served the old results."""
+        cf_db.introspection.table_names()
+        cf_db.reset()
+
+        assert cf_db.introspection.table_names() == []
@@ -0,0 +1,76 @@
+"""Tests for keyset-chunked QuerySet.iterator() - django_cf/db/compiler.py and django_cf/db/keyset.py."""
+from .utils import cf_db, create_users  # NOQA
+
+
+def selects(cf_db):
+    return [query for query, _ in cf_db.statements if query.startswith('SELECT')]
+
+
+class TestChunkedIterator:
+    """Tests for iterator() reading a chunk per query."""
+
+    def test_one_query_per_chunk(self, cf_db):
+        """Test each chunk is a LIMIT query seeking past the previous one."""
+        from django.contrib.auth.models import User
+
+        create_users(25)
+        cf_db.statements.clear()
+
+        usernames = [user.username for user in User.objects.iterator(chunk_size=10)]
+
+        assert usernames == [f'user{i:02}' for i in range(25)]
+        queries = selects(cf_db)
+        assert len(queries) == 3
+        assert all('LIMIT 10' in query and 'OFFSET' not in query for query in queries)
+        assert '"auth_user"."id" >' in queries[1]
+
+    def test_ordering_and_filter(self, cf_db):
+        """Test the queryset's ordering and filters are kept across chunks."""
+        from django.contrib.auth.models import User
+
+        create_users(25)
+        queryset = User.objects.filter(username__gt='user03').order_by('-date_joined')
+
+        # Ties are broken by the pk, in the direction of the last ordering field
+        expected = [user.pk for user in queryset.order_by('-date_joined', '-pk')]
+        assert [user.pk for user in queryset.iterator(chunk_size=4)] == expected
+
+    def test_values_and_select_related(self, cf_db):
+        """Test rows keep their shape for values_list() and select_related()."""
+        from django.contrib.auth.models import Permission
+
+        queryset = Permission.objects.select_related('content_type').order_by('pk')
+        permissions = list(queryset.iterator(chunk_size=5))
+        assert [p.content_type.model for p in permissions] == [p.content_type.model for p in queryset]
+        assert len(selects(cf_db)) > 2
+
+        pairs = Permission.objects.order_by('pk').values_list('pk', 'codename')
+        assert list(pairs.iterator(chunk_size=5)) == list(pairs)
+
+    def test_unchunkable_queries(self, cf_db):
+        """Test queries the seek can't continue are read in one query."""
+        from django.contrib.auth.models import User
+
+        create_users(25)
+        cf_db.statements.clear()
+
+        list(User.objects.values_list('username', flat=True).iterator(chunk_size=10))
+        list(User.objects.all()[:20].iterator(chunk_size=10))
+        list(User.objects.order_by('?').iterator(chunk_size=10))
+
+        assert len(selects(cf_db)) == 3
+
+    def test_annotation_ordering(self, cf_db):
+        """Test ordering by an annotation or extra() select falls back to one query."""
+        from django.contrib.auth.models import User
+        from django.db.models import Count
+
+        create_users(25)
+        cf_db.statements.clear()
+
+        counted = User.objects.annotate(n=Count('groups')).order_by('n', 'pk')
+        assert [user.pk for user in counted.iterator(chunk_size=10)] == [user.pk for user in counted]
+        extra = User.objects.extra(select={'x': 'id % 3'}).order_by('x', 'pk')
+        assert [user.pk for user in extra.iterator(chunk_size=10)] == [user.pk for user in extra]
+
+        assert len(selects(cf_db)) == 4
@@ -0,0 +1,147 @@
+"""Tests for django_cf/db/nplusone.py - N+1 query detection."""
+import warnings
+
+import pytest
+
+from .utils import cf_db, setup_django  # NOQA
+
+
+@pytest.fixture
+def in_request():
+    """Run the test between request_started and request_finished."""
+    setup_django()
+    from django.core import signals
+
+    signals.request_started.send(sender=None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def finish_request():
+    """Leave no request open for the following tests."""
+    yield
+    setup_django()
+    from django.core import signals
+
+    signals.request_finished.send(sender=None)
+
+
+def enable(cf_db, **options):
+    from django.core.management import call_command
+
+    cf_db.settings_dict['N_PLUS_ONE_DETECTION'] = options or True
+    cf_db.reset()
+    call_command('migrate', verbosity=0)
+
+
+def create_users_with_groups(count):
+    from django.contrib.auth.models import Group, User
+
+    for i in range(count):
+        user = User.objects.create(username=f'user{i}')
+        user.groups.add(Group.objects.create(name=f'group{i}'))
+
+
+class TestNPlusOneDetector:
+    """Tests for the NPlusOneDetector class."""
+
+    def test_from_settings(self):
+        """Test the detector is only created when configured."""
+        from django_cf.db.nplusone import NPlusOneDetector
+
+        assert NPlusOneDetector.from_settings({}) is None
+        assert NPlusOneDetector.from_settings(None) is None
+        detector = NPlusOneDetector.from_settings({'N_PLUS_ONE_DETECTION': {'THRESHOLD': 2, 'ACTION': 'raise'}})
+        assert detector.threshold == 2
+        assert detector.action == 'raise'
+
+    def test_invalid_action(self):
+        """Test an unknown action is rejected."""
+        from django.core.exceptions import ImproperlyConfigured
+        from django_cf.db.nplusone import NPlusOneDetector
+
+        with pytest.raises(ImproperlyConfigured):
+            NPlusOneDetector(action='explode')
+
+    def test_reported_once_per_shape(self, in_request):
+        """Test a shape is reported once, when it passes the threshold."""
+        from django_cf.db.nplusone import NPlusOneDetector, NPlusOneWarning
+
+        detector = NPlusOneDetector(threshold=2, action='warn')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for i in range(5):
+                detector.record(f'SELECT * FROM "t" WHERE "t"."id" = {i}')
+
+        assert [w.category for w in caught] == [NPlusOneWarning]
+
+    def test_ignored_outside_requests(self):
+        """Test statements sent outside a request (e.g. migrations) are not counted."""
+        from django_cf.db.nplusone import NPlusOneDetector
+
+        detector = NPlusOneDetector(threshold=1, action='raise')
+        for _ in range(3):
+            detector.record('SELECT 1')
+
+    def test_clear(self, in_request):
+        """Test clearing starts counting again."""
+        from django_cf.db.nplusone import NPlusOneDetector, NPlusOneError
+
+        detector = NPlusOneDetector(threshold=1, action='raise')
+        detector.record('SELECT 1')
+        detector.clear()
+        detector.record('SELECT 1')
+        with pytest.raises(NPlusOneError):
+            detector.record('SELECT 1')
+
+
+class TestDetection:
+    """Tests for N+1 detection on a connection."""
+
+    def test_loop_over_reverse_relation_raises(self, cf_db):
+        """Test a loop over a many-to-many relation is flagged with its call site."""
+        from django.contrib.auth.models import User
+        from django.core import signals
+        from django_cf.db.nplusone import NPlusOneError
+
+        enable(cf_db, THRESHOLD=2, ACTION='raise')
+        create_users_with_groups(3)
+        signals.request_started.send(sender=None)
+
+        with pytest.raises(NPlusOneError) as excinfo:
+            for user in User.objects.all():
+                list(user.groups.all())
+
+        assert excinfo.value.count == 3
+        assert 'test_nplusone.py' in excinfo.value.call_site
+        assert 'prefetch_related()' in str(excinfo.value)
+
+    def test_forward_foreign_key_suggests_select_related(self):
+        """Test single-row lookups suggest select_related()."""
+        from django_cf.db.nplusone import suggestion
+
+        assert 'select_related()' in suggestion('SELECT "t"."id" FROM "t" WHERE "t"."id" = %s LIMIT 21')
+
+    def test_prefetched_loop_not_flagged(self, cf_db):
+        """Test the same loop with prefetch_related is not flagged."""
+        from django.contrib.auth.models import User
+        from django.core import signals
+
+        enable(cf_db, THRESHOLD=2, ACTION='raise')
+        create_users_with_groups(3)
+        signals.request_started.send(sender=None)
+
+        for user in User.objects.prefetch_related('groups'):
+            list(user.groups.all())
+
+    def test_counts_reset_per_request(self, cf_db):
+        """Test counts start over with every request."""
+        from django.contrib.auth.models import User
+        from django.core import signals
+
+        enable(cf_db, THRESHOLD=2, ACTION='raise')
+
+        for _ in range(3):
+            signals.request_started.send(sender=None)
+            list(User.objects.filter(username='a'))
+            list(User.objects.filter(username='a'))
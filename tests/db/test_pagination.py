@@ -0,0 +1,218 @@
+"""Tests for keyset pagination - django_cf/db/keyset.py, django_cf/pagination.py and django_cf/admin.py."""
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from .utils import cf_db, create_users  # NOQA
+
+
+class TestKeyset:
+    """Tests for the keyset helpers."""
+
+    def test_ordering_fields(self, cf_db):
+        """Test the pk is appended and foreign keys use their column."""
+        from django.contrib.auth.models import Permission, User
+        from django_cf.db.keyset import ordering_fields
+
+        assert ordering_fields(User.objects.order_by('-date_joined')) == [('date_joined', True), ('pk', True)]
+        assert ordering_fields(User.objects.order_by('id')) == [('pk', False)]
+        assert ordering_fields(Permission.objects.order_by('content_type', 'codename')) == \
+            [('content_type_id', False), ('codename', False), ('pk', False)]
+
+    def test_rejected_orderings(self, cf_db):
+        """Test random and nullable orderings are rejected."""
+        from django.contrib.auth.models import User
+        from django_cf.db.keyset import ordering_fields
+
+        with pytest.raises(ValueError):
+            ordering_fields(User.objects.order_by('?'))
+        with pytest.raises(ValueError):
+            ordering_fields(User.objects.order_by('last_login'))
+
+    def test_seek_q(self, cf_db):
+        """Test the seek filter continues after a row."""
+        from django.contrib.auth.models import User
+        from django_cf.db.keyset import ordering_fields, row_values, seek_q
+
+        create_users(6)
+        qs = User.objects.order_by('date_joined')
+        fields = ordering_fields(qs)
+        rows = list(qs)
+
+        after = qs.filter(seek_q(fields, row_values(rows[2], fields)))
+        before = qs.filter(seek_q(fields, row_values(rows[2], fields), reverse=True))
+        assert sorted(u.username for u in after) == [u.username for u in rows[3:]]
+        assert sorted(u.username for u in before) == [u.username for u in rows[:2]]
+
+    def test_cursor_round_trip(self, cf_db):
+        """Test cursors decode to typed values and reject tampering."""
+        from django.contrib.auth.models import User
+        from django_cf.db.keyset import decode_cursor, encode_cursor, ordering_fields
+
+        fields = ordering_fields(User.objects.order_by('-date_joined'))
+        cursor = encode_cursor((datetime(2024, 1, 2, 3, 4), 7), 'previous')
+
+        assert decode_cursor(cursor, User, fields) == ('previous', (datetime(2024, 1, 2, 3, 4), 7))
+        for bad in ('not a cursor', encode_cursor((1,)), encode_cursor(('x', 'y'))):
+            with pytest.raises(ValueError):
+                decode_cursor(bad, User, fields)
+
+
+class TestKeysetPaginator:
+    """Tests for the KeysetPaginator class."""
+
+    def names(self, page):
+        return [user.username for user in page]
+
+    def test_walk_forward_and_back(self, cf_db):
+        """Test pages follow each other in both directions without gaps or repeats."""
+        from django.contrib.auth.models import User
+        from django_cf.pagination import KeysetPaginator
+
+        create_users(7)
+        paginator = KeysetPaginator(User.objects.order_by('-date_joined'), 3)
+        expected = [u.username for u in sorted(
+            User.objects.all(), key=lambda u: (u.date_joined, u.pk), reverse=True
+        )]
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        assert self.names(first) + self.names(second) + self.names(third) == expected
+        assert not first.has_previous() and first.has_next()
+        assert second.has_previous() and second.has_next()
+        assert third.has_previous() and not third.has_next()
+
+        back = paginator.page(third.previous_cursor)
+        assert self.names(back) == self.names(second)
+        back = paginator.page(back.previous_cursor)
+        assert self.names(back) == self.names(first)
+        assert not back.has_previous() and back.has_next()
+
+    def test_no_offset(self, cf_db):
+        """Test later pages seek instead of using OFFSET."""
+        from django.contrib.auth.models import User
+        from django_cf.pagination import KeysetPaginator
+
+        create_users(5)
+        paginator = KeysetPaginator(User.objects.order_by('username'), 2)
+        cf_db.statements.clear()
+        paginator.page(paginator.page().next_cursor)
+
+        assert all('OFFSET' not in query for query, _ in cf_db.statements)
+
+    def test_invalid_cursor(self, cf_db):
+        """Test a malformed cursor is an invalid page."""
+        from django.contrib.auth.models import User
+        from django.core.paginator import InvalidPage
+        from django_cf.pagination import KeysetPaginator
+
+        with pytest.raises(InvalidPage):
+            KeysetPaginator(User.objects.order_by('username'), 2).page('garbage')
+
+    def test_empty(self, cf_db):
+        """Test an empty queryset has a single empty page."""
+        from django.contrib.auth.models import User
+        from django_cf.pagination import KeysetPaginator
+
+        page = KeysetPaginator(User.objects.order_by('username'), 2).page()
+        assert len(page) == 0
+        assert not page.has_other_pages()
+
+
+class TestKeysetPaginationMixin:
+    """Tests for the ListView mixin."""
+
+    def view(self, query=''):
+        from django.contrib.auth.models import User
+        from django.test import RequestFactory
+        from django.views.generic import ListView
+        from django_cf.pagination import KeysetPaginationMixin
+
+        class UserList(KeysetPaginationMixin, ListView):
+            queryset = User.objects.order_by('username')
+            paginate_by = 2
+
+        view = UserList()
+        view.setup(RequestFactory().get('/' + query))
+        view.object_list = view.get_queryset()
+        return view
+
+    def test_context(self, cf_db):
+        """Test ListView gets the keyset page in its context."""
+        create_users(3)
+
+        context = self.view().get_context_data()
+        assert [u.username for u in context['object_list']] == ['user00', 'user01']
+        assert context['is_paginated']
+
+        context = self.view(f"?cursor={context['page_obj'].next_cursor}").get_context_data()
+        assert [u.username for u in context['object_list']] == ['user02']
+
+    def test_invalid_cursor_404(self, cf_db):
+        """Test a malformed cursor is a 404."""
+        from django.http import Http404
+
+        with pytest.raises(Http404):
+            self.view('?cursor=garbage').get_context_data()
+
+
+class TestKeysetChangeList:
+    """Tests for the admin changelist."""
+
+    def changelist(self, query='', **options):
+        from django.contrib import admin
+        from django.contrib.auth.models import User
+        from django.test import RequestFactory
+        from django_cf.admin import KeysetPaginationAdminMixin
+
+        class UserAdmin(KeysetPaginationAdminMixin, admin.ModelAdmin):
+            list_per_page = 2
+            ordering = ['username']
+
+        request = RequestFactory().get('/' + query)
+        request.user = MagicMock(is_superuser=True)
+        model_admin = type('UserAdmin', (UserAdmin,), options)(User, admin.AdminSite())
+        return model_admin.get_changelist_instance(request)
+
+    def test_pages_without_count(self, cf_db):
+        """Test the changelist pages by cursor and doesn't count rows."""
+        create_users(3)
+
+        cf_db.statements.clear()
+        cl = self.changelist()
+        assert [u.username for u in cl.result_list] == ['user00', 'user01']
+        assert cl.multi_page
+        assert not any('COUNT(' in query for query, _ in cf_db.statements)
+
+        cl = self.changelist('?' + cl.next_page_url.lstrip('?'))
+        assert [u.username for u in cl.result_list] == ['user02']
+        assert cl.page.has_previous()
+
+    def test_unpageable_sorts_fall_back(self, cf_db):
+        """Test sorting by a nullable column or an annotation pages by number."""
+        from django.db.models import Count
+
+        create_users(3)
+
+        cl = self.changelist('?o=2', list_display=['username', 'last_login'])
+        assert not cl.keyset
+        assert len(cl.result_list) == 2
+        assert cl.paginator.num_pages == 2
+
+        cl = self.changelist(
+            '?o=2.1',
+            list_display=['username', 'group_count'],
+            get_queryset=lambda self, request: self.model.objects.annotate(n=Count('groups')),
+            group_count=admin_order_field('n'),
+        )
+        assert not cl.keyset
+        assert [u.username for u in cl.result_list] == ['user00', 'user01']
+
+
+def admin_order_field(name):
+    def column(self, obj):
+        return getattr(obj, name)
+    column.admin_order_field = name
+    return column
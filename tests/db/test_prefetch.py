@@ -0,0 +1,109 @@
+"""Tests for batched prefetch_related in django_cf/db/batch.py and CFQuerySet."""
+from .utils import cf_db  # NOQA
+
+
+def create_data():
+    from django.contrib.auth.models import User, Group, Permission
+
+    permissions = list(Permission.objects.order_by('id')[:4])
+    editors = Group.objects.create(name='editors')
+    editors.permissions.set(permissions[:2])
+    admins = Group.objects.create(name='admins')
+    admins.permissions.set(permissions[2:])
+
+    for i in range(3):
+        user = User.objects.create(username=f'user{i}')
+        user.groups.add(editors if i % 2 else admins)
+        user.user_permissions.add(permissions[i])
+
+
+def user_queryset():
+    from django.contrib.auth.models import User
+    from django_cf.db import CFQuerySet
+
+    return CFQuerySet(User).order_by('username')
+
+
+class TestBatchedPrefetch:
+    """Tests for prefetch queries being sent per depth."""
+
+    def test_same_depth_lookups_share_a_batch(self, cf_db):
+        """Test independent lookups at the same depth go out together."""
+        create_data()
+        cf_db.statements.clear()
+
+        users = list(user_queryset().prefetch_related('groups', 'user_permissions'))
+
+        assert len(users) == 3
+        assert len(cf_db.batches) == 1
+        assert len(cf_db.batches[0]) == 2
+
+    def test_one_batch_per_depth(self, cf_db):
+        """Test nested lookups are batched level by level."""
+        create_data()
+
+        list(user_queryset().prefetch_related('groups', 'user_permissions', 'groups__permissions'))
+
+        assert [len(batch) for batch in cf_db.batches] == [2, 1]
+
+    def test_results_match_django_prefetch(self, cf_db):
+        """Test prefetched caches are the same as Django's."""
+        from django.contrib.auth.models import User
+
+        create_data()
+        lookups = ('groups', 'user_permissions', 'groups__permissions')
+
+        expected = [
+            (u.username, [g.name for g in u.groups.all()],
+             [p.codename for p in u.user_permissions.all()],
+             [p.codename for g in u.groups.all() for p in g.permissions.all()])
+            for u in User.objects.order_by('username').prefetch_related(*lookups)
+        ]
+
+        users = list(user_queryset().prefetch_related(*lookups))
+        cf_db.statements.clear()
+        actual = [
+            (u.username, [g.name for g in u.groups.all()],
+             [p.codename for p in u.user_permissions.all()],
+             [p.codename for g in u.groups.all() for p in g.permissions.all()])
+            for u in users
+        ]
+
+        assert actual == expected
+        assert cf_db.statements == []
+
+    def test_prefetch_objects_with_to_attr(self, cf_db):
+        """Test Prefetch objects with custom querysets and to_attr."""
+        from django.contrib.auth.models import Group
+        from django.db.models import Prefetch
+
+        create_data()
+
+        users = list(user_queryset().prefetch_related(
+            Prefetch('groups', queryset=Group.objects.filter(name='admins'), to_attr='admin_groups'),
+            'user_permissions',
+        ))
+
+        assert [len(u.admin_groups) for u in users] == [1, 0, 1]
+        assert len(cf_db.batches) == 1
+
+    def test_empty_result(self, cf_db):
+        """Test prefetching on an empty queryset sends nothing extra."""
+        assert list(user_queryset().prefetch_related('groups')) == []
+        assert cf_db.batches == []
+
+    def test_lookup_through_to_attr(self, cf_db):
+        """Test a lookup through an earlier Prefetch's to_attr is applied after it."""
+        from django.contrib.auth.models import User
+        from django.db.models import Prefetch
+        from django_cf.db.batch import prefetch_related_objects
+
+        create_data()
+        users = list(User.objects.order_by('username'))
+
+        prefetch_related_objects(users, Prefetch('groups', to_attr='gs'), 'gs__permissions')
+        cf_db.statements.clear()
+
+        assert [[len(g.permissions.all()) for g in u.gs] for u in users] == [[2], [2], [2]]
+        assert cf_db.statements == []
+        assert [len(batch) for batch in cf_db.batches] == [1, 1]
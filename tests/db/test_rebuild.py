@@ -0,0 +1,234 @@
+"""Tests for django_cf/db/rebuild.py - Chunked, resumable table rebuilds."""
+import pytest
+
+from .utils import cf_db, d1_errors  # NOQA
+
+_models = {}
+
+
+def entry_model():
+    """A model to rebuild, defined once Django is set up."""
+    if 'Entry' not in _models:
+        from django.db import models
+
+        class Entry(models.Model):
+            name = models.CharField(max_length=50, db_index=True)
+            legacy = models.IntegerField(null=True)
+            rank = models.IntegerField(null=True)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models['Entry'] = Entry
+    return _models['Entry']
+
+
+def mark_model(on_delete):
+    """
+    A model referencing Entry with the ``on_delete`` handler, in its own app
+    registry so deleting entries elsewhere doesn't collect it.
+    """
+    name = f'Mark{on_delete.__name__.title().replace("_", "")}'
+    if name not in _models:
+        from django.apps.registry import Apps
+        from django.db import models
+
+        _models[name] = type(name, (models.Model,), {
+            'entry': models.ForeignKey(entry_model(), on_delete=on_delete, related_name='+'),
+            'Meta': type('Meta', (), {'app_label': 'django_cf', 'apps': Apps()}),
+            '__module__': __name__,
+        })
+    return _models[name]
+
+
+@pytest.fixture
+def Entry(cf_db):
+    model = entry_model()
+    with cf_db.schema_editor() as editor:
+        editor.create_model(model)
+    model.objects.bulk_create([model(name=f'Entry {i}', legacy=i, rank=i if i % 2 else None) for i in range(25)])
+    cf_db.statements.clear()
+    return model
+
+
+def operation(**kwargs):
+    from django.db import migrations, models
+    from django_cf.db.operations import RebuildTable
+
+    return RebuildTable('entry', [
+        migrations.AlterField('entry', 'rank', models.IntegerField(default=0)),
+        migrations.RemoveField('entry', 'legacy'),
+        migrations.RenameField('entry', 'name', 'title'),
+    ], **kwargs)
+
+
+def migrate(cf_db, model, rebuild_table, *related):
+    from django.db.migrations.state import ModelState, ProjectState
+
+    from_state = ProjectState()
+    for state_model in (model, *related):
+        from_state.add_model(ModelState.from_model(state_model))
+    to_state = from_state.clone()
+    rebuild_table.state_forwards('django_cf', to_state)
+    with cf_db.schema_editor() as editor:
+        rebuild_table.database_forwards('django_cf', editor, from_state, to_state)
+
+
+def rows(cf_db):
+    return cf_db.sqlite.execute('SELECT "id", "title", "rank" FROM "django_cf_entry" ORDER BY "id"').fetchall()
+
+
+def tables(cf_db):
+    return [row[0] for row in cf_db.sqlite.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+
+class TestRebuildTable:
+    """Tests for the RebuildTable migration operation."""
+
+    def test_copies_in_chunks(self, Entry, cf_db):
+        """Test the rows are copied chunk by chunk and the tables swapped."""
+        migrate(cf_db, Entry, operation(chunk_size=10))
+
+        copies = [query for query, _ in cf_db.statements if query.startswith('INSERT INTO "rebuild__')]
+        assert len(copies) == 4
+        assert all('LIMIT' in query for query in copies[:3])
+        assert rows(cf_db)[:3] == [(1, 'Entry 0', 0), (2, 'Entry 1', 1), (3, 'Entry 2', 0)]
+        assert len(rows(cf_db)) == 25
+        assert 'rebuild__django_cf_entry' not in tables(cf_db)
+        assert cf_db.sqlite.execute('SELECT * FROM "django_cf_rebuilds"').fetchall() == []
+
+    def test_new_definition(self, Entry, cf_db):
+        """Test the table and its indexes have the new definition."""
+        migrate(cf_db, Entry, operation())
+
+        columns = cf_db.sqlite.execute('PRAGMA table_info("django_cf_entry")').fetchall()
+        assert sorted((column[1], column[3]) for column in columns) == [('id', 1), ('rank', 1), ('title', 1)]
+        indexes = cf_db.sqlite.execute('PRAGMA index_list("django_cf_entry")').fetchall()
+        with cf_db.schema_editor() as editor:
+            expected = editor._create_index_name('django_cf_entry', ['title'])
+        assert [index[1] for index in indexes] == [expected]
+
+    def test_keeps_row_counter(self, Entry, cf_db):
+        """Test the row counter triggers are created again with the swap."""
+        from django_cf.db import counts
+
+        with cf_db.cursor() as cursor:
+            for sql, params in counts.install_sql('django_cf_entry'):
+                cursor.execute(sql, params)
+        migrate(cf_db, Entry, operation())
+        cf_db.sqlite.execute('INSERT INTO "django_cf_entry" ("title", "rank") VALUES (\'Entry 25\', 1)')
+
+        assert counts.row_count(Entry) == 26
+
+    def test_referenced_table(self, Entry, cf_db):
+        """Test the rows referencing the rebuilt table are kept."""
+        from django.db import models
+
+        Mark = mark_model(models.CASCADE)
+        cf_db.sqlite.execute('PRAGMA foreign_keys = ON')
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Mark)
+        Mark.objects.create(entry_id=1)
+
+        migrate(cf_db, Entry, operation(), Mark)
+
+        assert Mark.objects.count() == 1
+
+    def test_database_actions_refused(self, Entry, cf_db):
+        """Test tables referenced with database-level ON DELETE actions aren't rebuilt."""
+        from django_cf.db.deletion import DB_CASCADE
+
+        Mark = mark_model(DB_CASCADE)
+        cf_db.sqlite.execute('PRAGMA foreign_keys = ON')
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Mark)
+        Mark.objects.create(entry_id=1)
+
+        with pytest.raises(ValueError, match='DB_CASCADE or DB_SET_NULL'):
+            migrate(cf_db, Entry, operation(), Mark)
+        assert Mark.objects.count() == 1
+        assert 'rebuild__django_cf_entry' not in tables(cf_db)
+
+    def test_deconstruct(self):
+        """Test only non-default arguments are serialized."""
+        name, args, kwargs = operation(chunk_size=500).deconstruct()
+
+        assert name == 'RebuildTable'
+        assert sorted(kwargs) == ['chunk_size', 'model_name', 'operations']
+
+
+class TestResume:
+    """Tests for rebuilds spanning several runs."""
+
+    def test_incomplete_and_resumed(self, Entry, cf_db):
+        """Test running out of time fails the migration and a later run finishes it."""
+        from django_cf.db import rebuild
+
+        with pytest.raises(rebuild.RebuildIncomplete, match='10 of 25 rows copied'):
+            migrate(cf_db, Entry, operation(chunk_size=10, time_limit=0))
+
+        progress = rebuild.progress('django_cf_entry')
+        assert (progress.rows_copied, progress.rows_total, progress.finished) == (10, 25, False)
+
+        with pytest.raises(rebuild.RebuildIncomplete, match='20 of 25 rows copied'):
+            migrate(cf_db, Entry, operation(chunk_size=10, time_limit=0))
+        migrate(cf_db, Entry, operation(chunk_size=10))
+
+        assert len(rows(cf_db)) == 25
+        assert rebuild.progress('django_cf_entry') is None
+
+    def test_continue_rebuilds(self, Entry, cf_db):
+        """Test a scheduled job can finish the rebuild before the migration is run again."""
+        from django_cf.db import rebuild
+
+        with pytest.raises(rebuild.RebuildIncomplete):
+            migrate(cf_db, Entry, operation(chunk_size=10, time_limit=0))
+
+        [progress] = rebuild.continue_rebuilds(chunk_size=10)
+        assert progress.finished and progress.rows_copied == 25
+        assert progress.seconds_remaining == 0
+        assert rebuild.continue_rebuilds() == []
+
+        migrate(cf_db, Entry, operation())
+        assert rebuild.progress('django_cf_entry') is None
+
+    def test_no_state_table(self, cf_db):
+        """Test only a missing state table reads as no rebuilds."""
+        import sqlite3
+
+        from django_cf.db import rebuild
+
+        assert rebuild.continue_rebuilds() == []
+
+        cf_db.sqlite.execute('CREATE VIEW "django_cf_rebuilds" AS SELECT * FROM "missing"')
+        with pytest.raises(sqlite3.OperationalError, match='no such table: main.missing'):
+            rebuild.continue_rebuilds()
+
+    def test_first_rebuild_on_d1(self, Entry, cf_db):
+        """Test a rebuild starts on D1, whose errors don't say the state table is missing."""
+        from django_cf.db import rebuild
+
+        with d1_errors(cf_db):
+            assert rebuild.progress('django_cf_entry') is None
+            migrate(cf_db, Entry, operation())
+
+        assert len(rows(cf_db)) == 25
+
+    def test_writes_during_rebuild(self, Entry, cf_db):
+        """Test changes to copied and uncopied rows end up in the new table."""
+        from django_cf.db import rebuild
+
+        with pytest.raises(rebuild.RebuildIncomplete):
+            migrate(cf_db, Entry, operation(chunk_size=10, time_limit=0))
+
+        Entry.objects.filter(pk=2).update(name='Changed', rank=7)
+        Entry.objects.filter(pk__in=[3, 20]).delete()
+        Entry.objects.create(pk=100, name='Late')
+        Entry.objects.filter(pk=21).update(name='Not copied yet')
+        rebuild.continue_rebuilds(chunk_size=10)
+
+        result = rows(cf_db)
+        assert len(result) == 24
+        assert (2, 'Changed', 7) in result and (21, 'Not copied yet', 0) in result
+        assert result[-1] == (100, 'Late', 0)
+        assert 3 not in [row[0] for row in result]
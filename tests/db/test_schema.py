@@ -0,0 +1,230 @@
+"""Tests for the Cloudflare schema editor - Column renames and drops without table remakes."""
+import pytest
+
+from .utils import cf_db  # NOQA
+
+_models = {}
+
+
+def models_():
+    """Shelf and Item models, defined once Django is set up."""
+    if not _models:
+        from django.db import models
+
+        class Shelf(models.Model):
+            name = models.CharField(max_length=100)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        class Item(models.Model):
+            label = models.CharField(max_length=100, db_index=True)
+            code = models.CharField(max_length=10, unique=True)
+            shelf = models.ForeignKey(Shelf, null=True, on_delete=models.CASCADE)
+
+            class Meta:
+                app_label = 'django_cf'
+
+        _models.update(Shelf=Shelf, Item=Item)
+    return _models['Shelf'], _models['Item']
+
+
+@pytest.fixture
+def shelves(cf_db):
+    Shelf, Item = models_()
+    cf_db.sqlite.execute('PRAGMA foreign_keys = ON')
+    with cf_db.schema_editor() as editor:
+        editor.create_model(Shelf)
+        editor.create_model(Item)
+    shelf = Shelf.objects.create(name='Top')
+    Item.objects.create(label='Lamp', code='L1', shelf=shelf)
+    cf_db.statements.clear()
+    return Shelf, Item
+
+
+def field(model, name, new_field):
+    new_field.set_attributes_from_name(name)
+    new_field.model = model
+    return new_field
+
+
+def remade(cf_db):
+    return any('"new__' in query for query, _ in cf_db.statements)
+
+
+def columns(cf_db, table):
+    return [row[1] for row in cf_db.sqlite.execute(f'PRAGMA table_info("{table}")')]
+
+
+class TestRename:
+    """Tests for column renames."""
+
+    def test_foreign_key(self, shelves, cf_db):
+        """Test renaming a foreign key column keeps the table and its data."""
+        from django.db import models
+
+        Shelf, Item = shelves
+        old_field = Item._meta.get_field('shelf')
+        new_field = field(Item, 'shelf', models.ForeignKey(
+            Shelf, null=True, db_column='shelf', on_delete=models.CASCADE,
+        ))
+
+        with cf_db.schema_editor() as editor:
+            editor.alter_field(Item, old_field, new_field)
+
+        assert not remade(cf_db)
+        assert 'shelf' in columns(cf_db, 'django_cf_item')
+        assert cf_db.sqlite.execute('SELECT shelf FROM django_cf_item').fetchone() == (1,)
+
+    def test_changed_reference_remakes(self, shelves, cf_db):
+        """Test a rename that also changes the reference rebuilds the table."""
+        from django.db import models
+
+        Shelf, Item = shelves
+        old_field = Item._meta.get_field('shelf')
+        new_field = field(Item, 'shelf', models.ForeignKey(
+            Shelf, null=True, db_column='shelf', on_delete=models.CASCADE, db_constraint=False,
+        ))
+
+        with cf_db.schema_editor() as editor:
+            editor.alter_field(Item, old_field, new_field)
+
+        assert remade(cf_db)
+
+
+class TestIndex:
+    """Tests for toggling db_index."""
+
+    def test_drop_and_create(self, shelves, cf_db):
+        """Test db_index changes are DROP INDEX and CREATE INDEX."""
+        from django.db import models
+
+        Shelf, Item = shelves
+        old_field = Item._meta.get_field('label')
+        new_field = field(Item, 'label', models.CharField(max_length=100))
+
+        with cf_db.schema_editor() as editor:
+            editor.alter_field(Item, old_field, new_field)
+            editor.alter_field(Item, new_field, old_field)
+
+        assert not remade(cf_db)
+        assert [query.split()[0:2] for query, _ in cf_db.statements if 'INDEX' in query] == [
+            ['DROP', 'INDEX'], ['CREATE', 'INDEX'],
+        ]
+
+
+class TestRemoveField:
+    """Tests for column drops."""
+
+    def test_indexed_and_foreign_key(self, shelves, cf_db):
+        """Test indexed and foreign key columns are dropped in place."""
+        Shelf, Item = shelves
+
+        with cf_db.schema_editor() as editor:
+            editor.remove_field(Item, Item._meta.get_field('label'))
+            editor.remove_field(Item, Item._meta.get_field('shelf'))
+
+        assert not remade(cf_db)
+        assert columns(cf_db, 'django_cf_item') == ['id', 'code']
+        assert cf_db.sqlite.execute('SELECT code FROM django_cf_item').fetchall() == [('L1',)]
+
+    def test_unique_remakes(self, shelves, cf_db):
+        """Test unique columns still rebuild the table."""
+        Shelf, Item = shelves
+
+        with cf_db.schema_editor() as editor:
+            editor.remove_field(Item, Item._meta.get_field('code'))
+
+        assert remade(cf_db)
+        assert 'code' not in columns(cf_db, 'django_cf_item')
+
+    def test_trigger_remakes(self, shelves, cf_db):
+        """Test columns used by a trigger rebuild the table."""
+        Shelf, Item = shelves
+        cf_db.sqlite.execute(
+            'CREATE TRIGGER item_label AFTER UPDATE OF "label" ON "django_cf_item" BEGIN SELECT 1; END'
+        )
+
+        with cf_db.schema_editor() as editor:
+            assert editor._indexes_blocking_drop(Item, 'label') is None
+            assert editor._indexes_blocking_drop(Item, 'shelf_id') == ['django_cf_item_shelf_id_cc526aa3']
+
+    def test_column_inside_other_names(self, shelves, cf_db):
+        """Test a column name that is only part of another identifier in a trigger or view doesn't rebuild."""
+        Shelf, Item = shelves
+        cf_db.sqlite.execute(
+            'CREATE TRIGGER shelf_count AFTER INSERT ON "django_cf_shelf" BEGIN '
+            'UPDATE "counts" SET "total" = "total" + 1 WHERE "table_name" = \'django_cf_shelf\'; END'
+        )
+        cf_db.sqlite.execute('CREATE VIEW shelf_rows AS SELECT rowid AS "shelf_label" FROM "django_cf_shelf"')
+
+        with cf_db.schema_editor() as editor:
+            assert editor._indexes_blocking_drop(Shelf, 'name') == []
+            assert editor._indexes_blocking_drop(Shelf, 'id') == []
+            assert len(editor._indexes_blocking_drop(Item, 'label')) == 1
+            assert editor._indexes_blocking_drop(Shelf, 'total') is None
+
+
+class TestBatchedExecution:
+    """Tests for sending the schema editor's statements as one batch."""
+
+    def test_sent_on_exit(self, cf_db):
+        """Test the DDL and deferred SQL go out together when the editor exits."""
+        Shelf, Item = models_()
+
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Shelf)
+            editor.create_model(Item)
+            assert cf_db.statements == []
+
+        [batch] = cf_db.sequences
+        assert [query.split()[:2] for query, _ in batch] == [
+            ['CREATE', 'TABLE'], ['CREATE', 'TABLE'], ['CREATE', 'INDEX'], ['CREATE', 'INDEX'],
+        ]
+        assert columns(cf_db, 'django_cf_item') == ['id', 'label', 'code', 'shelf_id']
+
+    def test_read_flushes(self, cf_db):
+        """Test a read inside the editor sees the queued statements."""
+        Shelf, Item = models_()
+
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Shelf)
+            assert Shelf.objects.count() == 0
+
+        assert len(cf_db.sequences) == 1
+
+    def test_write_carries_queue(self, cf_db):
+        """Test the next write is sent in the same batch and gets its own result."""
+        Shelf, Item = models_()
+
+        with cf_db.schema_editor() as editor:
+            editor.create_model(Shelf)
+            shelf = Shelf.objects.create(name='Top')
+
+        [batch] = cf_db.sequences
+        assert batch[-1][0].startswith('INSERT INTO "django_cf_shelf"')
+        assert shelf.pk == 1
+
+    def test_error_discards_queue(self, cf_db):
+        """Test nothing is sent when the migration fails."""
+        Shelf, Item = models_()
+
+        with pytest.raises(ValueError):
+            with cf_db.schema_editor() as editor:
+                editor.create_model(Shelf)
+                raise ValueError
+
+        assert cf_db.statements == []
+        assert 'django_cf_shelf' not in cf_db.introspection.table_names()
+
+    def test_migrate(self, cf_db):
+        """Test each migration's DDL is sent as a batch."""
+        from django.core.management import call_command
+
+        cf_db.reset()
+        call_command('migrate', verbosity=0)
+
+        batched = [query for batch in cf_db.sequences for query, _ in batch]
+        ddl = [query for query, _ in cf_db.statements if query.startswith(('CREATE', 'ALTER', 'DROP'))]
+        assert ddl and all(query in batched for query in ddl)
+        assert any(query.startswith('INSERT INTO "django_migrations"') for query in batched)
@@ -0,0 +1,175 @@
+"""Tests for full-text search - django_cf/db/search.py and the CreateSearchIndex operation."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+
+def run_operation(connection, backwards=False):
+    from django.apps import apps
+    from django.db.migrations.state import ProjectState
+    from django_cf.db.operations import CreateSearchIndex
+
+    state = ProjectState.from_apps(apps)
+    operation = CreateSearchIndex('user', ['first_name', 'last_name', 'email'])
+    with connection.schema_editor() as editor:
+        if backwards:
+            operation.database_backwards('auth', editor, state, state)
+        else:
+            operation.database_forwards('auth', editor, state, state)
+
+
+@pytest.fixture
+def users(cf_db):
+    from django.contrib.auth.models import User
+
+    User.objects.bulk_create([
+        User(username='ada', first_name='Ada', last_name='Lovelace', email='ada@example.com'),
+        User(username='grace', first_name='Grace', last_name='Hopper', email='grace@example.com'),
+        User(username='alan', first_name='Alan', last_name='Turing', email='alan@example.org'),
+    ])
+    run_operation(cf_db)
+    cf_db.statements.clear()
+    return User
+
+
+def usernames(queryset):
+    return sorted(queryset.values_list('username', flat=True))
+
+
+class TestMatchExpression:
+    """Tests for turning search text into FTS5 queries."""
+
+    def test_words_are_quoted_prefixes(self):
+        """Test every word is a quoted prefix and syntax is escaped."""
+        from django_cf.db.search import match_expression
+
+        assert match_expression('cloud  "work') == '"cloud"* """work"*'
+        assert match_expression('ada', ['first_name']) == '{"first_name"} : ("ada"*)'
+        assert match_expression('   ') is None
+
+
+class TestSearch:
+    """Tests for querying the index."""
+
+    def test_existing_rows_indexed(self, users):
+        """Test rows present when the index is created are searchable."""
+        from django_cf.db.search import search
+
+        assert usernames(search(users.objects.all(), 'ada')) == ['ada']
+        assert usernames(search(users.objects.all(), 'example')) == ['ada', 'alan', 'grace']
+        assert usernames(search(users.objects.all(), 'example org')) == ['alan']
+
+    def test_lookup_restricts_to_field(self, users, cf_db):
+        """Test __search matches only the field it is applied to, without a LIKE scan."""
+        assert usernames(users.objects.filter(last_name__search='hop')) == ['grace']
+        assert usernames(users.objects.filter(first_name__search='hop')) == []
+        assert usernames(users.objects.filter(first_name__search='')) == []
+        assert all('LIKE' not in query for query, _ in cf_db.statements)
+
+    def test_lookup_other_backends(self, cf_db):
+        """Test __search refuses to compile for databases other than D1 and Durable Objects."""
+        from django.contrib.auth.models import User
+        from django.db import NotSupportedError
+
+        lookup = User.objects.filter(last_name__search='hop').query.where.children[0]
+
+        with pytest.raises(NotSupportedError):
+            lookup.as_sql(MagicMock(), MagicMock(vendor='postgresql'))
+
+    def test_registration(self, cf_db):
+        """Test __search comes from django_cf's app config and doesn't replace another app's lookup."""
+        from django.db import models
+        from django_cf.db.search import Search, register_lookups
+
+        assert models.TextField.get_class_lookups()['search'] is Search
+
+        class Other(models.Lookup):
+            lookup_name = 'search'
+
+        models.CharField._unregister_class_lookup(Search)
+        models.CharField.register_lookup(Other)
+        try:
+            register_lookups()
+            assert models.CharField.get_class_lookups()['search'] is Other
+        finally:
+            models.CharField._unregister_class_lookup(Other)
+            models.CharField.register_lookup(Search)
+
+    def test_search_fields(self, users):
+        """Test the fields argument limits the columns searched."""
+        from django_cf.db.search import search
+
+        assert usernames(search(users.objects.all(), 'alan', ['last_name'])) == []
+        assert usernames(search(users.objects.all(), 'alan', ['first_name', 'email'])) == ['alan']
+
+    def test_triggers_follow_writes(self, users):
+        """Test inserts, updates and deletes are mirrored into the index."""
+        from django_cf.db.search import search
+
+        users.objects.create(username='barbara', first_name='Barbara', last_name='Liskov')
+        users.objects.filter(username='ada').update(last_name='Byron')
+        users.objects.filter(username='alan').delete()
+
+        assert usernames(search(users.objects.all(), 'liskov')) == ['barbara']
+        assert usernames(search(users.objects.all(), 'byron')) == ['ada']
+        assert usernames(search(users.objects.all(), 'lovelace')) == []
+        assert usernames(search(users.objects.all(), 'turing')) == []
+
+    def test_remake_keeps_triggers(self, users, cf_db):
+        """Test remaking the table creates the sync triggers again."""
+        from django_cf.db.search import search
+
+        with cf_db.schema_editor() as editor:
+            editor._remake_table(users)
+        users.objects.filter(username='ada').update(last_name='Byron')
+
+        assert usernames(search(users.objects.all(), 'byron')) == ['ada']
+
+    def test_remake_removing_indexed_column(self, users, cf_db, caplog):
+        """Test triggers using a column the remake removes aren't created again."""
+        from django.db import models
+
+        renamed = models.EmailField(blank=True, db_column='mail')
+        renamed.set_attributes_from_name('email')
+        with cf_db.schema_editor() as editor:
+            editor._remake_table(users, alter_fields=[(users._meta.get_field('email'), renamed)])
+
+        assert not cf_db.sqlite.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        assert 'Trigger auth_user_fts_insert uses email' in caplog.text
+
+    def test_queryset_method(self, users):
+        """Test CFQuerySet.search()."""
+        from django_cf.db import CFQuerySet
+
+        assert usernames(CFQuerySet(users).search('grace')) == ['grace']
+        assert CFQuerySet(users).search('').count() == 0
+
+    def test_backwards(self, users, cf_db):
+        """Test reversing drops the index table and its triggers."""
+        run_operation(cf_db, backwards=True)
+
+        names = [row[0] for row in cf_db.sqlite.execute("SELECT name FROM sqlite_master").fetchall()]
+        assert not [name for name in names if name.startswith('auth_user_fts')]
+        users.objects.create(username='new')
+
+
+class TestSearchIndexAdmin:
+    """Tests for the admin integration."""
+
+    def test_changelist_search(self, users, cf_db):
+        """Test the changelist search runs through the index."""
+        from django.contrib import admin
+        from django.test import RequestFactory
+        from django_cf.admin import SearchIndexAdminMixin
+
+        class UserAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
+            search_fields = ['^first_name', 'last_name']
+
+        request = RequestFactory().get('/', {'q': 'tur'})
+        request.user = MagicMock(is_superuser=True)
+        cl = UserAdmin(users, admin.AdminSite()).get_changelist_instance(request)
+
+        assert [user.username for user in cl.result_list] == ['alan']
+        assert all('LIKE' not in query for query, _ in cf_db.statements)
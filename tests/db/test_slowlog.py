@@ -0,0 +1,119 @@
+"""Tests for django_cf/db/slowlog.py - Slow query log."""
+import asyncio
+import logging
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+
+def enable(cf_db, **options):
+    from django.core.management import call_command
+
+    cf_db.settings_dict['SLOW_QUERY_LOG'] = options
+    cf_db.reset()
+    call_command('migrate', verbosity=0)
+    cf_db.statements.clear()
+
+
+def flush(cf_db):
+    """Run the flushes handle_wsgi would hand to ctx.waitUntil."""
+    from django_cf.db.statements import pending_flushes
+
+    for pending in pending_flushes():
+        asyncio.run(pending)
+
+
+class TestSlowQueryLog:
+    """Tests for the SlowQueryLog class."""
+
+    def test_from_settings(self):
+        """Test the log is only created when configured."""
+        from django_cf.db.slowlog import SlowQueryLog
+
+        assert SlowQueryLog.from_settings({}) is None
+        assert SlowQueryLog.from_settings(None) is None
+        log = SlowQueryLog.from_settings({'SLOW_QUERY_LOG': {'ROWS_READ': 10}})
+        assert log.rows_read == 10
+        assert log.duration is None
+
+    def test_requires_a_threshold(self):
+        """Test a log without thresholds is rejected."""
+        from django.core.exceptions import ImproperlyConfigured
+        from django_cf.db.slowlog import SlowQueryLog
+
+        with pytest.raises(ImproperlyConfigured):
+            SlowQueryLog.from_settings({'SLOW_QUERY_LOG': {'TABLE': 'slow'}})
+
+    def test_is_slow(self):
+        """Test either threshold flags a statement."""
+        from django_cf.db.slowlog import SlowQueryLog
+
+        log = SlowQueryLog(duration=100, rows_read=1000)
+        assert not log.is_slow(10, 10)
+        assert log.is_slow(100, 10)
+        assert log.is_slow(10, 1000)
+
+    def test_params_shape(self):
+        """Test params are reduced to their types."""
+        from django_cf.db.slowlog import params_shape
+
+        assert params_shape((1, 'secret', None)) == 'int, str, NoneType'
+        assert params_shape(None) == ''
+
+
+class TestSlowQueryRecording:
+    """Tests for slow statements recorded by a connection."""
+
+    def test_logged_with_plan(self, cf_db, caplog):
+        """Test a slow statement is logged with its query plan and without param values."""
+        from django.contrib.auth.models import User
+
+        enable(cf_db, ROWS_READ=2, EXPLAIN_SAMPLE_RATE=1)
+        User.objects.create(username='a')
+        User.objects.create(username='b')
+
+        caplog.clear()
+        with caplog.at_level(logging.WARNING, logger='django_cf.db.slowlog'):
+            list(User.objects.filter(first_name='secret'))
+            list(User.objects.all())
+
+        assert len(caplog.records) == 1
+        message = caplog.records[0].getMessage()
+        assert '2 rows read' in message
+        assert 'FROM "auth_user"' in message
+        assert 'SCAN auth_user' in message
+        assert 'secret' not in message
+
+    def test_written_to_table(self, cf_db):
+        """Test slow statements are stored in the configured table."""
+        from django.contrib.auth.models import User
+
+        enable(cf_db, DURATION=0, EXPLAIN_SAMPLE_RATE=1, TABLE='slow_query')
+        flush(cf_db)
+        cf_db.sqlite.execute('DELETE FROM "slow_query"')  # entries from migrate
+        cf_db.statements.clear()
+        list(User.objects.filter(username='a'))
+
+        # Written after the response, not while the request runs
+        assert not [query for query, _ in cf_db.statements if 'slow_query' in query]
+        flush(cf_db)
+        assert not [query for query, _ in cf_db.statements if query.startswith('CREATE TABLE')]
+
+        rows = cf_db.sqlite.execute('SELECT "fingerprint", "params", "plan" FROM "slow_query"').fetchall()
+        assert len(rows) == 1
+        fingerprint, params, plan = rows[0]
+        assert '"auth_user"."username" = ?' in fingerprint
+        assert params == 'str'
+        assert 'auth_user' in plan
+
+    def test_log_failure_does_not_break_query(self, cf_db, caplog):
+        """Test errors while logging are reported and the query still returns."""
+        from django.contrib.auth.models import User
+
+        enable(cf_db, DURATION=0, TABLE='no such "table')
+        with caplog.at_level(logging.WARNING, logger='django_cf.db.slowlog'):
+            assert list(User.objects.all()) == []
+            flush(cf_db)
+
+        assert 'Slow query log failed' in caplog.text
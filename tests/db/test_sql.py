@@ -0,0 +1,77 @@
+"""Tests for django_cf/db/sql.py - SQL text helpers."""
+
+
+class TestQueryTables:
+    """Tests for the query_tables function."""
+
+    def test_select_with_join(self):
+        """Test tables are found in FROM and JOIN clauses."""
+        from django_cf.db.sql import query_tables
+
+        sql = ('SELECT "auth_user"."id" FROM "auth_user" '
+               'INNER JOIN "auth_user_groups" ON ("auth_user"."id" = "auth_user_groups"."user_id")')
+
+        assert query_tables(sql) == {'auth_user', 'auth_user_groups'}
+
+    def test_subquery(self):
+        """Test tables inside subqueries are found."""
+        from django_cf.db.sql import query_tables
+
+        sql = 'SELECT * FROM "a" WHERE "a"."id" IN (SELECT U0."a_id" FROM "b" U0)'
+
+        assert query_tables(sql) == {'a', 'b'}
+
+    def test_writes(self):
+        """Test INSERT, UPDATE and DELETE targets are found."""
+        from django_cf.db.sql import query_tables
+
+        assert query_tables('INSERT INTO "t" ("a") VALUES (%s)') == {'t'}
+        assert query_tables('UPDATE "t" SET "a" = %s WHERE "t"."id" = %s') == {'t'}
+        assert query_tables('DELETE FROM "t" WHERE "t"."id" IN (%s)') == {'t'}
+
+    def test_ddl(self):
+        """Test table names in DDL statements are found."""
+        from django_cf.db.sql import query_tables
+
+        assert query_tables('CREATE TABLE IF NOT EXISTS "t" ("id" integer)') == {'t'}
+        assert query_tables('ALTER TABLE "t" ADD COLUMN "a" text') == {'t'}
+        assert query_tables('DROP TABLE "t"') == {'t'}
+
+    def test_unquoted_and_comma_joins(self):
+        """Test bare identifiers and comma separated FROM lists."""
+        from django_cf.db.sql import query_tables
+
+        assert query_tables('select * from a, b, "c" where a.id = b.id') == {'a', 'b', 'c'}
+
+    def test_no_tables(self):
+        """Test statements without tables return an empty set."""
+        from django_cf.db.sql import query_tables
+
+        assert query_tables('SELECT 1') == set()
+
+
+class TestFingerprint:
+    """Tests for the fingerprint function."""
+
+    def test_literals_and_placeholders(self):
+        """Test values are replaced so rows of one loop share a fingerprint."""
+        from django_cf.db.sql import fingerprint
+
+        a = fingerprint('SELECT "t"."id" FROM "t" WHERE ("t"."id" = %s AND "t"."name" = \'a\') LIMIT 21')
+        b = fingerprint('SELECT "t"."id" FROM "t" WHERE ("t"."id" = %s AND "t"."name" = \'it\'\'s\') LIMIT 21')
+
+        assert a == b == 'SELECT "t"."id" FROM "t" WHERE ("t"."id" = ? AND "t"."name" = ?) LIMIT ?'
+
+    def test_in_lists_collapsed(self):
+        """Test IN lists of any length share a fingerprint."""
+        from django_cf.db.sql import fingerprint
+
+        assert fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (%s)') == \
+            fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s, %s)') == \
+            'SELECT * FROM "t" WHERE "t"."id" IN (...)'
+
+    def test_identifiers_with_digits_kept(self):
+        """Test digits inside identifiers are not treated as literals."""
+        from django_cf.db.sql import fingerprint
+
+        assert fingerprint('SELECT "t2"."col1" FROM "t2"') == 'SELECT "t2"."col1" FROM "t2"'
@@ -0,0 +1,175 @@
+"""Tests for django_cf/db/statements.py - Aggregate statement statistics."""
+import asyncio
+import logging
+from io import StringIO
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+
+def enable(cf_db, **options):
+    from django.core.management import call_command
+
+    cf_db.settings_dict['STATEMENT_STATS'] = options or True
+    cf_db.reset()
+    call_command('migrate', verbosity=0)
+    cf_db.ensure_connection()
+    cf_db.connection.statement_stats.drain()
+
+
+class TestStatementStats:
+    """Tests for per-fingerprint totals."""
+
+    def test_p95(self):
+        """Test the 95th percentile of recorded durations."""
+        from django_cf.db.statements import StatementStats
+
+        stats = StatementStats('SELECT 1', None)
+        for duration in range(1, 101):
+            stats.add(float(duration))
+
+        assert stats.calls == 100
+        assert stats.total_time == 5050.0
+        assert stats.p95() == 95.0
+
+    def test_params_reduced_to_types(self):
+        """Test sample params are stored as their types."""
+        from django_cf.db.statements import StatementStats
+
+        assert StatementStats('SELECT %s', ('secret',)).params == 'str'
+
+
+class TestStatementStatsCollector:
+    """Tests for the StatementStatsCollector class."""
+
+    def test_from_settings(self):
+        """Test the collector and its sink are built from the settings."""
+        from django.core.exceptions import ImproperlyConfigured
+        from django_cf.db.statements import LogSink, StatementStatsCollector, TableSink
+
+        assert StatementStatsCollector.from_settings({}, None) is None
+        assert isinstance(StatementStatsCollector.from_settings({'STATEMENT_STATS': True}, None).sink, LogSink)
+        collector = StatementStatsCollector.from_settings({'STATEMENT_STATS': {'SINK': 'table', 'TABLE': 't'}}, None)
+        assert isinstance(collector.sink, TableSink)
+        assert collector.sink.table == 't'
+
+        with pytest.raises(ImproperlyConfigured):
+            StatementStatsCollector.from_settings({'STATEMENT_STATS': {'SINK': 'analytics_engine'}}, None)
+        with pytest.raises(ImproperlyConfigured):
+            StatementStatsCollector.from_settings({'STATEMENT_STATS': {'SINK': 'kafka'}}, None)
+
+    def test_aggregates_by_fingerprint(self):
+        """Test statements differing only in values share totals."""
+        from django_cf.db.statements import LogSink, StatementStatsCollector
+
+        collector = StatementStatsCollector(LogSink())
+        collector.record('SELECT * FROM "t" WHERE "id" = %s', (1,), 2.0, rows_read=1)
+        collector.record('SELECT * FROM "t" WHERE "id" = %s', (2,), 4.0, rows_read=1)
+        collector.record('UPDATE "t" SET "a" = %s', (1,), 1.0, rows_written=5)
+
+        top = collector.top(order_by='total_time')
+        assert [row['calls'] for row in top] == [2, 1]
+        assert top[0]['rows_read'] == 2
+        assert top[0]['total_time'] == 6.0
+        assert collector.top(order_by='rows_written')[0]['rows_written'] == 5
+
+    def test_max_statements(self):
+        """Test fingerprints past the limit are lumped together."""
+        from django_cf.db.statements import OTHER, LogSink, StatementStatsCollector
+
+        collector = StatementStatsCollector(LogSink(), max_statements=1)
+        collector.record('SELECT 1', None, 1.0)
+        collector.record('SELECT * FROM a', None, 1.0)
+        collector.record('SELECT * FROM b', None, 1.0)
+
+        assert {row['fingerprint']: row['calls'] for row in collector.top()} == {'SELECT ?': 1, OTHER: 2}
+
+    def test_due_and_flush(self, caplog):
+        """Test flushing writes to the sink and starts over."""
+        from django_cf.db.statements import LogSink, StatementStatsCollector
+
+        collector = StatementStatsCollector(LogSink(), flush_interval=0)
+        assert not collector.due()
+        collector.record('SELECT 1', None, 1.0)
+        assert collector.due()
+
+        with caplog.at_level(logging.INFO, logger='django_cf.db.statements'):
+            asyncio.run(collector.flush())
+
+        assert '1 calls' in caplog.text
+        assert collector.top() == []
+        assert not collector.due()
+
+    def test_flush_failure_logged(self, caplog):
+        """Test a failing sink doesn't raise."""
+        from django_cf.db.statements import StatementStatsCollector
+
+        class BrokenSink:
+            async def write(self, rows):
+                raise RuntimeError('down')
+
+        collector = StatementStatsCollector(BrokenSink())
+        collector.record('SELECT 1', None, 1.0)
+        asyncio.run(collector.flush())
+
+        assert 'Statement stats flush failed' in caplog.text
+
+
+class TestConnectionStatementStats:
+    """Tests for statements recorded by a connection and flushed to a table."""
+
+    def test_recorded_and_flushed_to_table(self, cf_db):
+        """Test executed statements reach the table sink and the command lists them."""
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django_cf.db.statements import pending_flushes
+
+        enable(cf_db, SINK='table', TABLE='statement_stats', FLUSH_INTERVAL=0)
+        for i in range(3):
+            list(User.objects.filter(username=f'user{i}'))
+        User.objects.create(username='a')
+
+        flushes = pending_flushes()
+        assert len(flushes) == 1
+        asyncio.run(flushes[0])
+
+        rows = cf_db.sqlite.execute('SELECT "calls", "params" FROM "statement_stats" ORDER BY "calls" DESC').fetchall()
+        assert len(rows) == 2
+        assert rows[0] == (3, 'str')
+
+        out = StringIO()
+        call_command('cf_top_statements', order_by='calls', stdout=out)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[0].strip().startswith('3 calls')
+        assert '"auth_user"."username" = ?' in lines[0]
+
+    def test_gather_statements_recorded(self, cf_db):
+        """Test statements sent together are each recorded."""
+        from django.contrib.auth.models import User
+        from django_cf.db import gather
+
+        enable(cf_db)
+        gather(User.objects.all(), User.objects.filter(username='a'))
+
+        assert sum(row['calls'] for row in cf_db.connection.statement_stats.top()) == 2
+
+    def test_command_memory(self, cf_db):
+        """Test the command lists this isolate's totals."""
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+
+        enable(cf_db)
+        list(User.objects.all())
+
+        out = StringIO()
+        call_command('cf_top_statements', memory=True, stdout=out)
+        assert 'FROM "auth_user"' in out.getvalue()
+
+    def test_command_requires_statement_stats(self, cf_db):
+        """Test the command explains when STATEMENT_STATS is off."""
+        from django.core.management import CommandError, call_command
+
+        with pytest.raises(CommandError):
+            call_command('cf_top_statements')
@@ -0,0 +1,97 @@
+"""Tests for django_cf/stats.py - Per-request query statistics."""
+from .utils import cf_db  # NOQA
+
+
+class TestQueryStats:
+    """Tests for the QueryStats accumulator."""
+
+    def test_record_accumulates(self):
+        """Test recorded statements add up and the slowest one is kept."""
+        from django_cf.stats import QueryStats
+
+        stats = QueryStats()
+        stats.record('SELECT 1', 2.0, rows_read=3)
+        stats.record('SELECT 2', 5.0, rows_read=1)
+        stats.record('INSERT', 1.0, rows_written=1)
+
+        assert stats.queries == 3
+        assert stats.db_time == 8.0
+        assert stats.rows_read == 4
+        assert stats.rows_written == 1
+        assert stats.slowest_query == 'SELECT 2'
+        assert stats.slowest_time == 5.0
+
+    def test_server_timing(self):
+        """Test the Server-Timing header value."""
+        from django_cf.stats import QueryStats
+
+        stats = QueryStats()
+        stats.record('SELECT 1', 12.34, rows_read=5)
+        stats.record_cached()
+
+        assert stats.server_timing() == 'db;dur=12.3;desc="1 queries, 5 rows read, 0 rows written, 1 cached"'
+
+    def test_reset_on_request_started(self):
+        """Test a new request starts with empty stats."""
+        from django.core import signals
+        from django_cf import stats
+
+        stats.current().record('SELECT 1', 1.0)
+        signals.request_started.send(sender=None)
+
+        assert stats.current().queries == 0
+        assert stats.in_request()
+
+        signals.request_finished.send(sender=None)
+        assert not stats.in_request()
+
+
+class TestExecuteStats:
+    """Tests for statements being recorded by CFDatabase.execute()."""
+
+    def test_reads_and_writes_recorded(self, cf_db):
+        """Test executed statements are counted with their rows."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+
+        stats.reset()
+        User.objects.create(username='a')
+        User.objects.create(username='b')
+        list(User.objects.all())
+
+        current = stats.current()
+        assert current.queries == 3
+        assert current.rows_written == 2
+        assert current.rows_read == 2
+        assert current.db_time > 0
+        assert current.slowest_query is not None
+
+    def test_cached_hits_not_counted_as_queries(self, cf_db):
+        """Test result cache hits are reported separately."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+
+        cf_db.settings_dict['REQUEST_CACHE'] = True
+        cf_db.reset()
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+        stats.reset()
+        list(User.objects.filter(username='a'))
+        list(User.objects.filter(username='a'))
+
+        assert stats.current().queries == 1
+        assert stats.current().cached == 1
+
+    def test_gather_recorded_once(self, cf_db):
+        """Test concurrent statements count individually but add their wall time once."""
+        from django.contrib.auth.models import User
+        from django_cf import stats
+        from django_cf.db import gather
+
+        User.objects.create(username='a')
+        stats.reset()
+        gather(User.objects.all(), User.objects.filter(username='a'))
+
+        assert stats.current().queries == 2
+        assert stats.current().rows_read == 2
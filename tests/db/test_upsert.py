@@ -0,0 +1,191 @@
+"""Tests for django_cf/db/upsert.py - get_or_create and update_or_create through upserts."""
+from unittest.mock import patch
+
+import pytest
+
+from .utils import cf_db  # NOQA
+
+
+def users():
+    from django.contrib.auth.models import User
+    from django_cf.db import UpsertQuerySet
+
+    return UpsertQuerySet(User)
+
+
+class TestSupportsUpsert:
+    """Tests for choosing the fast path."""
+
+    def test_unique_lookups(self, cf_db):
+        """Test lookups covering a unique field or constraint qualify."""
+        from django.contrib.auth.models import Permission
+        from django_cf.db.upsert import supports_upsert
+
+        assert supports_upsert(users(), {'username': 'a'}, {'email': 'x'})
+        assert supports_upsert(users(), {'pk': 1})
+        assert supports_upsert(Permission.objects.all(), {'content_type_id': 1, 'codename': 'x'})
+
+    def test_other_lookups(self, cf_db):
+        """Test non-unique, spanning or unknown lookups and defaults fall back."""
+        from django.contrib.auth.models import Permission
+        from django_cf.db.upsert import supports_upsert
+
+        assert not supports_upsert(users(), {'email': 'a'})
+        assert not supports_upsert(users(), {'username__iexact': 'a'})
+        assert not supports_upsert(users(), {'username': 'a'}, {'groups': []})
+        assert not supports_upsert(Permission.objects.all(), {'codename': 'x'})
+
+
+class TestCreateOrGet:
+    """Tests for create_or_get()."""
+
+    def test_creates_in_one_statement(self, cf_db):
+        """Test a new row is inserted and returned by a single statement."""
+        user, created = users().create_or_get(username='ada', defaults={'first_name': 'Ada'})
+
+        assert created
+        assert (user.pk, user.username, user.first_name, user.is_active) == (1, 'ada', 'Ada', True)
+        assert user.date_joined is not None
+        assert len(cf_db.statements) == 1
+        assert 'ON CONFLICT DO NOTHING RETURNING' in cf_db.statements[0][0]
+
+    def test_existing_row(self, cf_db):
+        """Test a conflict reads back the existing row without changing it."""
+        users().create(username='ada', first_name='Ada')
+
+        user, created = users().create_or_get(username='ada', defaults={'first_name': 'Other'})
+
+        assert not created
+        assert user.first_name == 'Ada'
+        assert users().count() == 1
+
+    def test_conflict_outside_lookup(self, cf_db):
+        """Test a conflict on another unique field is an IntegrityError."""
+        from django.db import IntegrityError
+
+        users().create(username='ada')
+
+        with pytest.raises(IntegrityError):
+            users().create_or_get(pk=5, defaults={'username': 'ada'})
+
+
+class TestGetOrCreate:
+    """Tests for get_or_create()."""
+
+    def test_get_then_create(self, cf_db):
+        """Test existing rows are read and missing ones inserted."""
+        user, created = users().get_or_create(username='ada')
+        assert created
+
+        cf_db.statements.clear()
+        again, created = users().get_or_create(username='ada')
+        assert not created and again.pk == user.pk
+        assert len(cf_db.statements) == 1
+
+    def test_fallback(self, cf_db):
+        """Test non-unique lookups use Django's implementation."""
+        user, created = users().get_or_create(email='a@example.com', defaults={'username': 'ada'})
+
+        assert created and user.username == 'ada'
+        assert users().get_or_create(email='a@example.com') == (user, False)
+
+
+class TestUpdateOrCreate:
+    """Tests for update_or_create()."""
+
+    def test_updates_in_one_statement(self, cf_db):
+        """Test an existing row is updated and returned by a single statement."""
+        users().create(username='ada', first_name='Ada')
+        cf_db.statements.clear()
+
+        user, created = users().update_or_create(username='ada', defaults={'last_name': 'Lovelace'})
+
+        assert not created
+        assert (user.first_name, user.last_name) == ('Ada', 'Lovelace')
+        assert len(cf_db.statements) == 1
+        assert cf_db.statements[0][0].startswith('UPDATE')
+
+    def test_creates(self, cf_db):
+        """Test a missing row is inserted with create_defaults."""
+        user, created = users().update_or_create(
+            username='ada', defaults={'last_name': 'Byron'}, create_defaults={'last_name': 'Lovelace'},
+        )
+
+        assert created and user.last_name == 'Lovelace'
+        assert users().get(username='ada').last_name == 'Lovelace'
+
+    def test_callable_defaults(self, cf_db):
+        """Test callable defaults are resolved."""
+        users().create(username='ada')
+
+        user, _ = users().update_or_create(username='ada', defaults={'first_name': lambda: 'Ada'})
+        assert user.first_name == 'Ada'
+
+
+class TestMiddlewareCreatesUser:
+    """Tests for the Cloudflare Access middleware using create_or_get()."""
+
+    def test_new_and_existing_user(self, cf_db):
+        """Test a user is created once and found by email afterwards."""
+        from django.contrib.auth.models import User
+
+        # The middleware tests import the module against mocked settings
+        with patch.dict('sys.modules'):
+            from django_cf.middleware.CloudflareAccessMiddleware import CloudflareAccessMiddleware
+
+            middleware = CloudflareAccessMiddleware.__new__(CloudflareAccessMiddleware)
+            user = middleware._get_or_create_user('ada@example.com', 'Ada Lovelace')
+
+            assert (user.username, user.first_name, user.last_name) == ('ada@example.com', 'Ada', 'Lovelace')
+            assert not user.has_usable_password()
+            assert middleware._get_or_create_user('ada@example.com', 'Ada Lovelace').pk == user.pk
+            assert User.objects.count() == 1
+
+    def test_save_signals_sent_on_create(self, cf_db):
+        """Test pre_save and post_save go out for a new user only, and pre_save receivers can change it."""
+        from django.db.models.signals import post_save, pre_save
+
+        received = []
+
+        def before(sender, instance, **kwargs):
+            received.append(('pre_save', instance.username, instance.pk))
+            instance.is_staff = True
+
+        def after(sender, instance, created, **kwargs):
+            received.append(('post_save', instance.username, created))
+
+        pre_save.connect(before)
+        post_save.connect(after)
+        try:
+            with patch.dict('sys.modules'):
+                from django_cf.middleware.CloudflareAccessMiddleware import CloudflareAccessMiddleware
+
+                middleware = CloudflareAccessMiddleware.__new__(CloudflareAccessMiddleware)
+                user = middleware._get_or_create_user('ada@example.com', 'Ada Lovelace')
+                middleware._get_or_create_user('ada@example.com', 'Ada Lovelace')
+        finally:
+            pre_save.disconnect(before)
+            post_save.disconnect(after)
+
+        assert received == [('pre_save', 'ada@example.com', None), ('post_save', 'ada@example.com', True)]
+        assert user.is_staff
+
+    def test_custom_create_user(self, cf_db):
+        """Test a user manager overriding create_user() creates the user."""
+        from django.contrib.auth.models import User, UserManager
+
+        class CustomUserManager(UserManager):
+            def create_user(self, username, email=None, password=None, **extra_fields):
+                extra_fields.setdefault('is_staff', True)
+                return super().create_user(username, email, password, **extra_fields)
+
+        manager = CustomUserManager()
+        manager.model = User
+        with patch.dict('sys.modules'), patch.object(User._meta, 'default_manager', manager):
+            from django_cf.middleware.CloudflareAccessMiddleware import CloudflareAccessMiddleware
+
+            middleware = CloudflareAccessMiddleware.__new__(CloudflareAccessMiddleware)
+            user = middleware._get_or_create_user('ada@example.com', 'Ada Lovelace')
+
+        assert user.is_staff
+        assert (user.username, user.last_name) == ('ada@example.com', 'Lovelace')
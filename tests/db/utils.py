@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import django
+import pytest
+from django.conf import settings
+
+
+def setup_django():
+    """Configure Django against the in-memory CF stand-in backend (tests/db/backend)."""
+    if not settings.configured:
+        settings.configure(
+            DATABASES={'default': {'ENGINE': 'tests.db.backend'}},
+            INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth', 'django.contrib.admin', 'django_cf'],
+            USE_TZ=False,
+        )
+        django.setup()
+
+
+@pytest.fixture
+def cf_db():
+    """A freshly migrated stand-in database; yields the connection."""
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+
+    saved_settings = dict(connection.settings_dict)
+    connection.reset()
+    call_command('migrate', verbosity=0)
+    connection.statements.clear()
+    connection.batches.clear()
+    connection.sequences.clear()
+
+    yield connection
+
+    connection.settings_dict.clear()
+    connection.settings_dict.update(saved_settings)
+    connection.reset()
+
+
+def create_users(count, start=0):
+    """
+    Create users user00, user01... from number ``start``. Every other user is
+    staff, and pairs of users share a join date so ordering by it needs the
+    pk to break ties.
+    """
+    from django.contrib.auth.models import User
+
+    joined = datetime(2024, 1, 1)
+    User.objects.bulk_create([
+        User(username=f'user{i:02}', is_staff=i % 2 == 0, date_joined=joined + timedelta(days=i // 2))
+        for i in range(start, start + count)
+    ])
+
+
+@contextmanager
+def d1_errors(connection):
+    """
+    Make the stand-in fail like D1, whose errors carry a JS stack trace
+    instead of SQLite's message.
+    """
+    import sqlite3
+
+    run_query = connection.run_query
+
+    def failing(query, params=None):
+        try:
+            return run_query(query, params)
+        except sqlite3.Error:
+            raise sqlite3.OperationalError('Error\n    at D1DatabaseSessionAlwaysPrimary._sendOrThrow') from None
+
+    with patch.object(connection, 'run_query', side_effect=failing):
+        yield
@@ -1,4 +1,6 @@
 """Tests for WSGI handler and DjangoCF classes."""
+from unittest.mock import patch
+
 import pytest
 from django_cf import DjangoCF, DjangoCFDurableObject
 
@@ -61,3 +63,169 @@ class TestWSGIHeaderTransformation:
             assert result == expected_key, (
                 f"Header '{header_name}' should map to '{expected_key}', got '{result}'"
             )
+
+
+class StubJSResponse:
+    """Stands in for the JS Response that handle_wsgi returns."""
+
+    def __init__(self, body, headers=None, status=200):
+        self.body = body
+        self.status = status
+        self.headers = StubHeaders(headers or {})
+
+    @classmethod
+    def new(cls, body, headers=None, status=200):
+        return cls(body, headers, status)
+
+
+class StubHeaders(dict):
+    """Headers keeping every Set-Cookie value, like the JS Headers object."""
+
+    def set(self, name, value):
+        if name == 'Set-Cookie':
+            self.setdefault(name, []).append(value)
+        else:
+            self[name] = value
+
+
+class StubURL:
+    def __init__(self, url):
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        self.protocol = f'{parts.scheme}:'
+        self.pathname = parts.path
+        self.search = f'?{parts.query}' if parts.query else ''
+        self.host = parts.netloc
+        self.port = str(parts.port or '')
+
+    @classmethod
+    def new(cls, url):
+        return cls(url)
+
+
+class StubRequest:
+    def __init__(self, url='https://example.com/page?x=1', method='GET', headers=None):
+        self.url = url
+        self.method = method
+        self.headers = StubHeaders(headers or {})
+
+
+class StubContext:
+    def __init__(self):
+        self.waited = []
+
+    def waitUntil(self, future):
+        self.waited.append(future)
+
+
+@pytest.fixture
+def js(monkeypatch):
+    """A stub ``js`` module with the globals handle_wsgi uses."""
+    import sys
+    import types
+
+    from tests.db.utils import setup_django
+
+    setup_django()
+    module = types.SimpleNamespace(
+        Object=types.SimpleNamespace(fromEntries=dict),
+        Response=StubJSResponse,
+        URL=StubURL,
+        console=types.SimpleNamespace(error=print),
+    )
+    monkeypatch.setitem(sys.modules, 'js', module)
+    return module
+
+
+def run(request, app, ctx=None):
+    import asyncio
+
+    from django_cf import handle_wsgi
+
+    return asyncio.run(handle_wsgi(request, app, ctx))
+
+
+class TestHandleWSGI:
+    """Tests driving handle_wsgi with stub JS objects."""
+
+    def test_request_and_response(self, js):
+        """Test the request becomes a WSGI environ and the Django response a JS Response."""
+        from django.http import HttpResponse
+
+        environ = {}
+
+        def app(wsgi_environ, start_response):
+            environ.update(wsgi_environ)
+            response = HttpResponse('héllo', status=201)
+            response.set_cookie('a', '1')
+            return response
+
+        response = run(StubRequest(headers={'x-forwarded-for': '1.2.3.4'}), app)
+
+        assert (environ['PATH_INFO'], environ['QUERY_STRING'], environ['SERVER_NAME']) == ('/page', 'x=1', 'example.com')
+        assert environ['HTTP_X_FORWARDED_FOR'] == '1.2.3.4'
+        assert (response.body, response.status) == ('héllo', 201)
+        assert response.headers['Set-Cookie'] == ['a=1; Path=/']
+
+    def test_response_is_closed(self, js):
+        """Test the Django response is closed, which sends request_finished."""
+        from django.core.signals import request_finished
+        from django.http import HttpResponse
+
+        finished = []
+
+        def receiver(sender, **kwargs):
+            finished.append(sender)
+
+        request_finished.connect(receiver)
+        try:
+            run(StubRequest(), lambda environ, start_response: HttpResponse())
+        finally:
+            request_finished.disconnect(receiver)
+
+        assert finished
+
+    def test_server_timing(self, js):
+        """Test the Server-Timing header is added only when enabled."""
+        from django.http import HttpResponse
+        from django.test import override_settings
+
+        def app(environ, start_response):
+            return HttpResponse()
+
+        assert 'Server-Timing' not in run(StubRequest(), app).headers
+        with override_settings(CLOUDFLARE_SERVER_TIMING=True):
+            assert run(StubRequest(), app).headers['Server-Timing'].startswith('db')
+
+    def test_budget_header(self, js):
+        """Test an exceeded query budget is reported in its header."""
+        from django.http import HttpResponse
+        from django_cf import budget
+
+        with patch.object(budget, 'header_value', return_value='queries=3/2'):
+            response = run(StubRequest(), lambda environ, start_response: HttpResponse())
+
+        assert response.headers[budget.HEADER] == 'queries=3/2'
+
+    def test_pending_flushes(self, js):
+        """Test background flushes go to ctx.waitUntil, or are awaited without a context."""
+        from django.http import HttpResponse
+
+        done = []
+
+        async def flush():
+            done.append(True)
+
+        def app(environ, start_response):
+            return HttpResponse()
+
+        ctx = StubContext()
+        with patch('django_cf.db.statements.pending_flushes', return_value=[flush()]):
+            run(StubRequest(), app, ctx)
+        assert len(ctx.waited) == 1
+
+        done.clear()
+        with patch('django_cf.db.statements.pending_flushes', return_value=[flush()]):
+            run(StubRequest(), app)
+        assert done == [True]